@@ -0,0 +1,5 @@
+-- columns of the Tracks table for the demultiplexing results of bcl2fastq (sequencing/demultiplex_stats.py)
+ALTER TABLE Tracks
+    ADD COLUMN READ_COUNT BIGINT NULL,
+    ADD COLUMN YIELD BIGINT NULL,
+    ADD COLUMN PERCENT_Q30 FLOAT NULL;
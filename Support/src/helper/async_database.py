@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import asyncio
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+from functools import partial
+
+'''
+Class providing an asyncio facade for a Database instance. Each method of the database can be
+awaited (e.g. await asyncdb.query_machines_with_machineid(1)); the call runs in a bounded thread pool
+and every worker thread uses its own database connection. At most max_concurrency queries are
+running at the same time to protect the LIMS server. The facade is meant for lookups: a commit only
+reaches the connection of the worker thread that runs it, so writes should stay on the main thread.
+'''
+class AsyncDatabase(object):
+    def __init__(self, dbinst, max_workers = 4, max_concurrency = None):
+        self.__dbinst = dbinst
+        self.__max_workers = max_workers
+        self.__max_concurrency = max_workers if max_concurrency is None else max_concurrency
+        self.__executor = ThreadPoolExecutor(max_workers = max_workers, thread_name_prefix = 'support-db')
+        self.__semaphore = None
+        self.__logger = logging.getLogger('support.async_database')
+
+    def show_log(self, level, message):
+        if level == 'debug':
+            self.__logger.debug(message)
+        elif level == 'info':
+            self.__logger.info(message)
+        elif level == 'warning':
+            self.__logger.warning(message)
+        elif level == 'error':
+            self.__logger.error(message)
+        elif level == 'critical':
+            self.__logger.critical(message)
+
+    def __getattr__(self, name):
+        attribute = getattr(self.__dbinst, name)
+        if not callable(attribute): return attribute
+        return partial(self.call, name)
+
+    '''
+    coroutine runs a method of the database instance in the thread pool and returns its result
+    @param method: string
+    @return: result of the method
+    '''
+    async def call(self, method, *args, **kwargs):
+        if self.__semaphore is None: self.__semaphore = asyncio.Semaphore(self.__max_concurrency) # bound to the running loop
+        async with self.__semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.__executor, partial(getattr(self.__dbinst, method), *args, **kwargs))
+
+    '''
+    coroutine runs a method of the database for each entry of argslist concurrently and returns
+    the results in the order of argslist. an entry is either a tuple of arguments or a single argument
+    @param method: string
+    @param argslist: list
+    @return: list
+    '''
+    async def gather(self, method, argslist):
+        calls = [self.call(method, *(args if isinstance(args, tuple) else (args, ))) for args in argslist]
+        return await asyncio.gather(*calls)
+
+    '''
+    method closes the connections of the worker threads and shuts the thread pool down. each worker
+    waits at a barrier after closing its connection, so every worker thread gets one of the tasks. if a
+    worker thread doesn't reach the barrier within timeout seconds, it is broken and the connections
+    which weren't closed are dropped with their threads
+    @param timeout: float
+    '''
+    def close(self, timeout = 30.0):
+        barrier = threading.Barrier(self.__max_workers, timeout = timeout)
+        def close_worker():
+            self.__dbinst.closeConnection()
+            try:
+                barrier.wait()
+                return True
+            except threading.BrokenBarrierError:
+                return False
+        futures = [self.__executor.submit(close_worker) for i in range(self.__max_workers)]
+        self.__executor.shutdown(wait = True)
+        if not all([future.result() for future in futures]):
+            self.show_log('warning', 'not every worker thread of the async database closed its connection within {0}s'.format(timeout))
+        self.show_log('debug', 'thread pool of the async database closed')
+
+    def get_dbinst(self):
+        return self.__dbinst
+
+    dbinst = property(get_dbinst)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import threading
+
+from collections import OrderedDict
+
+from time import monotonic
+
+'''
+Class describing a bounded cache where each entry expires after ttl seconds. If the cache is full,
+the least recently used entry is removed. Hits and misses are counted. It is thread safe.
+'''
+class TTLCache(object):
+    def __init__(self, ttl = 600, maxsize = 1024):
+        self.__ttl = ttl
+        self.__maxsize = maxsize
+        self.__entries = OrderedDict() # key: (expiry time, value)
+        self.__lock = threading.Lock()
+        self.__hits = 0
+        self.__misses = 0
+
+    '''
+    method returns a tuple (True, value) if the key is cached and not expired, otherwise (False, None)
+    @param key: hashable
+    @return: tuple(boolean, object)
+    '''
+    def get(self, key):
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None:
+                if entry[0] > monotonic():
+                    self.__entries.move_to_end(key)
+                    self.__hits += 1
+                    return True, entry[1]
+                del self.__entries[key]
+            self.__misses += 1
+            return False, None
+
+    def set(self, key, value):
+        with self.__lock:
+            self.__entries[key] = (monotonic() + self.__ttl, value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__maxsize:
+                self.__entries.popitem(last = False)
+
+    '''
+    method removes a single key or, if key is None, all entries from the cache
+    @param key: hashable
+    '''
+    def invalidate(self, key = None):
+        with self.__lock:
+            if key is None:
+                self.__entries.clear()
+            else:
+                self.__entries.pop(key, None)
+
+    '''
+    method returns the counters of the cache
+    @return: dictionary
+    '''
+    def get_stats(self):
+        with self.__lock:
+            return {'hits': self.__hits, 'misses': self.__misses, 'size': len(self.__entries), 'maxsize': self.__maxsize, 'ttl': self.__ttl}
+
+    def get_ttl(self):
+        return self.__ttl
+
+    def get_maxsize(self):
+        return self.__maxsize
+
+    '''
+    method changes the maximal number of entries, a smaller size removes the least recently used entries
+    @param maxsize: integer
+    '''
+    def set_maxsize(self, maxsize):
+        with self.__lock:
+            self.__maxsize = maxsize
+            while len(self.__entries) > self.__maxsize:
+                self.__entries.popitem(last = False)
+
+    ttl = property(get_ttl)
+    maxsize = property(get_maxsize, set_maxsize)
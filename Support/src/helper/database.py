@@ -29,19 +29,69 @@ contact: mathias.lesche(at)tu-dresden.de
 '''
 
 import logging
+import threading
+
+from collections import defaultdict
+from collections import OrderedDict
+
+from time import sleep
+from time import perf_counter
+from time import time
 
 import mysql.connector
 
 from mysql.connector import errorcode
+from mysql.connector import pooling
 
+''' own modules '''
+from helper.cache import TTLCache
+from helper.query_registry import InstrumentedCursor
+from helper.query_registry import RecordingCursor
+from helper.query_registry import QueryRegistry
+from helper.query_registry import get_rowsize
+
+'''
+Class wrapping the access to the LIMS database. The connection is held per thread. If pool_size is
+larger than 0, the connections are borrowed from a mysql connection pool, otherwise each thread opens
+its own connection. A connection which has been idle for more than ping_interval seconds is checked
+before it is used and reconnected with an exponential backoff (reconnect_delay, 2*reconnect_delay, ...).
+A connection with an open transaction is never reconnected silently, the error is raised instead.
+Reads which lose the connection (LOST_CONNECTION errors) outside a transaction are repeated once on a new connection.
+Lookups of the rarely changing reference tables are cached with a time to live per table (cache_ttl,
+default CACHE_TTL) and at most cache_maxsize entries per table. An empty cache_ttl disables the cache.
+If prepared is True, the hot lookups are prepared once per connection as server-side statements and
+re-executed with new parameters afterwards. At most PREPARED_MAXSIZE statements are kept per connection, the
+least recently used one is deallocated when another one is prepared (IN lists give a statement per length).
+If instrument is True, wall time, rows and fetched bytes of every statement are recorded per method in
+a QueryRegistry and statements slower than slow_query_threshold seconds are logged.
+'''
 class Database(object):
-    def __init__(self, host, user, pw, db):
+    CACHE_TTL = {'Machines': 3600, 'Indexes': 3600, 'Clients': 600, 'PriceProductTables': 300}
+    BATCH_SIZE = 500 # maximal number of rows written by one statement of the batch methods
+    LOST_CONNECTION = (errorcode.CR_SERVER_GONE_ERROR, errorcode.CR_SERVER_LOST)
+    FLOWCELLS_COLUMNS = ('ID', 'CODE', 'FLOWCELLSTYPE_ID', 'PRODUCTION_DAY', 'PRODUCTION_MACHINE', 'SEQUENCING_DAY', 'SEQUENCING_MACHINE', 'BARCODING', 'NOTES',
+        'FLOWCELLSSTATUS_ID', 'NUMBER', 'RAW_DATA_PATH', 'RAW_DATA_STATUS', 'ARCHIVING_DATE', 'ARCHIVING_STATUS', 'ACTIVITY', 'MACHINE_ID', 'COMPARTMENT_COUNT',
+        'COMPARTMENT_CAPACITY', 'PIPELINING_STATUS', 'ADDITIONAL_INFORMATION')
+    PREPARED_MAXSIZE = 32 # prepared statements per connection, the server limits them with max_prepared_stmt_count
+
+    def __init__(self, host, user, pw, db, pool_size = 0, reconnect_attempts = 3, reconnect_delay = 1.0, ping_interval = 60, cache_ttl = None, cache_maxsize = 1024, prepared = False, instrument = True, slow_query_threshold = 1.0):
         self.__host = host
         self.__user = user
         self.__pw = pw
         self.__db = db
-        self.__conn = ''
-        self.__cursor = ''
+        self.__pool_size = pool_size
+        self.__pool = None
+        self.__pool_lock = threading.Lock()
+        self.__reconnect_attempts = reconnect_attempts
+        self.__reconnect_delay = reconnect_delay
+        self.__ping_interval = ping_interval
+        self.__local = threading.local()
+        if cache_ttl is None: cache_ttl = Database.CACHE_TTL
+        self.__caches = dict([(table, TTLCache(ttl, cache_maxsize)) for table, ttl in cache_ttl.items()])
+        self.__prepared = prepared
+        self.__statement_stats = {'prepared': 0, 'reused': 0, 'evicted': 0}
+        self.__statement_lock = threading.Lock()
+        self.__registry = QueryRegistry(slow_query_threshold) if instrument else None
         self.__logger = logging.getLogger('support.database')
 
     def show_log(self, level, message):
@@ -56,29 +106,324 @@ class Database(object):
         elif level == 'critical':
             self.__logger.critical(message)
 
+    '''
+    function logs a connection error with a readable message
+    @param err: mysql.connector.Error
+    '''
+    def log_connection_error(self, err):
+        if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
+            self.show_log('error', "Something is wrong with your user name or password")
+        elif err.errno == errorcode.ER_BAD_DB_ERROR:
+            self.show_log('error', "Database does not exist")
+        else:
+            self.show_log('error', "database connection failed: {0}".format(err))
+
+    '''
+    function opens a new connection or borrows one from the pool. the pool is created
+    with the first connection
+    @return: connection
+    '''
+    def open_connection(self):
+        if self.__pool_size == 0:
+            return mysql.connector.connect(host = self.__host, user = self.__user, password = self.__pw, database = self.__db)
+        with self.__pool_lock:
+            if self.__pool is None:
+                self.__pool = pooling.MySQLConnectionPool(pool_size = self.__pool_size, host = self.__host, user = self.__user, password = self.__pw, database = self.__db)
+                self.show_log('info', "database connection pool with {0} connections created".format(self.__pool_size))
+        conn = self.__pool.get_connection()
+        conn.ping(reconnect = False) # health check of the borrowed connection
+        return conn
+
+    '''
+    function reconnects the connection of the current thread. it tries reconnect_attempts times
+    and doubles the waiting time after each failed attempt. the last error is raised
+    @return: connection
+    '''
+    def reconnect(self):
+        conn = getattr(self.__local, 'conn', None)
+        if conn is not None:
+            try:
+                conn.close()
+            except mysql.connector.Error:
+                pass
+            self.__local.conn = None
+        self.__local.statements = OrderedDict() # prepared statements are bound to the connection
+
+        delay = self.__reconnect_delay
+        for attempt in range(1, self.__reconnect_attempts + 1):
+            try:
+                conn = self.open_connection()
+                break
+            except mysql.connector.Error as err:
+                if attempt == self.__reconnect_attempts: raise
+                self.show_log('warning', "database connection failed ({0}/{1}): {2}. retry in {3}s".format(attempt, self.__reconnect_attempts, err, delay))
+                sleep(delay)
+                delay *= 2
+
+        self.__local.conn = conn
+        self.__local.lastused = time()
+        return conn
+
+    '''
+    function returns the connection of the current thread. it is opened if it does not exist
+    and checked (and reconnected if needed) if it was idle for longer than ping_interval
+    @return: connection
+    '''
+    def get_connection(self):
+        conn = getattr(self.__local, 'conn', None)
+        if conn is None:
+            return self.reconnect()
+        now = time()
+        if now - self.__local.lastused > self.__ping_interval:
+            try:
+                conn.ping(reconnect = False)
+            except mysql.connector.Error:
+                if conn.in_transaction: raise
+                self.show_log('warning', "database connection was dropped. reconnecting")
+                conn = self.reconnect()
+        self.__local.lastused = now
+        return conn
+
+    '''
+    function checks if a read failed because the connection was lost outside of a transaction. only
+    then it can be repeated on a new connection without losing uncommitted changes
+    @param err: mysql.connector.Error
+    @return: boolean
+    '''
+    def can_retry_read(self, err):
+        if err.errno not in Database.LOST_CONNECTION: return False
+        conn = getattr(self.__local, 'conn', None)
+        try:
+            return conn is None or not conn.in_transaction
+        except mysql.connector.Error:
+            return False
+
+    '''
+    function executes a read query with a dictionary cursor and returns the rows as list of dictionaries
+    (or the first row if fetchone is True). a read which lost the connection outside of a transaction is
+    repeated once after a reconnect
+    @param method: string
+    @param query: string
+    @param values: tuple or list
+    @param fetchone: boolean
+    @return: dictionary (fetchone) or list of dictionaries
+    '''
+    def fetch_rows(self, method, query, values = (), fetchone = False):
+        retry = True
+        while True:
+            cursor = self.get_cursor(method, dictionary = True)
+            failed = True
+            try:
+                cursor.execute(query, values)
+                resultset = cursor.fetchone() if fetchone else cursor.fetchall()
+                failed = False
+                return resultset
+            except mysql.connector.Error as err:
+                if not retry or not self.can_retry_read(err): raise
+                error = err
+            finally:
+                try:
+                    cursor.close() # also after an error, before the connection is used again
+                except mysql.connector.Error:
+                    if not failed: raise # the error of the query is kept otherwise
+            retry = False
+            self.show_log('warning', "database connection lost during {0} ({1}). reconnecting and repeating the read".format(method, error))
+            self.reconnect()
+
+    '''
+    function looks up a key in the cache of a table and returns a tuple (True, value) for a hit
+    and (False, None) for a miss or if the table is not cached. dictionaries are returned as copy
+    @param table: string
+    @param key: hashable
+    @return: tuple(boolean, object)
+    '''
+    def get_cache_entry(self, table, key):
+        if table not in self.__caches: return False, None
+        found, value = self.__caches[table].get(key)
+        if isinstance(value, dict): value = dict(value)
+        return found, value
+
+    def set_cache_entry(self, table, key, value):
+        if table not in self.__caches or value is None: return
+        if isinstance(value, dict): value = dict(value)
+        self.__caches[table].set(key, value)
+
+    '''
+    function grows the cache of a table to hold at least size entries, e.g. a whole table loaded
+    from a snapshot. the cache never shrinks below its configured cache_maxsize
+    @param table: string
+    @param size: integer
+    '''
+    def reserve_cache(self, table, size):
+        if table not in self.__caches: return
+        cache = self.__caches[table]
+        if cache.get_maxsize() < size: cache.set_maxsize(size)
+
+    '''
+    function removes a key or the whole content (key is None) from the cache of a table. if table is None,
+    all caches are emptied
+    @param table: string
+    @param key: hashable
+    '''
+    def invalidate_cache(self, table = None, key = None):
+        for name, cache in self.__caches.items():
+            if table is None or table == name: cache.invalidate(key)
+
+    '''
+    function returns the hits, misses and sizes of the caches
+    @return: dictionary (table: dictionary)
+    '''
+    def get_cache_stats(self):
+        return dict([(table, cache.get_stats()) for table, cache in self.__caches.items()])
+
+    '''
+    function returns a new cursor of the connection of the current thread. if the database is
+    instrumented, the cursor records its statements under the name of the calling method. in
+    dryrun of the registry the statements are only recorded and not run (see RecordingCursor)
+    @param method: string
+    @return: cursor
+    '''
+    def get_cursor(self, method, **kwargs):
+        if self.__registry is not None and self.__registry.get_dryrun(): return RecordingCursor(self.__registry, method)
+        cursor = self.get_connection().cursor(**kwargs)
+        if self.__registry is None: return cursor
+        return InstrumentedCursor(cursor, self.__registry, method)
+
+    def get_registry(self):
+        return self.__registry
+
+    '''
+    function executes a query as server-side prepared statement. the statement is prepared with the
+    first call on a connection and re-executed with the new values by all later calls. the rows are
+    returned as dictionaries, like a dictionary cursor does
+    @param method: string
+    @param query: string
+    @param values: tuple
+    @param fetchone: boolean
+    @return: dictionary (fetchone) or list of dictionaries
+    '''
+    def execute_prepared(self, method, query, values, fetchone = False):
+        if self.__registry is not None and self.__registry.get_dryrun():
+            cursor = RecordingCursor(self.__registry, method)
+            cursor.execute(query, values)
+            return None if fetchone else []
+        retry = True
+        while True:
+            start = perf_counter()
+            conn = self.get_connection()
+            statements = self.__local.statements
+            cursor = statements.get(query)
+            prepared, evicted = cursor is None, []
+            if prepared:
+                cursor = conn.cursor(prepared = True)
+                statements[query] = cursor
+                while len(statements) > Database.PREPARED_MAXSIZE:
+                    evicted.append(statements.popitem(last = False)[1])
+            else:
+                statements.move_to_end(query)
+            for oldcursor in evicted:
+                oldcursor.close() # deallocates the least recently used statement on the server
+            with self.__statement_lock:
+                self.__statement_stats['prepared' if prepared else 'reused'] += 1
+                self.__statement_stats['evicted'] += len(evicted)
+            resultset = []
+            failed = True
+            try:
+                cursor.execute(query, values)
+                columns = cursor.column_names
+                resultset = [dict(zip(columns, row)) for row in cursor.fetchall()]
+                failed = False
+                break
+            except mysql.connector.Error as err:
+                if not retry or not self.can_retry_read(err): raise
+                retry = False
+                self.show_log('warning', "database connection lost during {0} ({1}). reconnecting and repeating the read".format(method, err))
+                self.reconnect() # forgets the prepared statements of the lost connection
+            finally:
+                if self.__registry is not None:
+                    self.__registry.record(method, perf_counter() - start, 0, [(query, values)], failed)
+                    self.__registry.record_fetched(method, 0.0, len(resultset), sum([get_rowsize(row) for row in resultset]))
+        if fetchone: return resultset[0] if len(resultset) != 0 else None
+        return resultset
+
+    '''
+    function returns how many statements were prepared, how often a prepared statement was reused and how many
+    were deallocated to keep at most PREPARED_MAXSIZE per connection
+    @return: dictionary
+    '''
+    def get_statement_stats(self):
+        with self.__statement_lock:
+            return dict(self.__statement_stats)
+
+    def set_prepared(self, prepared):
+        self.__prepared = prepared
+
+    def get_prepared(self):
+        return self.__prepared
+
+    '''
+    function establishes the connection of the current thread and returns True if it was successful
+    @return: boolean
+    '''
     def setConnection(self):
         try:
-            self.__conn = mysql.connector.connect(host = self.__host, user = self.__user, password = self.__pw, database = self.__db)
+            self.get_connection()
             self.show_log('info', "database connection established")
+            return True
         except mysql.connector.Error as err:
-            if err.errno == errorcode.ER_ACCESS_DENIED_ERROR:
-                self.show_log('error', "Something is wrong with your user name or password")
-            elif err.errno == errorcode.ER_BAD_DB_ERROR:
-                self.show_log('error', "Database does not exist")
-            else:
-                print(err)
+            self.log_connection_error(err)
+            return False
 
- 
+    '''
+    function closes the connection of the current thread. a pooled connection is returned to the pool
+    '''
     def closeConnection(self):
+        conn = getattr(self.__local, 'conn', None)
+        if conn is None: return
         self.show_log('info', "database connection shutdown")
-        self.__conn.close()
-    
+        for cursor in self.__local.statements.values():
+            cursor.close() # deallocates the prepared statement
+        self.__local.statements = OrderedDict()
+        conn.close()
+        self.__local.conn = None
 
+    '''
+    functions commit and roll back the transaction of the current thread. without a connection
+    there is no transaction and nothing to do
+    '''
     def commitConnection(self):
-        self.__conn.commit()
+        conn = getattr(self.__local, 'conn', None)
+        if conn is None:
+            self.show_log('warning', "commit without database connection")
+            return
+        conn.commit()
 
     def rollbackConnection(self):
-        self.__conn.rollback()
+        conn = getattr(self.__local, 'conn', None)
+        if conn is None: return
+        conn.rollback()
+
+    '''
+    functions set, roll back to and release a named savepoint in the current transaction. a rollback
+    to a savepoint undoes the changes since the savepoint and keeps the earlier ones of the transaction
+    @param name: string (identifier of the savepoint)
+    '''
+    def setSavepoint(self, name):
+        self.execute_savepoint('SAVEPOINT {0}', name)
+
+    def rollbackToSavepoint(self, name):
+        self.execute_savepoint('ROLLBACK TO SAVEPOINT {0}', name)
+
+    def releaseSavepoint(self, name):
+        self.execute_savepoint('RELEASE SAVEPOINT {0}', name)
+
+    def execute_savepoint(self, statement, name):
+        if not name.isidentifier(): raise ValueError("'{0}' is not a valid savepoint name".format(name))
+        conn = getattr(self.__local, 'conn', None)
+        if conn is None: raise mysql.connector.errors.ProgrammingError("savepoint '{0}' without database connection".format(name))
+        cursor = conn.cursor()
+        cursor.execute(statement.format(name))
+        cursor.close()
 
     '''
     function updates the raw data paths and fc number of a flowcell entry in the flowcell table.
@@ -89,7 +434,7 @@ class Database(object):
     @param number: string
     '''
     def update_path_number_into_flowcells(self, dbid, cmcbpath, zihpath, number):
-        cursor = self.__conn.cursor()
+        cursor = self.get_cursor('update_path_number_into_flowcells')
 #         updater = ('UPDATE Flowcells SET RAW_DATA_PATH = %s, NUMBER = %s, ZIH_DATA_PATH = %s WHERE ID = %s')
         updater = ('UPDATE Flowcells SET RAW_DATA_PATH = %s, NUMBER = %s WHERE ID = %s')
         
@@ -105,24 +450,108 @@ class Database(object):
     @param pipestatus: integer
     '''
     def update_sequencing_pipelinestatus_into_flowcells(self, dbid, seqstatus, pipestatus):
-        cursor = self.__conn.cursor()
+        cursor = self.get_cursor('update_sequencing_pipelinestatus_into_flowcells')
         updater = ('UPDATE Flowcells SET FLOWCELLSSTATUS_ID = %s, PIPELINING_STATUS = %s WHERE ID = %s')
         cursor.execute(updater, (seqstatus, pipestatus, dbid))
         cursor.close()
+
+    '''
+    function updates the sequencing and pipelining status of several flowcells with one
+    UPDATE ... CASE statement per BATCH_SIZE flowcells.
+    @param statuslist: list of tuples (dbid, seqstatus, pipestatus)
+    @return: integer (number of changed rows)
+    '''
+    def update_sequencing_pipelinestatus_into_flowcells_batch(self, statuslist):
+        cursor = self.get_cursor('update_sequencing_pipelinestatus_into_flowcells_batch')
+        rowcount = 0
+        for start in range(0, len(statuslist), Database.BATCH_SIZE):
+            chunk = statuslist[start:start + Database.BATCH_SIZE]
+            cases = ' '.join(['WHEN %s THEN %s']*len(chunk))
+            updater = 'UPDATE Flowcells SET FLOWCELLSSTATUS_ID = CASE ID {0} END, PIPELINING_STATUS = CASE ID {0} END WHERE ID IN ({1})'.format(cases, ','.join(['%s']*len(chunk)))
+            values = [v for dbid, seqstatus, pipestatus in chunk for v in (dbid, seqstatus)]
+            values.extend([v for dbid, seqstatus, pipestatus in chunk for v in (dbid, pipestatus)])
+            values.extend([dbid for dbid, seqstatus, pipestatus in chunk])
+            cursor.execute(updater, values)
+            rowcount += cursor.rowcount
+        cursor.close()
+        return rowcount
  
+    '''
+    function writes the demultiplexing results (read count, yield and % >= Q30) of several tracks of a
+    flowcell with one UPDATE ... CASE statement per BATCH_SIZE tracks. only tracks of the flowcell are
+    updated, the ids which are not tracks of the flowcell are returned
+    @param flowcellid: integer
+    @param statslist: list of tuples (dbid, reads, yield, percent q30)
+    @return: list of integers (ids not found on the flowcell)
+    '''
+    def update_demultiplex_stats_into_tracks_batch(self, flowcellid, statslist):
+        cursor = self.get_cursor('update_demultiplex_stats_into_tracks_batch')
+        missing = []
+        for start in range(0, len(statslist), Database.BATCH_SIZE):
+            chunk = statslist[start:start + Database.BATCH_SIZE]
+            cursor.execute('SELECT ID FROM Tracks WHERE FLOWCELL_ID = %s AND ID IN ({0})'.format(','.join(['%s']*len(chunk))), [flowcellid] + [entry[0] for entry in chunk])
+            found = set([row[0] for row in cursor.fetchall()])
+            missing.extend([entry[0] for entry in chunk if entry[0] not in found])
+            chunk = [entry for entry in chunk if entry[0] in found]
+            if len(chunk) == 0: continue
+
+            cases = ' '.join(['WHEN %s THEN %s']*len(chunk))
+            updater = 'UPDATE Tracks SET READ_COUNT = CASE ID {0} END, YIELD = CASE ID {0} END, PERCENT_Q30 = CASE ID {0} END WHERE FLOWCELL_ID = %s AND ID IN ({1})'.format(cases, ','.join(['%s']*len(chunk)))
+            values = []
+            for column in range(1, 4):
+                values.extend([v for entry in chunk for v in (entry[0], entry[column])])
+            values.append(flowcellid)
+            values.extend([entry[0] for entry in chunk])
+            cursor.execute(updater, values)
+        cursor.close()
+        return missing
+
+    '''
+    function queries a table for a list of ids and returns a dictionary (id: row). the ids are queried
+    in IN (...) batches of at most BATCH_SIZE ids. ids found in the cache of the table are not queried
+    and the fetched rows are added to the cache. unknown ids are missing in the dictionary
+    @param method: string
+    @param table: string
+    @param ids: list of ids
+    @return: dictionary
+    '''
+    def __query_table_with_ids(self, method, table, ids):
+        resultdict, missing = {}, []
+        for dbid in dict.fromkeys(ids): # removes duplicates and keeps the order
+            found, resultset = self.get_cache_entry(table, dbid)
+            if found: resultdict[dbid] = resultset
+            else: missing.append(dbid)
+        if len(missing) == 0: return resultdict
+
+        for start in range(0, len(missing), Database.BATCH_SIZE):
+            chunk = missing[start:start + Database.BATCH_SIZE]
+            query = 'SELECT * FROM {0} WHERE ID IN ({1})'.format(table, ', '.join(['%s'] * len(chunk)))
+            for resultset in self.fetch_rows(method, query, tuple(chunk)):
+                resultdict[resultset['ID']] = resultset
+                self.set_cache_entry(table, resultset['ID'], resultset)
+        return resultdict
+
     '''
     function queries the database table clients with the flowcell id and returns a dictionary
     @param clientid: integer
     @return: dictionary
     '''
     def query_clients_with_clientid(self, clientid):
-        cursor = self.__conn.cursor(dictionary = True)
+        found, resultset = self.get_cache_entry('Clients', clientid)
+        if found: return resultset
         query = 'SELECT * FROM Clients WHERE ID=%s'.format(clientid)
-        cursor.execute(query, (clientid, ))
-        resultset = cursor.fetchone()
-        cursor.close()
+        resultset = self.fetch_rows('query_clients_with_clientid', query, (clientid, ), fetchone = True)
+        self.set_cache_entry('Clients', clientid, resultset)
         return resultset
   
+    '''
+    function queries the Clients table with a list of client ids and returns a dictionary (clientid: dictionary)
+    @param clientids: list of integers
+    @return: dictionary
+    '''
+    def query_clients_with_ids(self, clientids):
+        return self.__query_table_with_ids('query_clients_with_ids', 'Clients', clientids)
+
     '''
     function queries the database table flowcells with the fcstatus and pipelinestatus.
     it returns a list of dictionaries
@@ -131,11 +560,11 @@ class Database(object):
     @return: list of dictionaries
     '''
     def query_flowcell_with_status(self, fcstatus, pipelinestatus):
-        cursor = self.__conn.cursor(dictionary = True)
         query = ('SELECT * FROM Flowcells where PIPELINING_STATUS=%s and FLOWCELLSSTATUS_ID=%s')
-        cursor.execute(query, (pipelinestatus, fcstatus))
-        resultset = cursor.fetchall()
-        cursor.close()
+        if self.__prepared:
+            resultset = self.execute_prepared('query_flowcell_with_status', query, (pipelinestatus, fcstatus))
+        else:
+            resultset = self.fetch_rows('query_flowcell_with_status', query, (pipelinestatus, fcstatus))
         return resultset
     
         '''
@@ -145,24 +574,68 @@ class Database(object):
     @return: list of dictionaries
     '''
     def query_flowcell_with_raw_data_path(self, raw_data_path):
-        cursor = self.__conn.cursor(dictionary = True)
         query = ('SELECT * FROM Flowcells where RAW_DATA_PATH=%s')
-        cursor.execute(query, (raw_data_path, ))
-        resultset = cursor.fetchall()
-        cursor.close()
+        if self.__prepared:
+            resultset = self.execute_prepared('query_flowcell_with_raw_data_path', query, (raw_data_path, ))
+        else:
+            resultset = self.fetch_rows('query_flowcell_with_raw_data_path', query, (raw_data_path, ))
+        return resultset
+
+    '''
+    function queries the flowcells with an ID above the high-water mark last_id and returns them
+    as list of dictionaries ordered by ID. if columns is given, only these columns are selected. they
+    are pasted into the statement, so only the columns of FLOWCELLS_COLUMNS are accepted
+    @param last_id: integer
+    @param columns: list of strings
+    @return: list of dictionaries
+    '''
+    def query_flowcells_since(self, last_id, columns = None):
+        if columns is not None:
+            unknown = [column for column in columns if column not in Database.FLOWCELLS_COLUMNS]
+            if len(columns) == 0 or len(unknown) != 0: raise ValueError("unknown columns of the Flowcells table: {0}".format(', '.join(map(str, unknown))))
+        query = 'SELECT {0} FROM Flowcells WHERE ID > %s ORDER BY ID'.format('*' if columns is None else ', '.join(columns))
+        resultset = self.fetch_rows('query_flowcells_since', query, (last_id, ))
         return resultset
 
+    '''
+    function queries the Flowcells table with a list of flowcell ids and returns a dictionary (fcid: dictionary)
+    @param fcids: list of integers
+    @return: dictionary
+    '''
+    def query_flowcells_with_ids(self, fcids):
+        return self.__query_table_with_ids('query_flowcells_with_ids', 'Flowcells', fcids)
+
     '''
     function queries the database table indexes with the index id and returns a dictionary
     @param indexid: integer
     @return: dictionary
     '''
     def query_indexes_with_indexid(self, indexid):
-        cursor = self.__conn.cursor(dictionary = True)
+        found, resultset = self.get_cache_entry('Indexes', indexid)
+        if found: return resultset
         query = ('SELECT * FROM Indexes WHERE ID=%s')
-        cursor.execute(query, (indexid, ))
-        resultset = cursor.fetchone()
-        cursor.close()
+        if self.__prepared:
+            resultset = self.execute_prepared('query_indexes_with_indexid', query, (indexid, ), True)
+        else:
+            resultset = self.fetch_rows('query_indexes_with_indexid', query, (indexid, ), fetchone = True)
+        self.set_cache_entry('Indexes', indexid, resultset)
+        return resultset
+
+    '''
+    function queries the Indexes table with a list of index ids and returns a dictionary (indexid: dictionary)
+    @param indexids: list of integers
+    @return: dictionary
+    '''
+    def query_indexes_with_ids(self, indexids):
+        return self.__query_table_with_ids('query_indexes_with_ids', 'Indexes', indexids)
+
+    '''
+    function queries the indexes table and return a list of dictionaries
+    @return: list of dictionaries
+    '''
+    def query_indexes(self):
+        query = ('SELECT * FROM Indexes')
+        resultset = self.fetch_rows('query_indexes', query, ())
         return resultset
 
     '''
@@ -171,23 +644,28 @@ class Database(object):
     @return: dictionary
     '''
     def query_libraries_with_libid(self, libid):
-        cursor = self.__conn.cursor(dictionary = True)
         query = ('SELECT * FROM Libraries WHERE ID=%s')
-        cursor.execute(query, (libid, ))
-        resultset = cursor.fetchone()
-        cursor.close()
+        if self.__prepared:
+            resultset = self.execute_prepared('query_libraries_with_libid', query, (libid, ), True)
+        else:
+            resultset = self.fetch_rows('query_libraries_with_libid', query, (libid, ), fetchone = True)
         return resultset
 
+    '''
+    function queries the Libraries table with a list of library ids and returns a dictionary (libid: dictionary)
+    @param libids: list of integers
+    @return: dictionary
+    '''
+    def query_libraries_with_ids(self, libids):
+        return self.__query_table_with_ids('query_libraries_with_ids', 'Libraries', libids)
+
     '''
     function queries the machine table and return a list of dictionaries
     @return: list of dictionaries
     '''
     def query_machines(self):
-        cursor = self.__conn.cursor(dictionary = True)
         query = ('SELECT * FROM Machines')
-        cursor.execute(query)
-        resultset = cursor.fetchall()
-        cursor.close()
+        resultset = self.fetch_rows('query_machines', query, ())
         return resultset
 
     '''
@@ -196,55 +674,104 @@ class Database(object):
     @return: dictionary
     '''
     def query_machines_with_machineid(self, machineid):
-        cursor = self.__conn.cursor(dictionary = True)
+        found, resultset = self.get_cache_entry('Machines', machineid)
+        if found: return resultset
         query = ('SELECT * FROM Machines WHERE ID=%s')
-        cursor.execute(query, (machineid, ))
-        resultset = cursor.fetchone()
-        cursor.close()
+        resultset = self.fetch_rows('query_machines_with_machineid', query, (machineid, ), fetchone = True)
+        self.set_cache_entry('Machines', machineid, resultset)
         return resultset
 
+    '''
+    function queries the Machines table with a list of machine ids and returns a dictionary (machineid: dictionary)
+    @param machineids: list of integers
+    @return: dictionary
+    '''
+    def query_machines_with_ids(self, machineids):
+        return self.__query_table_with_ids('query_machines_with_ids', 'Machines', machineids)
+
     '''
     function queries the samples table with sample id and returns a dictionary
     @param sampleid: integer
     @return: dictionary
     '''
     def query_samples_with_sampleid(self, sampleid):
-        cursor = self.__conn.cursor(dictionary = True)
         query = ('SELECT * FROM Samples WHERE ID=%s')
-        cursor.execute(query, (sampleid, ))
-        resultset = cursor.fetchone()
-        cursor.close()
+        resultset = self.fetch_rows('query_samples_with_sampleid', query, (sampleid, ), fetchone = True)
         return resultset
 
+    '''
+    function queries the Samples table with a list of sample ids and returns a dictionary (sampleid: dictionary)
+    @param sampleids: list of integers
+    @return: dictionary
+    '''
+    def query_samples_with_ids(self, sampleids):
+        return self.__query_table_with_ids('query_samples_with_ids', 'Samples', sampleids)
+
     '''
     function queries the tracks table with the flowcell id and returns a list of dictionaries of tracks
     @param fcid: integer
     @return: list of dictionaries 
     '''
     def query_tracks_with_flowcellid(self, fcid):
-        cursor = self.__conn.cursor(dictionary = True)
         query = ('SELECT * FROM Tracks WHERE FLOWCELL_ID=%s')
-        cursor.execute(query, (fcid, ))
-        resultset = cursor.fetchall()
-        cursor.close()
+        if self.__prepared:
+            resultset = self.execute_prepared('query_tracks_with_flowcellid', query, (fcid, ))
+        else:
+            resultset = self.fetch_rows('query_tracks_with_flowcellid', query, (fcid, ))
         return resultset
-   
+
     '''
-    function queries the library table and returns a list of libraries. Note that the tables
-    LibrariesStatus, AccountingStatus, PriceProductTables, PriceDiscountLevels, PriceUserGroups,
-    Platforms and LibrariesTypes are joined with libraries so that you can access their content via
-    the table name and field. Parameters allow choose the fields to select and filter as well as
-    additional operations such as GROUP_BY, etc.
-    @param select_string: mysql string to select fields
-    @param join_string: additional joins to be made
-    @param where_string: mysql string to filter by fields
-    @param where_values: values for the filtering
-    @param suffix: additional mysql appended after the where statement
-    @return: list of libraries
+    function queries the tracks of one or several flowcells and joins them with the tables libraries,
+    samples, clients and indexes in a single statement. it returns a list of dictionaries with one entry
+    per track which holds everything needed to build the lanes of a flowcell. a track without index
+    has None for the index fields. a track whose library, sample or client is missing is returned with
+    None for their fields and logged. if trackstatus is given, only tracks with these status ids are returned
+    @param fcids: integer or list of integers
+    @param trackstatus: tuple of integers
+    @return: list of dictionaries
     '''
-    def query_libraries_join_tables(self,select_string=None,join_string = '', where_string='true',where_values=[],suffix_string=''):
-        cursor = self.__conn.cursor(dictionary = True)
-        
+    def query_tracks_join_tables_with_flowcellids(self, fcids, trackstatus = None):
+        if isinstance(fcids, int): fcids = (fcids, )
+        if len(fcids) == 0 or (trackstatus is not None and len(trackstatus) == 0): return []
+        query = """
+        SELECT Tracks.ID AS TRACK_ID, Tracks.FLOWCELL_ID AS FLOWCELL_ID, Tracks.COMPARTMENT AS COMPARTMENT,
+        Tracks.LIBRARY_ID AS LIBRARY_ID, Tracks.TRACKSSTATUS_ID AS TRACKSSTATUS_ID, Libraries.ID AS LIBRARY_FOUND, Libraries.INDEX_ID AS INDEX_ID,
+        Libraries.SAMPLE_ID AS SAMPLE_ID, Samples.ID AS SAMPLE_FOUND, Samples.NAME AS SAMPLE_NAME, Samples.CLIENT_ID AS SAMPLE_CLIENT_ID, Clients.ID AS CLIENT_ID,
+        Indexes.NAME AS INDEX_NAME, Indexes.SEQ AS SEQ, Indexes.SEQ2 AS SEQ2
+        FROM Tracks
+        LEFT OUTER JOIN Libraries ON Tracks.LIBRARY_ID = Libraries.ID
+        LEFT OUTER JOIN Samples ON Libraries.SAMPLE_ID = Samples.ID
+        LEFT OUTER JOIN Clients ON Samples.CLIENT_ID = Clients.ID
+        LEFT OUTER JOIN Indexes ON Libraries.INDEX_ID = Indexes.ID
+        WHERE Tracks.FLOWCELL_ID IN ({0}) {1}
+        ORDER BY Tracks.FLOWCELL_ID, Tracks.COMPARTMENT, Tracks.ID
+        """
+        values = list(fcids)
+        statusstring = ''
+        if trackstatus is not None:
+            statusstring = 'AND Tracks.TRACKSSTATUS_ID IN ({0})'.format(','.join(['%s']*len(trackstatus)))
+            values.extend(trackstatus)
+        query = query.format(','.join(['%s']*len(fcids)), statusstring)
+        if self.__prepared: # the statement text only changes with the number of flowcells and track status
+            resultset = self.execute_prepared('query_tracks_join_tables_with_flowcellids', query, values)
+        else:
+            resultset = self.fetch_rows('query_tracks_join_tables_with_flowcellids', query, values)
+        for track in resultset:
+            if track['LIBRARY_FOUND'] is None:
+                self.show_log('warning', "track {0} of flowcell {1}: library {2} does not exist".format(track['TRACK_ID'], track['FLOWCELL_ID'], track['LIBRARY_ID']))
+            elif track['SAMPLE_FOUND'] is None:
+                self.show_log('warning', "track {0} of flowcell {1}: sample {2} of library {3} does not exist".format(track['TRACK_ID'], track['FLOWCELL_ID'], track['SAMPLE_ID'], track['LIBRARY_ID']))
+            elif track['CLIENT_ID'] is None:
+                self.show_log('warning', "track {0} of flowcell {1}: client {2} of sample {3} does not exist".format(track['TRACK_ID'], track['FLOWCELL_ID'], track['SAMPLE_CLIENT_ID'], track['SAMPLE_ID']))
+        return resultset
+
+    '''
+    function builds the query for the library table joined with the tables LibrariesStatus,
+    AccountingStatus, PriceProductTables, PriceDiscountLevels, PriceUserGroups, Platforms and
+    LibrariesTypes (see query_libraries_join_tables for the parameters)
+    @return: string
+    '''
+    def build_libraries_join_query(self, select_string = None, join_string = '', where_string = 'true', suffix_string = ''):
         # default fields to select
         if not select_string:
             select_string = """
@@ -257,7 +784,7 @@ class Database(object):
             """
         
         # build up query
-        query = """
+        return """
         SELECT {0} FROM Libraries 
         LEFT OUTER JOIN LibrariesStatus ON Libraries.LIBRARIESSTATUS_ID = LibrariesStatus.ID
         LEFT OUTER JOIN AccountingStatus ON Libraries.ACCOUNTINGSTATUS_ID = AccountingStatus.ID
@@ -270,13 +797,52 @@ class Database(object):
         WHERE {2} 
         {3} 
         """.format(select_string,join_string,where_string,suffix_string)
+
+    '''
+    function queries the library table and returns a list of libraries. Note that the tables
+    LibrariesStatus, AccountingStatus, PriceProductTables, PriceDiscountLevels, PriceUserGroups,
+    Platforms and LibrariesTypes are joined with libraries so that you can access their content via
+    the table name and field. Parameters allow choose the fields to select and filter as well as
+    additional operations such as GROUP_BY, etc.
+    @param select_string: mysql string to select fields
+    @param join_string: additional joins to be made
+    @param where_string: mysql string to filter by fields
+    @param where_values: values for the filtering
+    @param suffix: additional mysql appended after the where statement
+    @return: list of libraries
+    '''
+    def query_libraries_join_tables(self,select_string=None,join_string = '', where_string='true',where_values=[],suffix_string=''):
+        query = self.build_libraries_join_query(select_string, join_string, where_string, suffix_string)
                 
         # execute and return
-        cursor.execute(query,where_values)
-        resultset = cursor.fetchall()
-        cursor.close()
+        resultset = self.fetch_rows('query_libraries_join_tables', query, where_values)
         return resultset
 
+    '''
+    generator with the same parameters and rows as query_libraries_join_tables. it uses an unbuffered
+    cursor, so the rows are streamed from the server and fetched in chunks of chunksize rows. the
+    connection of the thread cannot be used for other queries until the generator is exhausted or closed;
+    remaining rows of a closed generator are read and discarded chunk by chunk
+    @param chunksize: integer
+    @return: generator of libraries
+    '''
+    def iterate_libraries_join_tables(self, select_string = None, join_string = '', where_string = 'true', where_values = [], suffix_string = '', chunksize = 1000):
+        cursor = self.get_cursor('iterate_libraries_join_tables', dictionary = True, buffered = False)
+        query = self.build_libraries_join_query(select_string, join_string, where_string, suffix_string)
+        exhausted = False
+        try:
+            cursor.execute(query, where_values)
+            while True:
+                rows = cursor.fetchmany(chunksize)
+                if len(rows) == 0:
+                    exhausted = True
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            while not exhausted and len(cursor.fetchmany(chunksize)) != 0: pass
+            cursor.close()
+
     '''
     function inserts a new flowcell into the database and returns 
     the id of the new database entry. Note that the correct ids for
@@ -321,15 +887,15 @@ class Database(object):
                         flowcell_status = 'fresh',
                         additional_information = None):
         
-        cursor = self.__conn.cursor()
+        cursor = self.get_cursor('insert_flowcell')
         query = """
         INSERT INTO Flowcells (CODE,FLOWCELLSTYPE_ID,PRODUCTION_DAY,PRODUCTION_MACHINE,SEQUENCING_DAY,SEQUENCING_MACHINE,BARCODING,NOTES,
         FLOWCELLSSTATUS_ID,NUMBER,RAW_DATA_PATH,RAW_DATA_STATUS,ARCHIVING_DATE,ARCHIVING_STATUS,ACTIVITY,MACHINE_ID,COMPARTMENT_COUNT,COMPARTMENT_CAPACITY,
         PIPELINING_STATUS,ADDITIONAL_INFORMATION)
-        (SELECT %s AS CODE,FlowcellsTypes.ID AS FC_TYPE_ID,%s AS PROD_DATE,Machines.NAME AS PROD_MACH,%s AS SEQ_DATE,Machines.NAME AS SEQ_MACH,%s AS IS_BC,%s AS NOTES,
+        SELECT %s AS CODE,FlowcellsTypes.ID AS FC_TYPE_ID,%s AS PROD_DATE,Machines.NAME AS PROD_MACH,%s AS SEQ_DATE,Machines.NAME AS SEQ_MACH,%s AS IS_BC,%s AS NOTES,
         FlowcellsStatus.ID AS FC_Status_ID,%s AS FC_NUMBER,%s AS FC_RAW_PATH,%s AS RAW_STATUS,%s AS ARCH_DATE,%s AS ARCH_STATUS,%s AS ACTIVITY,
         Machines.ID AS Machine_ID,%s AS COMP_CNT,%s AS COMP_CAPACITY,%s AS PIPE_STATUS,%s AS ADDIT_INFO 
-        FROM FlowcellsTypes LEFT JOIN Machines ON Machines.CODE = %s LEFT JOIN FlowcellsStatus ON FlowcellsStatus.NAME = %s WHERE FlowcellsTypes.NAME = %s)
+        FROM FlowcellsTypes LEFT JOIN Machines ON Machines.CODE = %s LEFT JOIN FlowcellsStatus ON FlowcellsStatus.NAME = %s WHERE FlowcellsTypes.NAME = %s
         """
         cursor.execute(query, (code, production_date, sequencing_date, "yes" if is_barcoded else "no",notes,
                                number,raw_data_path,None,archiving_date,archiving_status,activity,
@@ -383,16 +949,16 @@ class Database(object):
                     price_user_group = 'Extern',
                     activity = 1,
                     client_access = 1):
-        cursor = self.__conn.cursor()
+        cursor = self.get_cursor('insert_track')
         query = """
         INSERT INTO Tracks (FLOWCELL_ID,COMPARTMENT,LIBRARY_ID,TRACKSSTATUS_ID,CONTROL,RECIPE,MOLARITY,OPERATOR_ID,NOTES,COMPARTMENT_CONSUMPTION,
         ACCOUNTINGSTATUS_ID,ACCOUNTING_DATE,PRICE_PRODUCT_TABLE_ID,PRICE_DISCOUNT_LEVEL_ID,PRICE_USER_GROUP_ID,ACTIVITY,CLIENT_ACCESS)
-        (SELECT %s AS FC_ID,%s AS COMP,%s AS LIB_ID,TracksStatus.ID AS STATUS_ID,%s AS CTRL,%s AS REC,%s AS MOL,Operators.ID AS OPER_ID,%s AS NOTE,%s AS COMP_CONSUM,
+        SELECT %s AS FC_ID,%s AS COMP,%s AS LIB_ID,TracksStatus.ID AS STATUS_ID,%s AS CTRL,%s AS REC,%s AS MOL,Operators.ID AS OPER_ID,%s AS NOTE,%s AS COMP_CONSUM,
         AccountingStatus.ID AS ACCOUNT_ID,%s AS ACCOUNT_DATE,PriceProductTables.ID AS PRICE_ID,PriceDiscountLevels.ID AS DISCOUNT_ID,PriceUserGroups.ID AS USER_ID,
         %s AS ACTIV,%s AS ACCESS 
         FROM TracksStatus LEFT JOIN AccountingStatus ON AccountingStatus.NAME = %s LEFT JOIN PriceProductTables ON 
         PriceProductTables.NAME = %s LEFT JOIN PriceDiscountLevels ON PriceDiscountLevels.NAME = %s LEFT JOIN PriceUserGroups ON PriceUserGroups.NAME = %s 
-        LEFT JOIN Operators ON Operators.USERNAME = %s WHERE TracksStatus.NAME = %s)
+        LEFT JOIN Operators ON Operators.USERNAME = %s WHERE TracksStatus.NAME = %s
         """
         cursor.execute(query, (flowcell_id, compartment, library_id,control,recipe,molarity,notes,compartment_consumption,accounting_date,activity,client_access,
                                accounting_status,price_product_table,price_discount_level,price_user_group,operator,status))
@@ -401,24 +967,122 @@ class Database(object):
         
         return track_id
 
+    '''
+    function inserts several tracks into the database and returns the ids of the new entries in the
+    order of tracklist. each track is a dictionary with the parameters of insert_track (missing
+    optional parameters get the same defaults). the names of status, operator and price tables are
+    resolved in one query and the tracks are written with one multi-row INSERT per BATCH_SIZE tracks.
+    the ids are read back in the same transaction (new rows above the highest id before the insert with
+    flowcell, lane and library of the chunk), so they don't depend on consecutive auto increment values.
+    raises a mysql.connector.errors.DataError if a track status is unknown or not all rows were inserted
+    @param tracklist: list of dictionaries
+    @return: list of integers
+    '''
+    def insert_tracks_batch(self, tracklist):
+        if len(tracklist) == 0: return []
+        defaults = {'status': 'fresh', 'control': 'N', 'recipe': 'SE', 'molarity': 0, 'notes': None, 'compartment_consumption': 1,
+                    'accounting_status': 'open', 'accounting_date': None, 'price_discount_level': 'Basic', 'price_user_group': 'Extern',
+                    'activity': 1, 'client_access': 1}
+        tracklist = [dict(defaults, **track) for track in tracklist]
+
+        lookups = (('TracksStatus', 'NAME', 'status'), ('AccountingStatus', 'NAME', 'accounting_status'), ('PriceProductTables', 'NAME', 'price_product_table'),
+                   ('PriceDiscountLevels', 'NAME', 'price_discount_level'), ('PriceUserGroups', 'NAME', 'price_user_group'), ('Operators', 'USERNAME', 'operator'))
+        queries, values = [], []
+        for table, field, key in lookups:
+            names = sorted(set([track[key] for track in tracklist if track[key] is not None]))
+            if len(names) == 0: continue
+            queries.append("SELECT '{0}' AS TABLENAME, {1} AS NAME, ID FROM {0} WHERE {1} IN ({2})".format(table, field, ','.join(['%s']*len(names))))
+            values.extend(names)
+        cursor = self.get_cursor('insert_tracks_batch')
+        cursor.execute(' UNION ALL '.join(queries), values)
+        iddict = dict([((table, name), dbid) for table, name, dbid in cursor.fetchall()])
+
+        rows = []
+        for track in tracklist:
+            if ('TracksStatus', track['status']) not in iddict:
+                cursor.close()
+                raise mysql.connector.errors.DataError("track status '{0}' does not exist".format(track['status']))
+            rows.append((track['flowcell_id'], track['compartment'], track['library_id'], iddict[('TracksStatus', track['status'])], track['control'], track['recipe'],
+                         track['molarity'], iddict.get(('Operators', track['operator'])), track['notes'], track['compartment_consumption'],
+                         iddict.get(('AccountingStatus', track['accounting_status'])), track['accounting_date'], iddict.get(('PriceProductTables', track['price_product_table'])),
+                         iddict.get(('PriceDiscountLevels', track['price_discount_level'])), iddict.get(('PriceUserGroups', track['price_user_group'])),
+                         track['activity'], track['client_access']))
+
+        query = """
+        INSERT INTO Tracks (FLOWCELL_ID,COMPARTMENT,LIBRARY_ID,TRACKSSTATUS_ID,CONTROL,RECIPE,MOLARITY,OPERATOR_ID,NOTES,COMPARTMENT_CONSUMPTION,
+        ACCOUNTINGSTATUS_ID,ACCOUNTING_DATE,PRICE_PRODUCT_TABLE_ID,PRICE_DISCOUNT_LEVEL_ID,PRICE_USER_GROUP_ID,ACTIVITY,CLIENT_ACCESS)
+        VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+        """
+        cursor.execute('SELECT COALESCE(MAX(ID), 0) FROM Tracks')
+        lastid = cursor.fetchone()[0]
+        track_ids = []
+        for start in range(0, len(rows), Database.BATCH_SIZE):
+            chunk = rows[start:start + Database.BATCH_SIZE]
+            cursor.executemany(query, chunk) # rewritten to a single multi-row INSERT by the connector
+            if cursor.rowcount != len(chunk):
+                cursor.close()
+                raise mysql.connector.errors.DataError('{0} of {1} tracks were inserted'.format(cursor.rowcount, len(chunk)))
+
+            flowcellids = sorted(set([row[0] for row in chunk]))
+            cursor.execute('SELECT ID, FLOWCELL_ID, COMPARTMENT, LIBRARY_ID FROM Tracks WHERE ID > %s AND FLOWCELL_ID IN ({0}) ORDER BY ID'.format(','.join(['%s']*len(flowcellids))), [lastid] + flowcellids)
+            newids = defaultdict(list) # (flowcell, lane, library): ids in insert order
+            for dbid, flowcell_id, compartment, library_id in cursor.fetchall():
+                newids[(flowcell_id, compartment, library_id)].append(dbid)
+                lastid = max(lastid, dbid)
+            for key in newids: newids[key].reverse()
+            for row in chunk:
+                if len(newids[(row[0], row[1], row[2])]) == 0:
+                    cursor.close()
+                    raise mysql.connector.errors.DataError('id of the track of library {0} on flowcell {1} lane {2} not found after insert'.format(row[2], row[0], row[1]))
+                track_ids.append(newids[(row[0], row[1], row[2])].pop())
+        cursor.close()
+
+        return track_ids
+
     '''
     function attaches a product specified by a name to a flowcell.
     @param flowcell_id: the flowcell id
     @param product_name: the product name
     '''    
     def attach_product_to_flowcell_by_name(self,flowcell_id,product_name):
-        cursor = self.__conn.cursor()
-        query = 'INSERT INTO Flowcells_Products (FLOWCELL_ID,Product_ID)(SELECT %s AS FC_ID,Products.ID AS PROD_ID FROM Products WHERE NAME = %s)'
+        cursor = self.get_cursor('attach_product_to_flowcell_by_name')
+        query = 'INSERT INTO Flowcells_Products (FLOWCELL_ID,Product_ID) SELECT %s AS FC_ID,Products.ID AS PROD_ID FROM Products WHERE NAME = %s'
         cursor.execute(query, (flowcell_id, product_name))
         cursor.close()
 
+    '''
+    function attaches products specified by their names to flowcells. the product names are
+    resolved in one query and the rows are written with one multi-row INSERT per BATCH_SIZE rows.
+    raises a mysql.connector.errors.DataError if a product does not exist
+    @param productlist: list of tuples (flowcell_id, product_name)
+    @return: integer (number of attached products)
+    '''
+    def attach_products_to_flowcells_by_name_batch(self, productlist):
+        if len(productlist) == 0: return 0
+        names = sorted(set([name for flowcell_id, name in productlist]))
+        cursor = self.get_cursor('attach_products_to_flowcells_by_name_batch')
+        cursor.execute('SELECT NAME, ID FROM Products WHERE NAME IN ({0})'.format(','.join(['%s']*len(names))), names)
+        productdict = dict(cursor.fetchall())
+
+        missing = [name for name in names if name not in productdict]
+        if len(missing) != 0:
+            cursor.close()
+            raise mysql.connector.errors.DataError('products do not exist: {0}'.format(', '.join(missing)))
+
+        rows = [(flowcell_id, productdict[name]) for flowcell_id, name in productlist]
+        query = 'INSERT INTO Flowcells_Products (FLOWCELL_ID,Product_ID) VALUES (%s,%s)'
+        for start in range(0, len(rows), Database.BATCH_SIZE):
+            cursor.executemany(query, rows[start:start + Database.BATCH_SIZE])
+        cursor.close()
+        return len(rows)
+
     '''
     function attaches a product specified by a id to a flowcell.
     @param flowcell_id: the flowcell id
     @param product_id: the product id
     '''  
     def attach_product_to_flowcell_by_id(self,flowcell_id,product_id):
-        cursor = self.__conn.cursor()
+        cursor = self.get_cursor('attach_product_to_flowcell_by_id')
         query = 'INSERT INTO Flowcells_Products (FLOWCELL_ID,Product_ID) VALUES (%s,%s)'
         cursor.execute(query, (flowcell_id, product_id))
         cursor.close()
@@ -428,11 +1092,30 @@ class Database(object):
     @return: the name of the price product table
     '''  
     def query_price_product_table(self):
-        cursor = self.__conn.cursor(dictionary = True)
+        found, name = self.get_cache_entry('PriceProductTables', 'CURRENT_TABLE')
+        if found: return name
         query = 'SELECT NAME FROM PriceProductTables WHERE CURRENT_TABLE = 1;'
-        cursor.execute(query)
-        resultset = cursor.fetchone()
-        cursor.close()
+        resultset = self.fetch_rows('query_price_product_table', query, (), fetchone = True)
+        self.set_cache_entry('PriceProductTables', 'CURRENT_TABLE', resultset['NAME'])
         return resultset['NAME']
+
+    '''
+    function queries the price product tables and return a list of dictionaries
+    @return: list of dictionaries
+    '''
+    def query_price_product_tables(self):
+        query = ('SELECT * FROM PriceProductTables')
+        resultset = self.fetch_rows('query_price_product_tables', query, ())
+        return resultset
+
+    '''
+    function returns the checksums of tables as dictionary (table: checksum). the checksum changes
+    with every modification of the content. it is None for a table which does not exist
+    @param tables: list of strings
+    @return: dictionary
+    '''
+    def query_table_checksums(self, tables):
+        resultset = self.fetch_rows('query_table_checksums', 'CHECKSUM TABLE {0}'.format(', '.join(tables)))
+        return dict([(row['Table'].split('.')[-1], row['Checksum']) for row in resultset])
         
     
\ No newline at end of file
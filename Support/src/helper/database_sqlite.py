@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import sqlite3
+
+from random import Random
+
+from re import compile
+
+from zlib import crc32
+
+''' own modules '''
+from helper.database import Database
+
+'''
+schema of the LIMS tables used by the support tools. only the columns read or written by
+the Database class are created
+'''
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS Platforms (ID INTEGER PRIMARY KEY AUTOINCREMENT, NAME VARCHAR(64));
+CREATE TABLE IF NOT EXISTS Machines (ID INTEGER PRIMARY KEY AUTOINCREMENT, NAME VARCHAR(64), CODE VARCHAR(64), DEFAULT_STORAGE VARCHAR(255), PLATFORM_ID INTEGER);
+CREATE TABLE IF NOT EXISTS FlowcellsStatus (ID INTEGER PRIMARY KEY AUTOINCREMENT, NAME VARCHAR(64));
+CREATE TABLE IF NOT EXISTS FlowcellsTypes (ID INTEGER PRIMARY KEY AUTOINCREMENT, NAME VARCHAR(64));
+CREATE TABLE IF NOT EXISTS TracksStatus (ID INTEGER PRIMARY KEY AUTOINCREMENT, NAME VARCHAR(64));
+CREATE TABLE IF NOT EXISTS LibrariesStatus (ID INTEGER PRIMARY KEY AUTOINCREMENT, NAME VARCHAR(64));
+CREATE TABLE IF NOT EXISTS LibrariesTypes (ID INTEGER PRIMARY KEY AUTOINCREMENT, NAME VARCHAR(64));
+CREATE TABLE IF NOT EXISTS AccountingStatus (ID INTEGER PRIMARY KEY AUTOINCREMENT, NAME VARCHAR(64));
+CREATE TABLE IF NOT EXISTS PriceProductTables (ID INTEGER PRIMARY KEY AUTOINCREMENT, NAME VARCHAR(64), CURRENT_TABLE INTEGER DEFAULT 0);
+CREATE TABLE IF NOT EXISTS PriceDiscountLevels (ID INTEGER PRIMARY KEY AUTOINCREMENT, NAME VARCHAR(64));
+CREATE TABLE IF NOT EXISTS PriceUserGroups (ID INTEGER PRIMARY KEY AUTOINCREMENT, NAME VARCHAR(64));
+CREATE TABLE IF NOT EXISTS Operators (ID INTEGER PRIMARY KEY AUTOINCREMENT, USERNAME VARCHAR(64));
+CREATE TABLE IF NOT EXISTS Products (ID INTEGER PRIMARY KEY AUTOINCREMENT, NAME VARCHAR(255));
+CREATE TABLE IF NOT EXISTS Clients (ID VARCHAR(64) PRIMARY KEY, NAME VARCHAR(255));
+CREATE TABLE IF NOT EXISTS Samples (ID INTEGER PRIMARY KEY AUTOINCREMENT, NAME VARCHAR(255), CLIENT_ID VARCHAR(64));
+CREATE TABLE IF NOT EXISTS Indexes (ID INTEGER PRIMARY KEY AUTOINCREMENT, NAME VARCHAR(64), SEQ VARCHAR(32), SEQ2 VARCHAR(32));
+CREATE TABLE IF NOT EXISTS Libraries (ID INTEGER PRIMARY KEY AUTOINCREMENT, NAME VARCHAR(255), SAMPLE_ID INTEGER, CONCENTRATION FLOAT, VOLUME FLOAT,
+    DATE DATE, NOTES TEXT, INDEX_ID INTEGER, REQUESTED_SEQUENCING INTEGER, ACCOUNTING_DATE DATE, CLIENT_ACCESS INTEGER DEFAULT 1, ACTIVITY INTEGER DEFAULT 1,
+    LIBRARIESSTATUS_ID INTEGER, ACCOUNTINGSTATUS_ID INTEGER, PRICE_PRODUCT_TABLE_ID INTEGER, PRICE_DISCOUNT_LEVEL_ID INTEGER, PRICE_USER_GROUP_ID INTEGER,
+    PLATFORMS_ID INTEGER, LIBRARIESTYPES_ID INTEGER);
+CREATE TABLE IF NOT EXISTS Flowcells (ID INTEGER PRIMARY KEY AUTOINCREMENT, CODE VARCHAR(64), FLOWCELLSTYPE_ID INTEGER, PRODUCTION_DAY DATE,
+    PRODUCTION_MACHINE VARCHAR(64), SEQUENCING_DAY DATE, SEQUENCING_MACHINE VARCHAR(64), BARCODING VARCHAR(8), NOTES TEXT, FLOWCELLSSTATUS_ID INTEGER,
+    NUMBER VARCHAR(64), RAW_DATA_PATH VARCHAR(255), RAW_DATA_STATUS INTEGER, ARCHIVING_DATE DATE, ARCHIVING_STATUS INTEGER, ACTIVITY INTEGER,
+    MACHINE_ID INTEGER, COMPARTMENT_COUNT INTEGER, COMPARTMENT_CAPACITY FLOAT, PIPELINING_STATUS VARCHAR(16), ADDITIONAL_INFORMATION TEXT);
+CREATE TABLE IF NOT EXISTS Tracks (ID INTEGER PRIMARY KEY AUTOINCREMENT, FLOWCELL_ID INTEGER, COMPARTMENT INTEGER, LIBRARY_ID INTEGER,
+    TRACKSSTATUS_ID INTEGER, CONTROL VARCHAR(1), RECIPE VARCHAR(16), MOLARITY FLOAT, OPERATOR_ID INTEGER, NOTES TEXT, COMPARTMENT_CONSUMPTION FLOAT,
+    ACCOUNTINGSTATUS_ID INTEGER, ACCOUNTING_DATE DATE, PRICE_PRODUCT_TABLE_ID INTEGER, PRICE_DISCOUNT_LEVEL_ID INTEGER, PRICE_USER_GROUP_ID INTEGER,
+    ACTIVITY INTEGER, CLIENT_ACCESS INTEGER, READ_COUNT BIGINT, YIELD BIGINT, PERCENT_Q30 FLOAT);
+CREATE TABLE IF NOT EXISTS Flowcells_Products (ID INTEGER PRIMARY KEY AUTOINCREMENT, FLOWCELL_ID INTEGER, Product_ID INTEGER);
+"""
+
+'''
+Class wrapping a sqlite3 cursor so that it behaves like the mysql.connector cursors used by
+the Database class: %s placeholders, dictionary rows, column_names and the id of the first
+row as lastrowid of a multi-row insert
+'''
+class SqliteCursor(object):
+    PLACEHOLDER = compile('%s')
+    INSERTVALUES = compile(r'(?is)^\s*INSERT\s.+\sVALUES\s*(\(.+\))\s*$')
+
+    def __init__(self, cursor, dictionary = False):
+        self.__cursor = cursor
+        self.__dictionary = dictionary
+        self.__lastrowid = None
+
+    def __make_row(self, row):
+        if row is None or not self.__dictionary: return row
+        return dict(zip(self.get_column_names(), row))
+
+    def __iter__(self):
+        for row in self.__cursor:
+            yield self.__make_row(row)
+
+    def execute(self, query, values = ()):
+        self.__lastrowid = None
+        return self.__cursor.execute(self.PLACEHOLDER.sub('?', query), tuple(values))
+
+    '''
+    method executes an insert for several rows as one multi-row INSERT like the mysql connector does
+    '''
+    def executemany(self, query, rows):
+        rows = list(rows)
+        match = self.INSERTVALUES.match(query)
+        if match is None or len(rows) == 0:
+            self.__lastrowid = None
+            return self.__cursor.executemany(self.PLACEHOLDER.sub('?', query), rows)
+        values = [value for row in rows for value in row]
+        query = query[:match.start(1)] + ','.join([match.group(1)]*len(rows))
+        self.__cursor.execute(self.PLACEHOLDER.sub('?', query), values)
+        self.__lastrowid = self.__cursor.lastrowid - len(rows) + 1
+
+    def fetchone(self):
+        return self.__make_row(self.__cursor.fetchone())
+
+    def fetchmany(self, size = 1):
+        return [self.__make_row(row) for row in self.__cursor.fetchmany(size)]
+
+    def fetchall(self):
+        return [self.__make_row(row) for row in self.__cursor.fetchall()]
+
+    def close(self):
+        self.__cursor.close()
+
+    def get_column_names(self):
+        if self.__cursor.description is None: return ()
+        return tuple([column[0] for column in self.__cursor.description])
+
+    def get_lastrowid(self):
+        return self.__cursor.lastrowid if self.__lastrowid is None else self.__lastrowid
+
+    def get_rowcount(self):
+        return self.__cursor.rowcount
+
+    def get_description(self):
+        return self.__cursor.description
+
+    column_names = property(get_column_names)
+    lastrowid = property(get_lastrowid)
+    rowcount = property(get_rowcount)
+    description = property(get_description)
+
+'''
+Class wrapping a sqlite3 connection with the methods the Database class uses from a mysql connection
+'''
+class SqliteConnection(object):
+    def __init__(self, path):
+        self.__conn = sqlite3.connect(path)
+
+    def cursor(self, dictionary = False, prepared = False, buffered = None):
+        return SqliteCursor(self.__conn.cursor(), dictionary)
+
+    def ping(self, reconnect = False):
+        pass
+
+    def commit(self):
+        self.__conn.commit()
+
+    def rollback(self):
+        self.__conn.rollback()
+
+    def close(self):
+        self.__conn.close()
+
+    def executescript(self, script):
+        self.__conn.executescript(script)
+
+    def get_in_transaction(self):
+        return self.__conn.in_transaction
+
+    in_transaction = property(get_in_transaction)
+
+'''
+Class providing the Database API on a local SQLite file (or ':memory:') for offline runs, profiling
+and load tests. The schema is created with create_schema, fixtures can be loaded with load_fixtures
+and synthetic data at production-like volumes is built by create_synthetic_fixtures. Each thread
+opens its own connection, an in memory database is therefore only visible in the creating thread.
+'''
+class SqliteDatabase(Database):
+    def __init__(self, path, **kwargs):
+        kwargs['pool_size'] = 0
+        Database.__init__(self, None, None, None, path, **kwargs)
+        self.__path = path
+
+    def open_connection(self):
+        return SqliteConnection(self.__path)
+
+    '''
+    sqlite has no CHECKSUM TABLE, the checksum is a crc32 over all rows ordered by ID
+    @param tables: list of strings
+    @return: dictionary
+    '''
+    def query_table_checksums(self, tables):
+        cursor = self.get_cursor('query_table_checksums')
+        checksums = {}
+        for table in tables:
+            try:
+                cursor.execute('SELECT * FROM {0} ORDER BY ID'.format(table))
+            except sqlite3.OperationalError:
+                checksums[table] = None
+                continue
+            checksums[table] = crc32(repr(cursor.fetchall()).encode())
+        cursor.close()
+        return checksums
+
+    '''
+    function creates the tables of the LIMS schema if they do not exist
+    '''
+    def create_schema(self):
+        self.get_connection().executescript(SCHEMA)
+        self.show_log('info', "sqlite schema created in '{0}'".format(self.__path))
+
+    '''
+    function inserts the rows of a fixture dictionary and commits them. the dictionary has
+    the table names as keys and lists of dictionaries (column: value) as values
+    @param fixtures: dictionary
+    '''
+    def load_fixtures(self, fixtures):
+        cursor = self.get_cursor('load_fixtures')
+        for table, rows in fixtures.items():
+            if len(rows) == 0: continue
+            columns = sorted(rows[0].keys())
+            query = 'INSERT INTO {0} ({1}) VALUES ({2})'.format(table, ','.join(columns), ','.join(['%s']*len(columns)))
+            for start in range(0, len(rows), Database.BATCH_SIZE):
+                cursor.executemany(query, [tuple([row[column] for column in columns]) for row in rows[start:start + Database.BATCH_SIZE]])
+            self.show_log('debug', "{0} rows loaded into '{1}'".format(len(rows), table))
+        cursor.close()
+        self.commitConnection()
+
+'''
+    Method builds a fixture dictionary with reference tables and synthetic flowcells, tracks,
+    libraries, samples and clients. Each flowcell has lanes lanes with tracks_per_lane tracks,
+    each track its own library with a dual index out of a pool of indexes unique barcodes.
+    The flowcell directories are expected below storage/machine name.
+    @param flowcells: integer
+    @param lanes: integer
+    @param tracks_per_lane: integer
+    @param indexes: integer
+    @param clients: integer
+    @param storage: string
+    @param seed: integer
+    @return: dictionary
+'''
+def create_synthetic_fixtures(flowcells = 10, lanes = 8, tracks_per_lane = 96, indexes = 384, clients = 20, storage = '/tmp/sequencing', seed = 0):
+    rand = Random(seed)
+    fixtures = {
+        'Platforms': [{'ID': 1, 'NAME': 'Illumina'}, {'ID': 3, 'NAME': 'PacBio'}],
+        'Machines': [{'ID': 1, 'NAME': 'Novaseq', 'CODE': 'A00000', 'DEFAULT_STORAGE': '{0}/Novaseq'.format(storage), 'PLATFORM_ID': 1},
+                     {'ID': 2, 'NAME': 'Sequel', 'CODE': '54000', 'DEFAULT_STORAGE': '{0}/Sequel'.format(storage), 'PLATFORM_ID': 3}],
+        'FlowcellsStatus': [{'ID': 1, 'NAME': 'fresh'}, {'ID': 2, 'NAME': 'on sequencer'}, {'ID': 3, 'NAME': 'finished'}],
+        'FlowcellsTypes': [{'ID': 1, 'NAME': 'HiSeq SE'}, {'ID': 2, 'NAME': 'NovaSeq S4'}, {'ID': 3, 'NAME': 'PacBio Sequel SMRT Cell'}],
+        'TracksStatus': [{'ID': 1, 'NAME': 'fresh'}, {'ID': 2, 'NAME': 'on sequencer'}, {'ID': 3, 'NAME': 'finished'}],
+        'LibrariesStatus': [{'ID': 1, 'NAME': 'fresh'}],
+        'LibrariesTypes': [{'ID': 1, 'NAME': 'RNA-Seq'}],
+        'AccountingStatus': [{'ID': 1, 'NAME': 'open'}, {'ID': 2, 'NAME': 'done'}],
+        'PriceProductTables': [{'ID': 1, 'NAME': '2018', 'CURRENT_TABLE': 0}, {'ID': 2, 'NAME': '2019', 'CURRENT_TABLE': 1}],
+        'PriceDiscountLevels': [{'ID': 1, 'NAME': 'Basic'}],
+        'PriceUserGroups': [{'ID': 1, 'NAME': 'Extern'}, {'ID': 2, 'NAME': 'Intern'}],
+        'Operators': [{'ID': 1, 'USERNAME': 'pacbio'}, {'ID': 2, 'USERNAME': 'illumina'}],
+        'Products': [{'ID': 1, 'NAME': 'NovaSeq S4 300 cycles'}],
+        'Clients': [], 'Samples': [], 'Indexes': [], 'Libraries': [], 'Flowcells': [], 'Tracks': []
+        }
+
+    barcodes = set()
+    while len(barcodes) < indexes:
+        barcodes.add((''.join([rand.choice('ACGT') for i in range(8)]), ''.join([rand.choice('ACGT') for i in range(8)])))
+    for dbid, (seq, seq2) in enumerate(sorted(barcodes), 1):
+        fixtures['Indexes'].append({'ID': dbid, 'NAME': 'IDX_{0}'.format(dbid), 'SEQ': seq, 'SEQ2': seq2})
+
+    for i in range(1, clients + 1):
+        fixtures['Clients'].append({'ID': 'client{0}'.format(i), 'NAME': 'Client {0}'.format(i)})
+
+    libid, trackid = 0, 0
+    for fcid in range(1, flowcells + 1):
+        code = 'H{0:04d}DSXX'.format(fcid)
+        fixtures['Flowcells'].append({'ID': fcid, 'CODE': code, 'FLOWCELLSTYPE_ID': 2, 'FLOWCELLSSTATUS_ID': rand.choice((2, 3)), 'PIPELINING_STATUS': 'open',
+                                      'MACHINE_ID': 1, 'NUMBER': 'A00000_{0:04d}'.format(fcid), 'ACTIVITY': 1, 'COMPARTMENT_COUNT': lanes, 'COMPARTMENT_CAPACITY': 1,
+                                      'RAW_DATA_PATH': '{0}/Novaseq/190101_A00000_{1:04d}_A{2}'.format(storage, fcid, code)})
+        for lane in range(1, lanes + 1):
+            for indexid in rand.sample(range(1, indexes + 1), min(tracks_per_lane, indexes)):
+                libid += 1
+                trackid += 1
+                client = 'client{0}'.format(rand.randint(1, clients))
+                fixtures['Samples'].append({'ID': libid, 'NAME': 'sample {0}'.format(libid), 'CLIENT_ID': client})
+                fixtures['Libraries'].append({'ID': libid, 'NAME': 'L{0}'.format(libid), 'SAMPLE_ID': libid, 'INDEX_ID': indexid, 'CLIENT_ACCESS': 1, 'ACTIVITY': 1,
+                                              'LIBRARIESSTATUS_ID': 1, 'ACCOUNTINGSTATUS_ID': 1, 'PRICE_PRODUCT_TABLE_ID': 2, 'PRICE_DISCOUNT_LEVEL_ID': 1,
+                                              'PRICE_USER_GROUP_ID': 1, 'PLATFORMS_ID': 1, 'LIBRARIESTYPES_ID': 1})
+                fixtures['Tracks'].append({'ID': trackid, 'FLOWCELL_ID': fcid, 'COMPARTMENT': lane, 'LIBRARY_ID': libid, 'TRACKSSTATUS_ID': 2, 'CONTROL': 'N',
+                                           'RECIPE': 'PE', 'MOLARITY': 0, 'OPERATOR_ID': 2, 'ACCOUNTINGSTATUS_ID': 1, 'PRICE_PRODUCT_TABLE_ID': 2,
+                                           'PRICE_DISCOUNT_LEVEL_ID': 1, 'PRICE_USER_GROUP_ID': 1, 'ACTIVITY': 1, 'CLIENT_ACCESS': 1})
+    return fixtures
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    from helper.helper_logger import MainLogger
+
+    parser = ArgumentParser(description = 'Creates a SQLite file with the LIMS schema and synthetic fixtures for offline runs and benchmarks.')
+    parser.add_argument('sqlitefile', metavar = 'FILE', help = 'SQLite file to create or extend')
+    parser.add_argument('-f', '--flowcells', dest = 'flowcells', type = int, default = 10, help = 'number of flowcells (default: %(default)s)')
+    parser.add_argument('-l', '--lanes', dest = 'lanes', type = int, default = 8, help = 'number of lanes per flowcell (default: %(default)s)')
+    parser.add_argument('-t', '--tracks', dest = 'tracks', type = int, default = 96, help = 'number of tracks per lane (default: %(default)s)')
+    parser.add_argument('-s', '--storage', dest = 'storage', type = str, default = '/tmp/sequencing', help = 'storage path of the machines (default: %(default)s)')
+    options = parser.parse_args()
+
+    mainlog = MainLogger('support')
+    dbinst = SqliteDatabase(options.sqlitefile)
+    dbinst.create_schema()
+    dbinst.load_fixtures(create_synthetic_fixtures(options.flowcells, options.lanes, options.tracks, storage = options.storage))
+    dbinst.closeConnection()
+    mainlog.close()
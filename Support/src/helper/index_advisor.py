@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import logging
+
+from datetime import datetime
+
+from inspect import getmembers
+from inspect import isfunction
+from inspect import Parameter
+from inspect import signature
+
+from re import compile
+from re import IGNORECASE
+
+'''
+Class calling the read methods of the Database class with representative arguments, capturing their
+statements without running them (the registry hands out RecordingCursors) and running EXPLAIN for each of them. Tables read with a full scan (type ALL) and statements
+needing a filesort or a temporary table are flagged. For flagged tables a secondary index on the
+filtered, joined and ordered columns is recommended, unless SHOW INDEX lists one already.
+'''
+class IndexAdvisor(object):
+    # every query_* and iterate_* method of the Database class is a read method
+    PREFIXES = ('query_', 'iterate_')
+    # read methods which are no SELECT and must not run on the server just to be explained
+    EXCLUDED = ('query_table_checksums', )
+    # values of the required parameters of the read methods by name, they don't need to exist for EXPLAIN.
+    # the statements are not run, so a high-water mark of 0 doesn't read the whole table
+    ARGUMENTS = {
+        'fcid': 1, 'fcids': [1, 2], 'fcstatus': 2, 'pipelinestatus': 'open', 'raw_data_path': '/raw/data/path',
+        'libid': 1, 'libids': [1, 2], 'sampleid': 1, 'sampleids': [1, 2], 'clientid': 1, 'clientids': [1, 2],
+        'indexid': 1, 'indexids': [1, 2], 'machineid': 1, 'machineids': [1, 2], 'last_id': 0}
+    # keyword arguments of the read methods whose defaults don't filter on anything
+    KEYWORDS = {
+        'query_tracks_join_tables_with_flowcellids': {'trackstatus': (1, 2)},
+        'query_libraries_join_tables': {'where_string': 'Libraries.ID IN (%s, %s)', 'where_values': [1, 2]},
+        'iterate_libraries_join_tables': {'where_string': 'Libraries.ID IN (%s, %s)', 'where_values': [1, 2]}}
+    MAXCOLUMNS = 3
+
+    CLAUSE = compile(r'\bFROM\b(.*?)(?:\bORDER\s+BY\b(.*?))?(?:\bLIMIT\b.*)?$', IGNORECASE)
+    FROMTABLE = compile(r'\bFROM\s+(\w+)', IGNORECASE)
+    JOINPAIR = compile(r'(\w+)\.(\w+)\s*=\s*(\w+)\.(\w+)')
+    JOINCLAUSE = compile(r'\bJOIN\s+(\w+)\s+ON\s+(\w+)\.(\w+)\s*=\s*(\w+)\.(\w+)', IGNORECASE)
+    CONDITION = compile(r'(?:(\w+)\.)?(\w+)\s*(=|\bIN\b|<=|>=|<|>|\bLIKE\b)', IGNORECASE)
+    ORDERCOLUMN = compile(r'(?:(\w+)\.)?(\w+)')
+
+    def __init__(self, dbinst):
+        self.__dbinst = dbinst
+        self.__findings = []
+        self.__recommendations = []
+        self.__logger = logging.getLogger('support.index_advisor')
+
+    def show_log(self, level, message):
+        if level == 'debug':
+            self.__logger.debug(message)
+        elif level == 'info':
+            self.__logger.info(message)
+        elif level == 'warning':
+            self.__logger.warning(message)
+        elif level == 'error':
+            self.__logger.error(message)
+        elif level == 'critical':
+            self.__logger.critical(message)
+
+    '''
+    function builds the representative calls from the read methods (query_* and iterate_*) of the
+    database instance, one call per method. required parameters get their value from ARGUMENTS, the
+    others keep their defaults unless KEYWORDS replaces them
+    @return: list of tuples (method, args, kwargs)
+    '''
+    def get_representative_calls(self):
+        calls = []
+        for method, function in getmembers(type(self.__dbinst), isfunction):
+            if not method.startswith(IndexAdvisor.PREFIXES) or method in IndexAdvisor.EXCLUDED: continue
+            args = []
+            for name, parameter in list(signature(function).parameters.items())[1:]:
+                if parameter.default is not Parameter.empty: continue
+                if name not in IndexAdvisor.ARGUMENTS: raise ValueError("no representative value for parameter '{0}' of '{1}'".format(name, method))
+                args.append(IndexAdvisor.ARGUMENTS[name])
+            calls.append((method, tuple(args), IndexAdvisor.KEYWORDS.get(method, {})))
+        return calls
+
+    '''
+    function makes the representative calls with statement capture and dryrun switched on and returns the
+    captured SELECT statements as list of tuples (method, query, values). the statements are not run, the
+    read methods see no rows (a method failing on the empty result is captured anyway)
+    @return: list of tuples
+    '''
+    def capture_statements(self):
+        registry = self.__dbinst.get_registry()
+        if registry is None: raise ValueError('the database instance is not instrumented, statements cannot be captured')
+        registry.set_capture(True)
+        registry.set_dryrun(True)
+        try:
+            for method, args, kwargs in self.get_representative_calls():
+                self.__dbinst.invalidate_cache() # cached lookups must reach the database, also after the calls filling the cache
+                try:
+                    result = getattr(self.__dbinst, method)(*args, **kwargs)
+                    if method.startswith('iterate_'): list(result) # generators run their query when consumed
+                except (TypeError, KeyError, IndexError) as err: # the statement is captured before the method reads the empty result
+                    self.show_log('debug', '{0} does not handle an empty result: {1}'.format(method, err))
+        finally:
+            registry.set_dryrun(False)
+            registry.set_capture(False)
+        return [entry for entry in registry.get_captured() if entry[1].lstrip().upper().startswith('SELECT')]
+
+    '''
+    function returns the columns of a statement which are compared with a value or used to look up
+    the joined table of a join and the columns of the order by clause, both as dictionary (table: list of columns)
+    @param query: string
+    @return: tuple(dictionary, dictionary)
+    '''
+    def get_statement_columns(self, query):
+        query = ' '.join(query.split())
+        clause = IndexAdvisor.CLAUSE.search(query)
+        if clause is None: return {}, {}
+        fromtable = IndexAdvisor.FROMTABLE.search(query).group(1)
+        conditions, order = clause.group(1), clause.group(2) or ''
+
+        filtercolumns, ordercolumns = {}, {}
+        def add_column(columndict, table, column):
+            columns = columndict.setdefault(table or fromtable, [])
+            if column not in columns: columns.append(column)
+        for table, column, operator in IndexAdvisor.CONDITION.findall(IndexAdvisor.JOINPAIR.sub(' ', conditions)): # columns compared with values first
+            add_column(filtercolumns, table, column)
+        for joined, table1, column1, table2, column2 in IndexAdvisor.JOINCLAUSE.findall(conditions): # only the column of the joined table is looked up
+            if table1 == joined: add_column(filtercolumns, table1, column1)
+            if table2 == joined: add_column(filtercolumns, table2, column2)
+        for table, column in IndexAdvisor.ORDERCOLUMN.findall(order):
+            if column.upper() not in ('ASC', 'DESC'): add_column(ordercolumns, table, column)
+        return filtercolumns, ordercolumns
+
+    '''
+    function runs EXPLAIN for a statement and returns the rows of the plan
+    @param query: string
+    @param values: tuple or list
+    @return: list of dictionaries
+    '''
+    def explain(self, query, values):
+        cursor = self.__dbinst.get_cursor('explain', dictionary = True)
+        cursor.execute('EXPLAIN {0}'.format(query), values)
+        resultset = cursor.fetchall()
+        cursor.close()
+        return resultset
+
+    '''
+    function returns the indexes of a table as dictionary (index name: list of columns)
+    @param table: string
+    @return: dictionary
+    '''
+    def query_table_indexes(self, table):
+        cursor = self.__dbinst.get_cursor('show_index', dictionary = True)
+        cursor.execute('SHOW INDEX FROM {0}'.format(table))
+        resultset = cursor.fetchall()
+        cursor.close()
+        indexdict = {}
+        for row in sorted(resultset, key = lambda row: (row['Key_name'], row['Seq_in_index'])):
+            indexdict.setdefault(row['Key_name'], []).append(row['Column_name'])
+        return indexdict
+
+    '''
+    function explains the captured statements and collects the findings (full scans, filesorts and
+    temporary tables) and the recommended indexes
+    @return: list of dictionaries (recommendations)
+    '''
+    def analyse(self):
+        self.__findings, self.__recommendations = [], []
+        indexcache = {}
+        for method, query, values in self.capture_statements():
+            filtercolumns, ordercolumns = self.get_statement_columns(query)
+            for row in self.explain(query, values):
+                table, extra = row.get('table'), row.get('Extra') or ''
+                problems = []
+                if row.get('type') == 'ALL': problems.append('full table scan')
+                if 'filesort' in extra: problems.append('filesort')
+                if 'temporary' in extra: problems.append('temporary table')
+                if len(problems) == 0 or table is None or table.startswith('<'): continue
+                self.__findings.append({'method': method, 'table': table, 'problems': problems, 'rows': row.get('rows'), 'query': ' '.join(query.split())})
+                self.show_log('warning', "{0}: {1} on table '{2}' ({3} rows)".format(method, ', '.join(problems), table, row.get('rows')))
+
+                columns = [column for column in filtercolumns.get(table, []) if column != 'ID']
+                if 'filesort' in problems: columns.extend([column for column in ordercolumns.get(table, []) if column not in columns])
+                columns = columns[:IndexAdvisor.MAXCOLUMNS]
+                if len(columns) == 0: continue # nothing to filter on, e.g. the lookup tables
+
+                if table not in indexcache: indexcache[table] = self.query_table_indexes(table)
+                existing = [name for name, indexcolumns in indexcache[table].items() if indexcolumns[:len(columns)] == columns]
+                if len(existing) != 0: continue
+                if (table, columns) in [(entry['table'], entry['columns']) for entry in self.__recommendations]: continue
+                leading = [name for name, indexcolumns in indexcache[table].items() if indexcolumns[0] == columns[0]]
+                self.__recommendations.append({'table': table, 'columns': columns, 'method': method, 'problems': problems, 'leading': leading})
+        return self.__recommendations
+
+    '''
+    function writes the recommended indexes as sql migration. recommendations whose leading column is
+    indexed already are written as comment, they need a look at the selectivity first
+    @param filename: string
+    '''
+    def write_migration(self, filename):
+        lines = ['-- index recommendations of index_advisor.py, {0}'.format(datetime.now().strftime('%Y-%m-%d %H:%M:%S'))]
+        if len(self.__recommendations) == 0: lines.append('-- no missing indexes found')
+        for entry in self.__recommendations:
+            name = 'idx_{0}_{1}'.format(entry['table'], '_'.join(entry['columns'])).lower()[:64]
+            statement = 'CREATE INDEX {0} ON {1} ({2});'.format(name, entry['table'], ', '.join(entry['columns']))
+            lines.append('')
+            lines.append('-- {0}: {1}'.format(entry['method'], ', '.join(entry['problems'])))
+            if len(entry['leading']) != 0:
+                lines.append('-- leading column is indexed by {0} already'.format(', '.join(entry['leading'])))
+                statement = '-- {0}'.format(statement)
+            lines.append(statement)
+        with open(filename, 'w') as fileout:
+            fileout.write('\n'.join(lines) + '\n')
+        self.show_log('info', "{0} index recommendations written to '{1}'".format(len(self.__recommendations), filename))
+
+    def get_findings(self):
+        return self.__findings
+
+    def get_recommendations(self):
+        return self.__recommendations
+
+    findings = property(get_findings)
+    recommendations = property(get_recommendations)
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    from helper.helper_logger import MainLogger
+    from helper.database import Database
+    from helper.support_information import SupportInformation as SI
+
+    parser = ArgumentParser(description = 'Explains the queries of the support tools and writes recommended indexes as sql migration.')
+    parser.add_argument('-o', '--output', dest = 'output', metavar = 'FILE', type = str, default = 'index_migration.sql', help = 'sql migration file (default: %(default)s)')
+    options = parser.parse_args()
+
+    mainlog = MainLogger('support')
+    dbinst = Database(SI.DB_HOST, SI.DB_USER, SI.DB_PW, SI.DB)
+    if not dbinst.setConnection():
+        mainlog.close()
+        exit(2)
+    advisor = IndexAdvisor(dbinst)
+    advisor.analyse()
+    advisor.write_migration(options.output)
+    dbinst.closeConnection()
+    mainlog.close()
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import json
+import logging
+import threading
+
+from collections import OrderedDict
+
+from time import perf_counter
+
+'''
+    Method estimates the number of bytes of a fetched row (tuple or dictionary). strings and bytes
+    count with their length, all other values with 8 bytes
+    @param row: tuple or dictionary
+    @return: integer
+'''
+def get_rowsize(row):
+    if isinstance(row, dict): row = row.values()
+    size = 0
+    for value in row:
+        if isinstance(value, (str, bytes, bytearray)): size += len(value)
+        elif value is not None: size += 8
+    return size
+
+'''
+Class collecting the wall time, number of rows and fetched bytes per database method.
+Statements slower than slow_threshold seconds are logged with their SQL and parameters
+and kept (at most maxslow) for the JSON dump. If capture is switched on, the first parameters
+of every distinct statement are kept as well (e.g. to EXPLAIN them later). With dryrun the database
+hands out RecordingCursors, so the statements are captured without running them.
+'''
+class QueryRegistry(object):
+    def __init__(self, slow_threshold = 1.0, maxslow = 100):
+        self.__slow_threshold = slow_threshold
+        self.__maxslow = maxslow
+        self.__methods = {}
+        self.__slow = []
+        self.__capture = False
+        self.__dryrun = False
+        self.__captured = OrderedDict() # (method, query): values
+        self.__lock = threading.Lock()
+        self.__logger = logging.getLogger('support.query_registry')
+
+    def show_log(self, level, message):
+        if level == 'debug':
+            self.__logger.debug(message)
+        elif level == 'info':
+            self.__logger.info(message)
+        elif level == 'warning':
+            self.__logger.warning(message)
+        elif level == 'error':
+            self.__logger.error(message)
+        elif level == 'critical':
+            self.__logger.critical(message)
+
+    def __get_entry(self, method):
+        entry = self.__methods.get(method)
+        if entry is None:
+            entry = {'calls': 0, 'errors': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0, 'bytes': 0, 'slow': 0}
+            self.__methods[method] = entry
+        return entry
+
+    '''
+    method adds one statement of a database method to the registry, failed statements are counted as errors
+    @param method: string
+    @param seconds: float
+    @param rows: integer
+    @param statements: list of tuples (query, values)
+    @param failed: boolean
+    '''
+    def record(self, method, seconds, rows, statements, failed = False):
+        with self.__lock:
+            entry = self.__get_entry(method)
+            entry['calls'] += 1
+            if failed: entry['errors'] += 1
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+            entry['rows'] += rows
+            if self.__capture:
+                for query, values in statements:
+                    if (method, query) not in self.__captured: self.__captured[(method, query)] = values
+            if seconds < self.__slow_threshold: return
+            entry['slow'] += 1
+            slow = {'method': method, 'seconds': seconds, 'rows': rows, 'failed': failed, 'statements': [(' '.join(query.split()), repr(values)) for query, values in statements]}
+            self.__slow.append(slow)
+            if len(self.__slow) > self.__maxslow: self.__slow.pop(0)
+        for query, values in slow['statements']:
+            self.show_log('warning', "slow query: {0} took {1:.3f}s ({2} rows{3}) SQL: {4} PARAMS: {5}".format(method, seconds, rows, ', failed' if failed else '', query, values))
+
+    '''
+    method adds the rows and bytes fetched by a database method and the time spent fetching them
+    @param method: string
+    @param seconds: float
+    @param rows: integer
+    @param nbytes: integer
+    '''
+    def record_fetched(self, method, seconds, rows, nbytes):
+        with self.__lock:
+            entry = self.__get_entry(method)
+            entry['seconds'] += seconds
+            entry['rows'] += rows
+            entry['bytes'] += nbytes
+
+    '''
+    method returns the statistics per method with the mean time per call
+    @return: dictionary
+    '''
+    def get_stats(self):
+        with self.__lock:
+            stats = {}
+            for method, entry in self.__methods.items():
+                stats[method] = dict(entry)
+                stats[method]['mean_seconds'] = entry['seconds'] / max(entry['calls'], 1)
+            return stats
+
+    def get_slow_queries(self):
+        with self.__lock:
+            return list(self.__slow)
+
+    '''
+    method returns the captured statements as list of tuples (method, query, values)
+    @return: list of tuples
+    '''
+    def get_captured(self):
+        with self.__lock:
+            return [(method, query, values) for (method, query), values in self.__captured.items()]
+
+    def reset(self):
+        with self.__lock:
+            self.__methods = {}
+            self.__slow = []
+            self.__captured = OrderedDict()
+
+    '''
+    method writes the statistics and the slow queries as json file
+    @param filename: string
+    '''
+    def dump_json(self, filename):
+        with open(filename, 'w') as fileout:
+            json.dump({'slow_threshold': self.__slow_threshold, 'methods': self.get_stats(), 'slow_queries': self.get_slow_queries()}, fileout, indent = 2, sort_keys = True)
+        self.show_log('info', "query statistics written to '{0}'".format(filename))
+
+    def get_slow_threshold(self):
+        return self.__slow_threshold
+
+    def set_slow_threshold(self, seconds):
+        self.__slow_threshold = seconds
+
+    def get_capture(self):
+        return self.__capture
+
+    def set_capture(self, capture):
+        self.__capture = capture
+
+    def get_dryrun(self):
+        return self.__dryrun
+
+    def set_dryrun(self, dryrun):
+        self.__dryrun = dryrun
+
+    slow_threshold = property(get_slow_threshold, set_slow_threshold)
+    capture = property(get_capture, set_capture)
+    dryrun = property(get_dryrun, set_dryrun)
+
+
+'''
+Class wrapping a database cursor. Every statement is recorded in the registry under the method name as
+soon as the driver returns or raises, so failed statements are counted as well. The rows and bytes fetched
+through the cursor are summed up and added with the next statement or when the cursor is closed
+'''
+class InstrumentedCursor(object):
+    def __init__(self, cursor, registry, method):
+        self.__cursor = cursor
+        self.__registry = registry
+        self.__method = method
+        self.__seconds = 0.0
+        self.__rows = 0
+        self.__bytes = 0
+
+    def __getattr__(self, name):
+        return getattr(self.__cursor, name)
+
+    def __iter__(self):
+        iterator = iter(self.__cursor)
+        while True:
+            start = perf_counter()
+            try:
+                row = next(iterator)
+            except StopIteration:
+                self.__seconds += perf_counter() - start
+                return
+            self.__add_rows((row, ), start)
+            yield row
+
+    def __add_rows(self, rows, start):
+        self.__seconds += perf_counter() - start
+        self.__rows += len(rows)
+        for row in rows:
+            self.__bytes += get_rowsize(row)
+
+    def __flush_fetched(self):
+        if self.__rows == 0 and self.__seconds == 0.0: return
+        self.__registry.record_fetched(self.__method, self.__seconds, self.__rows, self.__bytes)
+        self.__seconds, self.__rows, self.__bytes = 0.0, 0, 0
+
+    def __get_written(self):
+        if self.__cursor.description is None and self.__cursor.rowcount > 0: return self.__cursor.rowcount
+        return 0
+
+    '''
+    method runs a statement through the driver and records it, also if the driver raises
+    @param function: driver method
+    @param query: string
+    @param values: tuple or list of values
+    @param recorded: values kept for the registry
+    @return: result of the driver method
+    '''
+    def __run(self, function, query, values, recorded):
+        self.__flush_fetched()
+        start = perf_counter()
+        failed = True
+        try:
+            result = function(query, values)
+            failed = False
+            return result
+        finally:
+            self.__registry.record(self.__method, perf_counter() - start, 0 if failed else self.__get_written(), [(query, recorded)], failed)
+
+    def execute(self, query, values = ()):
+        return self.__run(self.__cursor.execute, query, values, values)
+
+    def executemany(self, query, rows):
+        # the rows are only kept if the statements are captured, otherwise their number is enough
+        return self.__run(self.__cursor.executemany, query, rows, rows if self.__registry.get_capture() else '{0} rows'.format(len(rows)))
+
+    def fetchone(self):
+        start = perf_counter()
+        row = self.__cursor.fetchone()
+        self.__add_rows((row, ) if row is not None else (), start)
+        return row
+
+    def fetchmany(self, size = 1):
+        start = perf_counter()
+        rows = self.__cursor.fetchmany(size)
+        self.__add_rows(rows, start)
+        return rows
+
+    def fetchall(self):
+        start = perf_counter()
+        rows = self.__cursor.fetchall()
+        self.__add_rows(rows, start)
+        return rows
+
+    def close(self):
+        self.__flush_fetched()
+        return self.__cursor.close()
+
+
+'''
+Class standing in for a database cursor while the registry is in dryrun. The statements are recorded
+in the registry under the method name but never sent to the server, every fetch returns no rows
+'''
+class RecordingCursor(object):
+    def __init__(self, registry, method):
+        self.__registry = registry
+        self.__method = method
+        self.description = None
+        self.rowcount = 0
+        self.lastrowid = None
+        self.column_names = ()
+
+    def __iter__(self):
+        return iter([])
+
+    def execute(self, query, values = ()):
+        self.__registry.record(self.__method, 0.0, 0, [(query, values)])
+
+    def executemany(self, query, rows):
+        self.__registry.record(self.__method, 0.0, 0, [(query, rows)])
+
+    def fetchone(self):
+        return None
+
+    def fetchmany(self, size = 1):
+        return []
+
+    def fetchall(self):
+        return []
+
+    def close(self):
+        pass
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import fcntl
+import json
+import logging
+
+from datetime import date
+from datetime import datetime
+
+from decimal import Decimal
+
+from os import fdopen
+from os import remove
+from os import replace
+from os.path import dirname
+from os.path import isfile
+
+from tempfile import mkstemp
+
+'''
+    Method returns dates and decimals of the rows as tagged dictionaries for json (see decode_value)
+    @param value: object
+    @return: dictionary
+'''
+def encode_value(value):
+    if isinstance(value, datetime): return {'__datetime__': value.isoformat()}
+    if isinstance(value, date): return {'__date__': value.isoformat()}
+    if isinstance(value, Decimal): return {'__decimal__': str(value)}
+    raise TypeError('{0!r} cannot be stored in the snapshot'.format(value))
+
+'''
+    Method turns the tagged dictionaries of encode_value back into dates and decimals
+    @param entry: dictionary
+    @return: object
+'''
+def decode_value(entry):
+    if '__datetime__' in entry: return datetime.fromisoformat(entry['__datetime__'])
+    if '__date__' in entry: return date.fromisoformat(entry['__date__'])
+    if '__decimal__' in entry: return Decimal(entry['__decimal__'])
+    return entry
+
+'''
+Class describing a snapshot of the reference tables (Machines, Indexes, PriceProductTables) in a
+json file, so reading a snapshot written by someone else cannot run code. The snapshot stores the
+checksums of the tables (CHECKSUM TABLE reads the whole table, the reference tables are small); it is
+only used if they are equal to the checksums in the database, otherwise it is rebuilt from the database. Processes on the same host
+share the file: reading takes a shared lock, rebuilding an exclusive lock on filename.lock and the
+new snapshot replaces the old file atomically.
+'''
+class ReferenceSnapshot(object):
+    VERSION = 2 # increase if the layout of the stored dictionary changes
+    TABLES = {'Machines': 'query_machines', 'Indexes': 'query_indexes', 'PriceProductTables': 'query_price_product_tables'}
+
+    def __init__(self, filename):
+        self.__filename = filename
+        self.__lockfile = '{0}.lock'.format(filename)
+        self.__logger = logging.getLogger('support.snapshot')
+
+    def show_log(self, level, message):
+        if level == 'debug':
+            self.__logger.debug(message)
+        elif level == 'info':
+            self.__logger.info(message)
+        elif level == 'warning':
+            self.__logger.warning(message)
+        elif level == 'error':
+            self.__logger.error(message)
+        elif level == 'critical':
+            self.__logger.critical(message)
+
+    '''
+    function reads the snapshot file and returns its dictionary or None if it doesn't exist, is
+    unreadable or has another version
+    @return: dictionary
+    '''
+    def read(self):
+        if not isfile(self.__filename): return None
+        try:
+            with open(self.__filename, 'r') as filein:
+                snapshot = json.load(filein, object_hook = decode_value)
+        except (OSError, ValueError) as err:
+            self.show_log('warning', "snapshot '{0}' is not readable: {1}".format(self.__filename, err))
+            return None
+        if not isinstance(snapshot, dict) or snapshot.get('version') != ReferenceSnapshot.VERSION: return None
+        return snapshot
+
+    '''
+    function writes the snapshot into a temporary file in the same directory and moves it
+    to the filename, so readers see either the old or the new snapshot. the file is only
+    readable and writable by the owner (mode of mkstemp)
+    @param snapshot: dictionary
+    '''
+    def write(self, snapshot):
+        handle, tmpname = mkstemp(prefix = '.snapshot', dir = dirname(self.__filename) or '.')
+        try:
+            with fdopen(handle, 'w') as fileout:
+                json.dump(snapshot, fileout, default = encode_value, sort_keys = True)
+            replace(tmpname, self.__filename)
+        except:
+            if isfile(tmpname): remove(tmpname)
+            raise
+
+    '''
+    function queries the reference tables from the database
+    @param dbinst: database instance
+    @param checksums: dictionary (table: checksum)
+    @return: dictionary
+    '''
+    def build(self, dbinst, checksums):
+        tables = dict([(table, getattr(dbinst, method)()) for table, method in ReferenceSnapshot.TABLES.items()])
+        return {'version': ReferenceSnapshot.VERSION, 'checksums': checksums, 'tables': tables}
+
+    '''
+    function fills the caches of the database instance with the rows of the snapshot. the caches are
+    grown to the size of the tables first, otherwise a large table would evict its own rows
+    @param dbinst: database instance
+    @param snapshot: dictionary
+    '''
+    def fill_cache(self, dbinst, snapshot):
+        for table in ('Machines', 'Indexes'):
+            dbinst.reserve_cache(table, len(snapshot['tables'][table]))
+            for row in snapshot['tables'][table]:
+                dbinst.set_cache_entry(table, row['ID'], row)
+        for row in snapshot['tables']['PriceProductTables']:
+            if row['CURRENT_TABLE']: dbinst.set_cache_entry('PriceProductTables', 'CURRENT_TABLE', row['NAME'])
+
+    '''
+    function compares the checksums of the reference tables in the database with the snapshot file
+    and fills the caches of the database instance from it. if the snapshot is missing or outdated,
+    it is rebuilt from the database. returns True if the snapshot on disk was up to date
+    @param dbinst: database instance
+    @return: boolean
+    '''
+    def load(self, dbinst):
+        checksums = dbinst.query_table_checksums(sorted(ReferenceSnapshot.TABLES.keys()))
+        fresh = None not in checksums.values()
+
+        lockhandle = open(self.__lockfile, 'a')
+        try:
+            fcntl.flock(lockhandle, fcntl.LOCK_SH)
+            snapshot = self.read()
+            if fresh and snapshot is not None and snapshot['checksums'] == checksums:
+                self.fill_cache(dbinst, snapshot)
+                self.show_log('debug', "reference tables loaded from snapshot '{0}'".format(self.__filename))
+                return True
+
+            fcntl.flock(lockhandle, fcntl.LOCK_EX) # another process may have rebuilt the snapshot meanwhile
+            snapshot = self.read()
+            if fresh and snapshot is not None and snapshot['checksums'] == checksums:
+                self.fill_cache(dbinst, snapshot)
+                return True
+            snapshot = self.build(dbinst, checksums)
+            if fresh: self.write(snapshot)
+            self.fill_cache(dbinst, snapshot)
+            self.show_log('info', "snapshot '{0}' of the reference tables rebuilt".format(self.__filename))
+            return False
+        finally:
+            fcntl.flock(lockhandle, fcntl.LOCK_UN)
+            lockhandle.close()
+
+    def get_filename(self):
+        return self.__filename
+
+    filename = property(get_filename)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import json
+import logging
+
+from os import fdopen
+from os import remove
+from os import replace
+from os.path import dirname
+from os.path import isfile
+
+from tempfile import mkstemp
+
+'''
+Class describing the state of an incremental poller as json file. For each table it keeps the
+high-water mark (the highest ID seen so far) and a list of pending IDs, i.e. rows which were seen
+but can still change and are therefore queried again in the next run. The mark only catches inserted
+rows, a row below it which is updated is seen only if it's pending. Further lists (e.g. known raw
+data paths) can be stored under a name as well.
+'''
+class WatermarkState(object):
+    def __init__(self, filename):
+        self.__filename = filename
+        self.__marks = {}
+        self.__pending = {}
+        self.__lists = {}
+        self.__logger = logging.getLogger('support.watermark')
+
+    def show_log(self, level, message):
+        if level == 'debug':
+            self.__logger.debug(message)
+        elif level == 'info':
+            self.__logger.info(message)
+        elif level == 'warning':
+            self.__logger.warning(message)
+        elif level == 'error':
+            self.__logger.error(message)
+        elif level == 'critical':
+            self.__logger.critical(message)
+
+    '''
+    function reads the state file. a missing or unreadable file starts with an empty state,
+    so the first run fetches everything
+    '''
+    def load(self):
+        if not isfile(self.__filename):
+            self.show_log('info', "state file '{0}' doesn't exist, starting without watermarks".format(self.__filename))
+            return
+        try:
+            with open(self.__filename, 'r') as filein:
+                state = json.load(filein)
+        except (OSError, ValueError) as err:
+            self.show_log('warning', "state file '{0}' is not readable, starting without watermarks: {1}".format(self.__filename, err))
+            return
+        self.__marks = state.get('marks', {})
+        self.__pending = state.get('pending', {})
+        self.__lists = state.get('lists', {})
+
+    '''
+    function writes the state into a temporary file and moves it to the filename, so an
+    interrupted run leaves the previous state behind
+    '''
+    def save(self):
+        handle, tmpname = mkstemp(prefix = '.watermark', dir = dirname(self.__filename) or '.')
+        try:
+            with fdopen(handle, 'w') as fileout:
+                json.dump({'marks': self.__marks, 'pending': self.__pending, 'lists': self.__lists}, fileout, indent = 2, sort_keys = True)
+            replace(tmpname, self.__filename)
+        except:
+            if isfile(tmpname): remove(tmpname)
+            raise
+
+    def get_mark(self, table):
+        return self.__marks.get(table, 0)
+
+    '''
+    function raises the high-water mark of a table, it never decreases
+    @param table: string
+    @param value: integer
+    '''
+    def set_mark(self, table, value):
+        self.__marks[table] = max(self.get_mark(table), value)
+
+    def get_pending(self, table):
+        return list(self.__pending.get(table, []))
+
+    def set_pending(self, table, ids):
+        self.__pending[table] = sorted(set(ids))
+
+    def get_list(self, name):
+        return list(self.__lists.get(name, []))
+
+    def set_list(self, name, values):
+        self.__lists[name] = sorted(set(values))
+
+    def get_filename(self):
+        return self.__filename
+
+    filename = property(get_filename)
@@ -50,6 +50,8 @@ import mysql.connector
 
 from helper.helper_logger import MainLogger
 from helper.database import Database
+from helper.snapshot import ReferenceSnapshot
+from helper.watermark import WatermarkState
 from helper.io_module import check_directory
 from helper.io_module import list_subdirectories
 from helper.io_module import is_archived_directory
@@ -69,6 +71,10 @@ class Parser(object):
         self.__base_path = '/projects/sequencing/pacbio1/'
         self.__max_days = 30
         self.__raw_data_dirs = []
+        self.__query_stats = ''
+        self.__snapshot = ''
+        self.__batch_size = 0
+        self.__state = ''
         
         self.initialiseParser()
 
@@ -84,6 +90,10 @@ class Parser(object):
         self.__parser.add_argument('-b', '--base_path', dest = 'base_path', type = str, default=self.__base_path, help = 'Base path for searching for raw data directories (default: %(default).')
         self.__parser.add_argument('-d', '--max-days', dest='max_days', metavar='DAYS', type = str,default = self.__max_days, help = 'Skip raw data directories older than --max-days days (default: %(default)).')
         self.__parser.add_argument('-r', '--raw-data-dir', dest='raw_data_dirs', metavar='DIRECTORY',nargs='+', type = int, help = 'Manually provide raw data paths (can be used multiple times).')
+        self.__parser.add_argument('-q', '--query-stats', dest='query_stats', metavar='FILE', type = str, default = '', help = 'Write the timing of the database queries as json to this file.')
+        self.__parser.add_argument('-s', '--snapshot', dest='snapshot', metavar='FILE', type = str, default = '', help = 'Load the reference tables (machines, indexes, price tables) from this snapshot file.')
+        self.__parser.add_argument('-w', '--state', dest='state', metavar='FILE', type = str, default = '', help = 'Remember the raw data paths of the flowcells in the database and a watermark in this json file, so only new flowcells are fetched.')
+        self.__parser.add_argument('-n', '--batch-size', dest='batch_size', metavar='CELLS', type = int, default = self.__batch_size, help = 'Import up to CELLS SMRT cells in one transaction with a savepoint per cell; failing cells are skipped and reported (default: %(default)s, one transaction per cell, stop at the first failure).')
 
     '''
     Start parsing.
@@ -102,6 +112,38 @@ class Parser(object):
     ''' 
     def get_raw_data_dirs(self):
         return self.__raw_data_dirs
+
+    '''
+    Returns the file for the query statistics (empty if not requested).
+    @return: a file path
+    @rtype: str
+    ''' 
+    def get_query_stats(self):
+        return self.__query_stats
+
+    '''
+    Returns the snapshot file of the reference tables (empty if not requested).
+    @return: a file path
+    @rtype: str
+    ''' 
+    def get_snapshot(self):
+        return self.__snapshot
+
+    '''
+    Returns the number of SMRT cells imported in one transaction (0 if batching is off).
+    @return: number of SMRT cells
+    @rtype: int
+    ''' 
+    def get_batch_size(self):
+        return self.__batch_size
+
+    '''
+    Returns the state file of the incremental polling (empty if not requested).
+    @return: a file path
+    @rtype: str
+    ''' 
+    def get_state(self):
+        return self.__state
           
     '''
     Helper function for log messages.
@@ -147,6 +189,16 @@ class Parser(object):
                     self.show_log('error', 'Path "'+dir+'" is no directory or does not exist!')
                     exit(2)
                 self.__raw_data_dirs.append(canonical_dir)
+        
+        self.__query_stats = self.__options.query_stats
+        self.__snapshot = self.__options.snapshot
+        self.__state = self.__options.state
+        
+        # is batch_size reasonable?
+        if self.__options.batch_size < 0:
+            self.show_log('error', 'Invalid value given for --batch-size: '+str(self.__options.batch_size)+'!')
+            exit(2)
+        self.__batch_size = self.__options.batch_size
     
     '''
     If raw data directories are not provided by the user, look for directories and subdirectories
@@ -182,6 +234,14 @@ class Parser(object):
             self.show_log('info', 'No valid raw data directories found.')
 
 
+'''
+Exception raised by the SmrtCellImporter if a SMRT cell cannot be imported. The caller decides
+if the transaction is rolled back completely or only to the savepoint of the SMRT cell.
+'''
+class SmrtCellImportError(Exception):
+    pass
+
+
 class SmrtCellImporter(object):
     def __init__(self,raw_data_dir):
         self.__logger = logging.getLogger('support.import_new_smrtcells_into_database')
@@ -204,8 +264,7 @@ class SmrtCellImporter(object):
         # load/parse the xml file
         self.__subreadset = SmrtCell(self.get_xml_file())
         if not self.get_smrtcell().is_valid():
-            self.show_log('error', 'The xml file "'+self.get_xml_file()+'" in the raw data directory "'++'" could not be parsed!')
-            exit(2)
+            raise SmrtCellImportError('The xml file "'+self.get_xml_file()+'" in the raw data directory "'+self.get_raw_data_dir()+'" could not be parsed!')
             
         # if all valid
         self.__is_valid =  self.get_smrtcell().is_valid()
@@ -219,6 +278,7 @@ class SmrtCellImporter(object):
     @param: a database object
     @return: a flowcell id
     @rtype: integer
+    @raise SmrtCellImportError: if the flowcell or its product cannot be inserted
     ''' 
     def insert_flowcell_in_db(self, db):
         # skip if it is not valid
@@ -270,10 +330,7 @@ class SmrtCellImporter(object):
                                       flowcell_status = 'finished',
                                       additional_information = additional_information_json)
         except mysql.connector.Error as err:
-            self.show_log('error', 'Inserting a new flowcell into the database failed: "'+format(err)+'"! Will roll back recent changes!')
-            db.rollbackConnection()
-            db.closeConnection()
-            exit(2)
+            raise SmrtCellImportError('Inserting a new flowcell into the database failed: "'+format(err)+'"!')
             
         self.show_log('info','Inserted new flowcell with id "'+str(flowcell_id)+'".')
                     
@@ -290,10 +347,7 @@ class SmrtCellImporter(object):
                                                    flowcell_id = flowcell_id,
                                                    product_name = product_name)
         except mysql.connector.Error as err:
-            self.show_log('error', 'Attaching the product "'+product_name+'" to the flowcell "'+str(flowcell_id)+'" failed: "'+format(err)+'"! Most likely, the product still needs to be added to the database. Will roll back recent changes!')
-            db.rollbackConnection()
-            db.closeConnection()
-            exit(2)       
+            raise SmrtCellImportError('Attaching the product "'+product_name+'" to the flowcell "'+str(flowcell_id)+'" failed: "'+format(err)+'"! Most likely, the product still needs to be added to the database.')
         
         self.show_log('info','Attached product "'+product_name+'" to flowcell with id "'+str(flowcell_id)+'".')
                 
@@ -307,14 +361,13 @@ class SmrtCellImporter(object):
     @param: a flowcell id
     @return: a list with track ids
     @rtype: list of integer
+    @raise SmrtCellImportError: if the biosample names are no known libraries or the tracks cannot be inserted
     '''             
     def insert_tracks_in_db(self, db, flowcell_id):  
         # skip if it is not valid
         if not self.__is_valid:
             return None
         
-        track_ids = []
-              
         # skip if it is not valid
         if not self.__is_valid:
             return []
@@ -323,55 +376,50 @@ class SmrtCellImporter(object):
         smrtcell = self.get_smrtcell()
         biosample_names = smrtcell.get_biosample_names()
         if len(biosample_names)==0:
-            self.show_log('error', 'The subreadset xml file does not contain biosample names and is most likely not valid! Will roll back recent changes!')
-            db.rollbackConnection()
-            db.closeConnection()
-            exit(2)
+            raise SmrtCellImportError('The subreadset xml file does not contain biosample names and is most likely not valid!')
         
-        # now go through names, validate and insert tracks
+        # now go through names and validate them
+        libids = []
         for name in biosample_names:
             lib_pattern_match = match(r'^L(\d+)$',name)
             if not lib_pattern_match:
-                self.show_log('error', 'The biosample name "'+name+'" found in the subreadset xml file does not match the standard library pattern (e.g. L1234)! Will roll back recent changes!')
-                db.rollbackConnection()
-                db.closeConnection()
-                exit(2)
-            
-            libid = lib_pattern_match.group(1)
-            resultset = db.query_libraries(where_string = 'Libraries.ID = %s',where_values = [libid])
-            if not resultset:
-                self.show_log('error', 'The library "'+name+'" found in the subreadset xml file cannot be found in the database! Will roll back recent changes!')
-                db.rollbackConnection()
-                db.closeConnection()
-                exit(2)
-            library = resultset[0]
-            
-            try:
-                track_id = db.insert_track(
-                            flowcell_id = flowcell_id,
-                            compartment = 1,
-                            library_id = library['Libraries.ID'],
-                            status = 'finished',
-                            control = 'N',
-                            molarity = 0,
-                            recipe = 'SE',
-                            operator = 'pacbio',
-                            notes = smrtcell.get_notes(),
-                            compartment_consumption = 1,
-                            accounting_status = 'open',
-                            accounting_date = None,
-                            activity = 1,
-                            client_access = library['Libraries.CLIENT_ACCESS'],
-                            price_user_group = library['PriceUserGroups.NAME'],
-                            price_discount_level = library['PriceDiscountLevels.NAME'],
-                            price_product_table = library['PriceProductTables.NAME'])
-            except mysql.connector.Error as err:
-                self.show_log('error', 'Inserting a new track into database for library "'+str(library['Libraries.ID'])+'",failed: "'+format(err)+'". Will roll back recent changes!')
-                db.rollbackConnection()
-                db.closeConnection()
-                exit(2)
-            track_ids.append(track_id)
-            
+                raise SmrtCellImportError('The biosample name "'+name+'" found in the subreadset xml file does not match the standard library pattern (e.g. L1234)!')
+            libids.append(int(lib_pattern_match.group(1)))
+        
+        # query all libraries at once
+        resultset = db.query_libraries_join_tables(where_string = 'Libraries.ID IN ({0})'.format(','.join(['%s']*len(libids))), where_values = libids)
+        librarydict = dict([(library['Libraries.ID'], library) for library in resultset])
+        tracklist = []
+        for name, libid in zip(biosample_names, libids):
+            if libid not in librarydict:
+                raise SmrtCellImportError('The library "'+name+'" found in the subreadset xml file cannot be found in the database!')
+            library = librarydict[libid]
+            tracklist.append({
+                            'flowcell_id': flowcell_id,
+                            'compartment': 1,
+                            'library_id': library['Libraries.ID'],
+                            'status': 'finished',
+                            'control': 'N',
+                            'molarity': 0,
+                            'recipe': 'SE',
+                            'operator': 'pacbio',
+                            'notes': smrtcell.get_notes(),
+                            'compartment_consumption': 1,
+                            'accounting_status': 'open',
+                            'accounting_date': None,
+                            'activity': 1,
+                            'client_access': library['Libraries.CLIENT_ACCESS'],
+                            'price_user_group': library['PriceUserGroups.NAME'],
+                            'price_discount_level': library['PriceDiscountLevels.NAME'],
+                            'price_product_table': library['PriceProductTables.NAME']})
+        
+        # insert all tracks of the smrtcell with one statement
+        try:
+            track_ids = db.insert_tracks_batch(tracklist)
+        except mysql.connector.Error as err:
+            raise SmrtCellImportError('Inserting new tracks into database for libraries "'+', '.join(biosample_names)+'",failed: "'+format(err)+'".')
+        
+        for name, track_id in zip(biosample_names, track_ids):
             self.show_log('info','Inserted new track with id "'+str(track_id)+'" for sample "'+name+'".')
         
         return track_ids 
@@ -443,28 +491,94 @@ if __name__ == '__main__':
     # set up logger and database connection
     mainlog = MainLogger('support')
     dbinst = Database(SI.DB_HOST, SI.DB_USER, SI.DB_PW, SI.DB)
-    dbinst.setConnection()
+    if not dbinst.setConnection():
+        mainlog.close()
+        exit(2)
 
     # parse command line arguments
     parser = Parser()
     parser.main()    
+    if parser.get_snapshot(): ReferenceSnapshot(parser.get_snapshot()).load(dbinst)
         
+    logger = logging.getLogger('support.import_new_smrtcells_into_database')
+    batch_size = parser.get_batch_size()
+    failed_dirs = []
+    pending = 0
+    
+    # raw data paths of the flowcells known from previous runs plus the ones added since then,
+    # limited to the directories of this run so the list doesn't grow with the database
+    state = None
+    known_paths = set()
+    if parser.get_state():
+        state = WatermarkState(parser.get_state())
+        state.load()
+        flowcells = dbinst.query_flowcells_since(state.get_mark('Flowcells'), ('ID', 'RAW_DATA_PATH'))
+        if len(flowcells) > 0: state.set_mark('Flowcells', flowcells[-1]['ID'])
+        known_paths = (set(state.get_list('raw_data_paths')) | set([flowcell['RAW_DATA_PATH'] for flowcell in flowcells])) & set(parser.get_raw_data_dirs())
+    
     # iterate through raw data directories provided by parser
     for d in parser.get_raw_data_dirs():
         # is already in database?
+        if d in known_paths: continue
         flowcells = dbinst.query_flowcell_with_raw_data_path(d)
-        if len(flowcells) > 0:  continue
+        if len(flowcells) > 0:
+            known_paths.add(d)
+            continue
+        
+        # without batching, the first failure rolls back the SMRT cell and stops the import
+        if batch_size == 0:
+            try:
+                smrtcell_importer = SmrtCellImporter(d)
+                if not smrtcell_importer.is_valid(): continue
+                flowcell_id = smrtcell_importer.insert_flowcell_in_db(dbinst)
+                track_ids = smrtcell_importer.insert_tracks_in_db(dbinst,flowcell_id)
+            except SmrtCellImportError as err:
+                logger.error(str(err)+' Will roll back recent changes!')
+                dbinst.rollbackConnection()
+                dbinst.closeConnection()
+                mainlog.close()
+                exit(2)
+            
+            # commit here so that if something fails the complete flowcell is removed
+            dbinst.commitConnection()
+            continue
         
-        # parse subreadset xml
-        smrtcell_importer = SmrtCellImporter(d)
-        if not smrtcell_importer.is_valid(): continue
+        # with batching, a failing SMRT cell is only rolled back to its savepoint
+        # the savepoint is released after a successful import only, the next SMRT cell replaces it otherwise
+        dbinst.setSavepoint('smrtcell')
+        try:
+            smrtcell_importer = SmrtCellImporter(d)
+            if not smrtcell_importer.is_valid(): continue
+            flowcell_id = smrtcell_importer.insert_flowcell_in_db(dbinst)
+            track_ids = smrtcell_importer.insert_tracks_in_db(dbinst,flowcell_id)
+        except SmrtCellImportError as err:
+            logger.error(str(err)+' Raw data directory "'+d+'" is skipped!')
+            dbinst.rollbackToSavepoint('smrtcell')
+            failed_dirs.append(d)
+            continue
+        except Exception:
+            try:
+                dbinst.rollbackToSavepoint('smrtcell')
+            except mysql.connector.Error as err:
+                logger.error('Rollback to the savepoint of "'+d+'" failed: '+str(err))
+            raise # the original error, the uncommitted transaction is discarded with the connection
+        dbinst.releaseSavepoint('smrtcell')
         
-        # insert flowcell and tracks
-        flowcell_id = smrtcell_importer.insert_flowcell_in_db(dbinst)
-        track_ids = smrtcell_importer.insert_tracks_in_db(dbinst,flowcell_id)
-                
-        # commit here so that if something fails the complete flowcell is removed
+        pending += 1
+        if pending == batch_size:
+            dbinst.commitConnection()
+            pending = 0
+    
+    if batch_size > 0:
         dbinst.commitConnection()
+        if len(failed_dirs) > 0:
+            logger.error('Import failed for '+str(len(failed_dirs))+' raw data directories: '+', '.join(failed_dirs))
       
+    # only the paths which are still candidates need to be remembered
+    if state is not None:
+        state.set_list('raw_data_paths', known_paths & set(parser.get_raw_data_dirs()))
+        state.save()
+    if parser.get_query_stats(): dbinst.get_registry().dump_json(parser.get_query_stats())
     dbinst.closeConnection()
     mainlog.close()
+    if len(failed_dirs) > 0: exit(2)
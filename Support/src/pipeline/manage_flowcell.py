@@ -35,8 +35,11 @@ import logging
 from argparse import ArgumentParser as ArgumentParser
 from argparse import RawDescriptionHelpFormatter
 
+from collections import defaultdict
+
 from os import listdir
 
+from os.path import basename
 from os.path import join as pathjoin
 
 from sys import argv
@@ -45,6 +48,8 @@ from sys import argv
 from helper.helper_logger import MainLogger
 
 from helper.database import Database
+from helper.snapshot import ReferenceSnapshot
+from helper.watermark import WatermarkState
 
 from helper.io_module import create_directory
 from helper.io_module import write_list
@@ -76,6 +81,9 @@ class Parser(object):
         self.__parser.add_argument('-m', '--mode', type=str, metavar='STRING', dest='whattodo', default='p', choices=('p'), help='(p)repare demultiplexing (default: prepare)')
         self.__parser.add_argument('-f', '--from', metavar='STRING', dest='fromhere', default='', type = self.test_location, help='where is the raw data cmcb or zih')
         self.__parser.add_argument('-t', '--to', metavar='STRING', dest='to', default='', type = self.test_location, help='where is the demultiplex process cmcb or zih')
+        self.__parser.add_argument('-q', '--querystats', metavar='FILE', dest='querystats', default='', type = str, help='write the timing of the database queries as json to this file')
+        self.__parser.add_argument('-w', '--state', metavar='FILE', dest='state', default='', type = str, help='poll flowcells incrementally and keep the watermarks in this json file')
+        self.__parser.add_argument('-s', '--snapshot', metavar='FILE', dest='snapshot', default='', type = str, help='load the reference tables (machines, indexes, price tables) from this snapshot file')
 
     def parse(self, inputstring = None):
         if inputstring == None:
@@ -108,6 +116,9 @@ class Parser(object):
         self.__whattodo = self.__options.whattodo
         self.__from = self.__options.fromhere
         self.__to = self.__options.to
+        self.__querystats = self.__options.querystats
+        self.__snapshot = self.__options.snapshot
+        self.__state = self.__options.state
         
         if self.__whattodo == 'p':
             self.__prepare = True
@@ -128,9 +139,21 @@ class Parser(object):
     def get_prepare(self):
         return self.__prepare
 
+    def get_querystats(self):
+        return self.__querystats
+
+    def get_snapshot(self):
+        return self.__snapshot
+
+    def get_state(self):
+        return self.__state
+
     fromhere = property(get_from)
     to = property(get_to)
     prepare = property(get_prepare)
+    querystats = property(get_querystats)
+    snapshot = property(get_snapshot)
+    state = property(get_state)
 
 
 
@@ -210,22 +233,81 @@ class ManageFlowcell(object):
             self.show_log('info','pipeline status: No flowcells are in ({0}, {1}) mode. Nothing to do!'.format(self.__statusdict[seqstatus], self.__pipestatusdict[pipestatus]))
             return
         
+        machinedict = self.__dbinst.query_machines_with_ids([fcdict['MACHINE_ID'] for fcdict in entries])
+        for fcdict in entries:
+            minst = self.prepare_machine_inst(machinedict[fcdict['MACHINE_ID']])
+            self.add_flowcell_entry(fcdict, minst, seqstatus, pipestatus, fcloc)
+
+    '''
+    incremental version of find_flowcell_add_list. only the flowcells above the high-water mark of the
+    state and the flowcells which were pending in the previous run are queried. a flowcell stays pending
+    for the next run while its pipelining is open, it's dropped when it reaches a final status ('done' or
+    any other status set outside the pipeline) or was removed from the database.
+    @param state: WatermarkState instance
+    @param seqstatus: integer
+    @param pipestatus: string
+    @param fcloc: location of the rawdata
+    '''
+    def find_flowcell_add_list_incremental(self, state, seqstatus, pipestatus, fcloc):
+        self.check_storagesite(fcloc, '{0}.{1}'.format(self.__class__.__name__, self.find_flowcell_add_list_incremental.__name__))
+
+        newentries = self.__dbinst.query_flowcells_since(state.get_mark('Flowcells'))
+        candidates = list(self.__dbinst.query_flowcells_with_ids(state.get_pending('Flowcells')).values()) + newentries
+        if len(newentries) != 0: state.set_mark('Flowcells', newentries[-1]['ID'])
+        pending = [fcdict['ID'] for fcdict in candidates if fcdict['PIPELINING_STATUS'] == 'open']
+        state.set_pending('Flowcells', pending)
+        self.show_log('debug', 'pipeline status: {0} new and {1} pending flowcells polled, {2} still pending'.format(len(newentries), len(candidates) - len(newentries), len(pending)))
+
+        entries = [fcdict for fcdict in candidates if fcdict['FLOWCELLSSTATUS_ID'] == seqstatus and fcdict['PIPELINING_STATUS'] == pipestatus]
+        if len(entries) == 0:
+            self.show_log('info','pipeline status: No flowcells are in ({0}, {1}) mode. Nothing to do!'.format(self.__statusdict[seqstatus], self.__pipestatusdict[pipestatus]))
+            return
+
+        machinedict = self.__dbinst.query_machines_with_ids([fcdict['MACHINE_ID'] for fcdict in entries])
         for fcdict in entries:
-            minst = self.prepare_machine_inst(self.__dbinst.query_machines_with_machineid(fcdict['MACHINE_ID']))
+            self.add_flowcell_entry(fcdict, self.prepare_machine_inst(machinedict[fcdict['MACHINE_ID']]), seqstatus, pipestatus, fcloc)
+
+    '''
+    small function which checks if the raw data folder of a flowcell entry exists on the storage device.
+    if this is true, an illumina flowcell instance is added to the list.
+    @param fcdict: dictionary (database entry of the flowcell)
+    @param minst: machine instance
+    @param seqstatus: integer
+    @param pipestatus: string
+    @param fcloc: location of the rawdata
+    '''
+    def add_flowcell_entry(self, fcdict, minst, seqstatus, pipestatus, fcloc):
+        if minst.platform == 'illumina':
+            allfcs = listdir(minst.get_rawstorage_path(fcloc)) # retrieve all flowcells directories belonging to this flowcell
+            flowcell = [i for i in allfcs if fcdict['CODE'] in i and 'archived' not in i]
+            if len(flowcell) == 0:
+                self.show_log('error','Cannot find path. Check if path or flowcell code is correct for {0} and machine {1}'.format(fcdict['CODE'], minst.name))
+                return
             
-            if minst.platform == 'illumina':
-                allfcs = listdir(minst.get_rawstorage_path(fcloc)) # retrieve all flowcells directories belonging to this flowcell
-                flowcell = [i for i in allfcs if fcdict['CODE'] in i and 'archived' not in i]
-                if len(flowcell) == 0:
-                    self.show_log('error','Cannot find path. Check if path or flowcell code is correct for {0} and machine {1}'.format(fcdict['CODE'], minst.name))
-                    continue
-                
-                fcinst = IlluminaFlowcell(minst, fcdict['CODE'], flowcell[0], fcdict['ID'])
-                fcinst.pipestatus, fcinst.seqstatus = pipestatus, seqstatus
-                self.show_log('info', "pipeline status: '{0}' from machine '{1}' with status ({2}, {3}) is added to list".format(fcdict['CODE'], minst.name, self.__statusdict[seqstatus], self.__pipestatusdict[pipestatus]))
-                self.__flowcelllist.append(fcinst)
-            else:
-                pass
+            fcinst = IlluminaFlowcell(minst, fcdict['CODE'], flowcell[0], fcdict['ID'])
+            fcinst.pipestatus, fcinst.seqstatus = pipestatus, seqstatus
+            self.show_log('info', "pipeline status: '{0}' from machine '{1}' with status ({2}, {3}) is added to list".format(fcdict['CODE'], minst.name, self.__statusdict[seqstatus], self.__pipestatusdict[pipestatus]))
+            self.__flowcelllist.append(fcinst)
+        else:
+            pass
+
+    '''
+    function fills the lane dictionaries of several illumina flowcells with a single database query.
+    the tracks are distributed to the flowcell instances by their flowcell id
+    @param fcinstlist: list of flowcell instances
+    @param trackstatus: tuple
+    '''
+    def build_lanedicts(self, fcinstlist, trackstatus = (1,2,3)):
+        fcdict = dict([(fcinst.dbid, fcinst) for fcinst in fcinstlist])
+        tracklist = self.__dbinst.query_tracks_join_tables_with_flowcellids(list(fcdict.keys()), trackstatus)
+
+        trackdict = defaultdict(list)
+        for track in tracklist:
+            trackdict[track['FLOWCELL_ID']].append(track)
+
+        for dbid, fcinst in fcdict.items():
+            fcinst.add_tracks_to_lanedict(trackdict[dbid])
+            fcinst.collect_lane_stats()
 
     '''
     small function that prepare flowcells for pipelining. The criteria of the selected flowcell
@@ -263,6 +345,51 @@ class ManageFlowcell(object):
             self.show_log('info', "flowcell status: '{0}' from machine '{1}' is ready for pipelining".format(fcinst.code, fcinst.machine.name))
         return fcinst, 'pipeline'
     
+    '''
+    function returns the cycle progress of the illumina flowcells of the list which are on the sequencer. flowcells
+    with at most lookahead seconds left can be prepared (samplesheets, config) before the run is complete
+    @param fcloc: string
+    @param lookahead: integer (seconds)
+    @return: list of tuples (flowcell instance, CycleProgress, boolean (at most lookahead seconds left))
+    '''
+    def find_running_flowcell_progress(self, fcloc = 'cmcb', lookahead = 3600):
+        self.check_storagesite(fcloc, '{0}.{1}'.format(self.__class__.__name__, self.find_running_flowcell_progress.__name__))
+        progresslist = []
+        for fcinst in self.__flowcelllist:
+            if fcinst.machine.platform != 'illumina' or fcinst.seqstatus != self.__statusdict['on sequencer']: continue
+            try:
+                progress = fcinst.get_cycle_progress(fcloc)
+            except OSError as err:
+                self.show_log('warning', "flowcell status: cycle progress of '{0}' is not readable: {1}".format(fcinst.code, err))
+                continue
+            progresslist.append((fcinst, progress, progress.remaining is not None and progress.remaining <= lookahead))
+        return progresslist
+
+    '''
+    function prepares the flowcell of a finished run directory for pipelining and writes its samplesheets. it's
+    called by the run watcher as soon as the run is complete. the flowcell is the one of the machine with the
+    status whose code is part of the name of the run directory
+    @param minst: machine instance
+    @param rundir: string
+    @param seqstatus: integer
+    @param pipestatus: string
+    @param trackstatus: tuple
+    @param fcloc: string
+    @return: flowcell instance, string
+    '''
+    def prepare_flowcell_with_rundir(self, minst, rundir, seqstatus = 2, pipestatus = 'open', trackstatus = (1,2), fcloc = 'cmcb'):
+        runname = basename(rundir.rstrip('/'))
+        entries = [fcdict for fcdict in self.__dbinst.query_flowcell_with_status(seqstatus, pipestatus) if fcdict['MACHINE_ID'] == minst.dbid and fcdict['CODE'] in runname]
+        if len(entries) == 0:
+            self.show_log('warning', "pipeline status: no flowcell with status ({0}, {1}) matches the run '{2}' of machine '{3}'".format(self.__statusdict[seqstatus], self.__pipestatusdict[pipestatus], runname, minst.name))
+            return None, ''
+
+        fcinst = IlluminaFlowcell(minst, entries[0]['CODE'], runname, entries[0]['ID'])
+        fcinst.pipestatus, fcinst.seqstatus = pipestatus, seqstatus
+        fcinst, runstatus = self.prepare_flowcell_pipelining(fcinst, seqstatus, pipestatus, trackstatus, fcloc)
+        if runstatus == 'pipeline': self.write_samplessheet(fcinst, fcloc)
+        return fcinst, runstatus
+
     '''
     function write the samplesheet to the raw data directory on either cmcb or zih site. it returns a False
     if the location is wrong or there are now samplesheets. Otherwise true is returned.
@@ -282,7 +409,7 @@ class ManageFlowcell(object):
         for sname, ssheetlist in fcinst.samplesheetdict.items():
             sname = '{0}.csv'.format(sname)
             fullname = pathjoin(samplesheetdir, sname)
-#             write_list(ssheetlist, fullname)
+#             ssheetlist[0].write(fullname) # streams header and tracks line by line
             self.show_log('info', "pipeline status: Samplesheet '{0}' for '{1}' has been written".format(sname, fcinst.code))
         return True
 
@@ -330,7 +457,7 @@ class ManageFlowcell(object):
         for ssheetname, ssheetlist in fcinst.samplesheetdict.items():
 #             add the settings for the above sample sheet to the snakemake config file
             snakelist.append('{0}{1}:'.format(3*self.__s, ssheetname))
-            snakelist.append('{0}mismatches: {1}'.format(4*self.__s, ','.join(['1']*len(fcinst.indexlist))))
+            snakelist.append('{0}mismatches: {1}'.format(4*self.__s, ','.join([str(value) for value in fcinst.mismatchdict[ssheetname]])))
             snakelist.append('{0}basesmask: {1}'.format(4*self.__s, ssheetlist[1]))
         
         snakedir = pathjoin(fcinst.get_pathdict_with_location(fromhere)['machinepath'], 'Snakemake')
@@ -357,7 +484,14 @@ if __name__ == '__main__':
     parseinst.main()
     
     dbinst = Database(SI.DB_HOST, SI.DB_USER, SI.DB_PW, SI.DB)
-    dbinst.setConnection()
+    if not dbinst.setConnection():
+        mainlog.close()
+        exit(2)
+    if parseinst.snapshot != '': ReferenceSnapshot(parseinst.snapshot).load(dbinst)
+    state = None
+    if parseinst.state != '':
+        state = WatermarkState(parseinst.state)
+        state.load()
     
     inst = ManageFlowcell(dbinst)
     
@@ -366,7 +500,8 @@ if __name__ == '__main__':
 #     TODO: transfer this in the prepare function
 #     TODO: how to handle the sequencing, pipestatus, trackstatus? via argparse?
 # TODO: how to handle bcl2fastq version? via argparse?
-#         inst.find_flowcell_add_list(3, 'open', 'cmcb')
+#         if state is None: inst.find_flowcell_add_list(3, 'open', 'cmcb')
+#         else: inst.find_flowcell_add_list_incremental(state, 3, 'open', 'cmcb')
 #      
 #         for fcinst in inst.flowcelllist:
 #             fcinst, runstatus = inst.prepare_flowcell_pipelining(fcinst, 3, trackstatus = (1,2,3), fcloc = 'cmcb')
@@ -384,6 +519,8 @@ if __name__ == '__main__':
             
     
 #     dbinst.commitConnection()
+    if state is not None: state.save()
+    if parseinst.querystats != '': dbinst.get_registry().dump_json(parseinst.querystats)
     dbinst.closeConnection()
     mainlog.close()
     
\ No newline at end of file
@@ -0,0 +1,464 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import ctypes
+import ctypes.util
+import logging
+import select
+import struct
+import time
+
+from os import close
+from os import fsdecode
+from os import fsencode
+from os import read
+from os import scandir
+from os import stat
+from os import strerror
+from os.path import join as pathjoin
+from os.path import realpath
+
+''' inotify constants (linux/inotify.h) '''
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT = struct.Struct('iIII') # wd, mask, cookie, length of the name
+
+''' file systems which don't deliver inotify events for changes made by other hosts '''
+REMOTEFS = ('nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'fuse.sshfs', 'lustre', 'gpfs', 'beegfs')
+
+'''
+    Method returns the type of the file system a path is on (longest matching mount point of /proc/mounts).
+    it returns an empty string if the mounts are not readable
+    @param path: string
+    @return: string
+'''
+def get_filesystem_type(path):
+    path = realpath(path)
+    best, fstype = '', ''
+    try:
+        with open('/proc/mounts', 'r') as filein:
+            for line in filein:
+                fields = line.split()
+                if len(fields) < 3: continue
+                mountpoint = fields[1].encode().decode('unicode_escape') # spaces are written as \040
+                if (path == mountpoint or path.startswith(mountpoint.rstrip('/') + '/')) and len(mountpoint) >= len(best):
+                    best, fstype = mountpoint, fields[2]
+    except OSError:
+        return ''
+    return fstype
+
+
+'''
+Class wrapping the inotify calls of the libc with ctypes. The file descriptor is non-blocking,
+read_events returns the events which are available as list of tuples (watched path, mask, name).
+'''
+class Inotify(object):
+    def __init__(self):
+        self.__libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno = True)
+        self.__fd = self.__libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.__fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, 'inotify_init1: {0}'.format(strerror(errno)))
+        self.__watches = {} # wd: path
+        self.__paths = {} # path: wd
+
+    '''
+    method watches a path for the events of the mask
+    @param path: string
+    @param mask: integer
+    '''
+    def add_watch(self, path, mask):
+        wd = self.__libc.inotify_add_watch(self.__fd, fsencode(path), mask)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, strerror(errno), path)
+        self.__watches[wd], self.__paths[path] = path, wd
+
+    def remove_watch(self, path):
+        wd = self.__paths.pop(path, None)
+        if wd is None: return
+        self.__watches.pop(wd, None)
+        self.__libc.inotify_rm_watch(self.__fd, wd)
+
+    '''
+    method reads the available events. an overflow of the event queue is returned with the path None
+    @return: list of tuples (path, mask, name)
+    '''
+    def read_events(self):
+        try:
+            data = read(self.__fd, 65536)
+        except BlockingIOError:
+            return []
+        events, offset = [], 0
+        while offset + EVENT.size <= len(data):
+            wd, mask, cookie, length = EVENT.unpack_from(data, offset)
+            name = fsdecode(data[offset + EVENT.size:offset + EVENT.size + length].rstrip(b'\0'))
+            offset += EVENT.size + length
+            path = self.__watches.get(wd)
+            if mask & IN_IGNORED: # watch was removed, e.g. the directory was deleted
+                self.__watches.pop(wd, None)
+                if path is not None: self.__paths.pop(path, None)
+            if path is not None or mask & IN_Q_OVERFLOW: events.append((path, mask, name))
+        return events
+
+    def fileno(self):
+        return self.__fd
+
+    def close(self):
+        close(self.__fd)
+
+
+'''
+Class watching the storage directories of the machines for finished runs. Local storages are watched
+with inotify: new run directories and the marker files (RTAComplete.txt, CopyComplete.txt) are seen
+as soon as they are created; they are polled every safetyinterval seconds as well and all of them are
+scanned again if the event queue overflowed. Storages on NFS (or another remote file system) and all
+storages if inotify isn't available are polled: the interval starts with mininterval and is doubled up
+to maxinterval as long as a poll finds nothing new. A marker has to keep its size and mtime for settle
+seconds before the callback is called with the machine and the run directory. The run is done if the
+callback returns True, otherwise (or if it raises) it stays pending and the callback is retried with
+the same backoff; after maxretries failed tries the run is given up.
+The directories which exist when a storage is added are only watched if the name contains the code of
+a flowcell which isn't finished in the database, the state of the watcher is not kept between starts.
+'''
+class RunWatcher(object):
+    MARKERS = ('RTAComplete.txt', 'CopyComplete.txt')
+
+    def __init__(self, callback, markers = MARKERS, settle = 30, mininterval = 15, maxinterval = 600, safetyinterval = 3600, maxretries = 10):
+        self.__callback = callback
+        self.__markers = tuple(markers)
+        self.__settle = settle
+        self.__mininterval = mininterval
+        self.__maxinterval = maxinterval
+        self.__safetyinterval = safetyinterval
+        self.__maxretries = maxretries
+
+        self.__storages = {} # storage path: dictionary (machine, mode, interval, due)
+        self.__pending = {} # run directory: storage path
+        self.__candidates = {} # run directory: (marker path, (size, mtime), time of the last change)
+        self.__retries = {} # run directory: (delay, time of the next try, failed tries) after a failed callback
+        self.__done = set() # run directories which are prepared, given up or finished before the start
+        self.__inotify = None
+        self.__logger = logging.getLogger('support.run_watcher')
+
+    def show_log(self, level, message):
+        if level == 'debug':
+            self.__logger.debug(message)
+        elif level == 'info':
+            self.__logger.info(message)
+        elif level == 'warning':
+            self.__logger.warning(message)
+        elif level == 'error':
+            self.__logger.error(message)
+        elif level == 'critical':
+            self.__logger.critical(message)
+
+    '''
+    method returns the inotify instance, it's created with the first local storage. None is returned
+    if inotify isn't available
+    @return: Inotify
+    '''
+    def get_inotify(self):
+        if self.__inotify is None:
+            try:
+                self.__inotify = Inotify()
+            except (OSError, AttributeError) as err:
+                self.show_log('warning', 'inotify is not available, all storages are polled: {0}'.format(err))
+                self.__inotify = False
+        return self.__inotify or None
+
+    '''
+    method adds the storage directory of a machine. the existing run directories are watched if the
+    name contains one of the codes (flowcells which aren't finished in the database), the others are
+    ignored. run directories created later are always watched
+    @param machine: machine instance
+    @param storage: string
+    @param opencodes: iterable of strings
+    '''
+    def add_storage(self, machine, storage, opencodes = ()):
+        fstype = get_filesystem_type(storage)
+        inotify = None if fstype in REMOTEFS else self.get_inotify()
+        mode = 'poll'
+        if inotify is not None:
+            try:
+                inotify.add_watch(storage, IN_CREATE | IN_MOVED_TO)
+                mode = 'inotify'
+            except OSError as err:
+                self.show_log('warning', "storage '{0}' cannot be watched with inotify, it's polled: {1}".format(storage, err))
+        now = time.monotonic()
+        self.__storages[storage] = {'machine': machine, 'mode': mode, 'interval': self.__mininterval, 'due': now if mode == 'poll' else now + self.__safetyinterval}
+
+        opencodes = [code for code in opencodes if code]
+        for entry in scandir(storage):
+            if entry.is_dir() and entry.path not in self.__done and entry.path not in self.__pending:
+                if any([code in entry.name for code in opencodes]): self.add_rundir(storage, entry.path)
+                else: self.__done.add(entry.path)
+        self.show_log('info', "storage '{0}' of machine '{1}' is watched by {2} ({3}), {4} runs in progress".format(storage, machine.name, mode, fstype or 'unknown', len([1 for rundir, path in self.__pending.items() if path == storage])))
+
+    '''
+    method adds a run directory which isn't finished yet
+    @param storage: string
+    @param rundir: string
+    '''
+    def add_rundir(self, storage, rundir):
+        self.__pending[rundir] = storage
+        if self.__storages[storage]['mode'] == 'inotify':
+            try:
+                self.__inotify.add_watch(rundir, IN_CREATE | IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE_SELF)
+            except OSError as err:
+                self.show_log('warning', "run directory '{0}' cannot be watched: {1}".format(rundir, err))
+        marker = self.find_marker(rundir) # the marker may have been written before the watch was added
+        if marker is not None: self.add_candidate(rundir, marker)
+
+    '''
+    method returns the path of the first marker file of a run directory or None
+    @param rundir: string
+    @return: string
+    '''
+    def find_marker(self, rundir):
+        for marker in self.__markers:
+            try:
+                stat(pathjoin(rundir, marker))
+                return pathjoin(rundir, marker)
+            except OSError:
+                continue
+        return None
+
+    def add_candidate(self, rundir, markerpath):
+        if rundir in self.__candidates: return
+        try:
+            status = stat(markerpath)
+        except OSError:
+            return
+        self.__candidates[rundir] = (markerpath, (status.st_size, status.st_mtime_ns), time.monotonic())
+        self.show_log('debug', "marker '{0}' found, waiting until it is stable".format(markerpath))
+
+    '''
+    method polls a storage: new run directories are added and the markers of the pending run directories
+    are checked. the interval is reset if something was found, otherwise it's doubled. storages watched
+    by inotify are polled again after safetyinterval
+    @param storage: string
+    @param now: float (monotonic time)
+    '''
+    def poll_storage(self, storage, now):
+        found = False
+        try:
+            for entry in scandir(storage):
+                if entry.is_dir() and entry.path not in self.__pending and entry.path not in self.__done:
+                    self.add_rundir(storage, entry.path)
+                    found = True
+        except OSError as err:
+            self.show_log('warning', "storage '{0}' is not readable: {1}".format(storage, err))
+        for rundir in [rundir for rundir, path in self.__pending.items() if path == storage and rundir not in self.__candidates]:
+            marker = self.find_marker(rundir)
+            if marker is not None:
+                self.add_candidate(rundir, marker)
+                found = True
+
+        entry = self.__storages[storage]
+        if entry['mode'] == 'inotify':
+            if found: self.show_log('warning', "storage '{0}' had changes without inotify event".format(storage))
+            entry['due'] = now + self.__safetyinterval
+            return
+        entry['interval'] = self.__mininterval if found else min(2 * entry['interval'], self.__maxinterval)
+        entry['due'] = now + entry['interval']
+
+    '''
+    method handles the inotify events: new run directories of a storage and new markers of a run directory.
+    events are lost if the queue overflowed, then all storages watched by inotify are scanned again
+    @param events: list of tuples (path, mask, name)
+    '''
+    def handle_events(self, events):
+        for path, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                self.show_log('warning', 'inotify event queue overflowed, the storages are scanned again')
+                now = time.monotonic()
+                for storage, entry in self.__storages.items():
+                    if entry['mode'] == 'inotify': self.poll_storage(storage, now)
+            elif path in self.__storages:
+                if mask & IN_ISDIR and name != '':
+                    rundir = pathjoin(path, name)
+                    if rundir not in self.__pending and rundir not in self.__done: self.add_rundir(path, rundir)
+            elif path in self.__pending:
+                if mask & (IN_DELETE_SELF | IN_IGNORED):
+                    self.__pending.pop(path, None)
+                    self.__candidates.pop(path, None)
+                    self.__retries.pop(path, None)
+                elif name in self.__markers:
+                    self.add_candidate(path, pathjoin(path, name))
+
+    '''
+    method calls the callback for the markers which kept size and mtime for settle seconds
+    @param now: float (monotonic time)
+    '''
+    def check_candidates(self, now):
+        for rundir, (markerpath, signature, changed) in list(self.__candidates.items()):
+            if now - changed < self.__settle: continue
+            if rundir in self.__retries and now < self.__retries[rundir][1]: continue
+            try:
+                status = stat(markerpath)
+            except OSError:
+                del self.__candidates[rundir]
+                self.__retries.pop(rundir, None)
+                continue
+            if (status.st_size, status.st_mtime_ns) != signature:
+                self.__candidates[rundir] = (markerpath, (status.st_size, status.st_mtime_ns), now)
+                continue
+            self.finish_rundir(rundir, now)
+
+    '''
+    method calls the callback for a complete run. the run is done if the callback returns True,
+    otherwise the callback is tried again after a delay which is doubled up to maxinterval. the run
+    is given up after maxretries failed tries
+    @param rundir: string
+    @param now: float (monotonic time)
+    '''
+    def finish_rundir(self, rundir, now):
+        storage = self.__pending[rundir]
+        self.show_log('info', "run '{0}' of machine '{1}' is complete".format(rundir, self.__storages[storage]['machine'].name))
+        try:
+            success = self.__callback(self.__storages[storage]['machine'], rundir) is True
+        except Exception as err:
+            self.show_log('error', "preparing run '{0}' failed: {1}".format(rundir, err))
+            success = False
+
+        if not success:
+            delay, tries = (min(2 * self.__retries[rundir][0], self.__maxinterval), self.__retries[rundir][2] + 1) if rundir in self.__retries else (self.__mininterval, 1)
+            if tries < self.__maxretries:
+                self.__retries[rundir] = (delay, now + delay, tries)
+                self.show_log('warning', "run '{0}' is not prepared, next try in {1} seconds".format(rundir, delay))
+                return
+            self.show_log('error', "run '{0}' is not prepared after {1} tries, it is given up".format(rundir, tries))
+        del self.__pending[rundir]
+        del self.__candidates[rundir]
+        self.__retries.pop(rundir, None)
+        self.__done.add(rundir)
+        if self.__storages[storage]['mode'] == 'inotify': self.__inotify.remove_watch(rundir)
+
+    '''
+    method returns the seconds until the next poll or stability check is due
+    @param now: float (monotonic time)
+    @return: float
+    '''
+    def get_timeout(self, now):
+        deadlines = [entry['due'] for entry in self.__storages.values()]
+        for rundir, (markerpath, signature, changed) in self.__candidates.items():
+            deadlines.append(max(changed + self.__settle, self.__retries[rundir][1] if rundir in self.__retries else 0))
+        if len(deadlines) == 0: return self.__maxinterval
+        return max(0.0, min(deadlines) - now)
+
+    '''
+    method waits for inotify events or the next deadline and handles what is due
+    @param maxwait: float (upper limit of the wait in seconds)
+    '''
+    def step(self, maxwait = None):
+        timeout = self.get_timeout(time.monotonic())
+        if maxwait is not None: timeout = min(timeout, maxwait)
+        if self.__inotify:
+            readable, writable, failed = select.select([self.__inotify], [], [], timeout)
+            if len(readable) != 0: self.handle_events(self.__inotify.read_events())
+        else:
+            time.sleep(timeout)
+
+        now = time.monotonic()
+        for storage, entry in self.__storages.items():
+            if entry['due'] <= now: self.poll_storage(storage, now)
+        self.check_candidates(now)
+
+    '''
+    method runs the watcher until it's interrupted
+    '''
+    def run(self):
+        try:
+            while True:
+                self.step()
+        except KeyboardInterrupt:
+            self.show_log('info', 'run watcher stopped')
+        finally:
+            if self.__inotify: self.__inotify.close()
+
+    def get_pending(self):
+        return dict(self.__pending)
+
+    def get_done(self):
+        return set(self.__done)
+
+    pending = property(get_pending)
+    done = property(get_done)
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    from helper.helper_logger import MainLogger
+    from helper.database import Database
+    from helper.support_information import SupportInformation as SI
+    from pipeline.manage_flowcell import ManageFlowcell
+
+    parser = ArgumentParser(description = 'Watches the storage directories of the Illumina machines and prepares a flowcell for demultiplexing as soon as its run is complete.')
+    parser.add_argument('-f', '--from', dest = 'fromhere', metavar = 'STRING', type = str, default = 'cmcb', choices = ('cmcb', 'zih'), help = 'where is the raw data cmcb or zih (default: %(default)s)')
+    parser.add_argument('--settle', dest = 'settle', metavar = 'SECONDS', type = int, default = 30, help = 'seconds the marker file has to be unchanged (default: %(default)s)')
+    parser.add_argument('--min-interval', dest = 'mininterval', metavar = 'SECONDS', type = int, default = 15, help = 'first poll interval of remote storages (default: %(default)s)')
+    parser.add_argument('--max-interval', dest = 'maxinterval', metavar = 'SECONDS', type = int, default = 600, help = 'longest poll interval of remote storages (default: %(default)s)')
+    parser.add_argument('--safety-interval', dest = 'safetyinterval', metavar = 'SECONDS', type = int, default = 3600, help = 'poll interval of storages watched by inotify (default: %(default)s)')
+    parser.add_argument('--max-retries', dest = 'maxretries', metavar = 'INT', type = int, default = 10, help = 'tries to prepare a complete run before it is given up (default: %(default)s)')
+    options = parser.parse_args()
+
+    mainlog = MainLogger('support')
+    dbinst = Database(SI.DB_HOST, SI.DB_USER, SI.DB_PW, SI.DB)
+    if not dbinst.setConnection():
+        mainlog.close()
+        exit(2)
+    inst = ManageFlowcell(dbinst)
+
+    def prepare(minst, rundir):
+        fcinst, runstatus = inst.prepare_flowcell_with_rundir(minst, rundir, fcloc = options.fromhere)
+        dbinst.commitConnection()
+        return runstatus == 'pipeline'
+
+    watcher = RunWatcher(prepare, settle = options.settle, mininterval = options.mininterval, maxinterval = options.maxinterval, safetyinterval = options.safetyinterval, maxretries = options.maxretries)
+    openflowcells = dbinst.query_flowcell_with_status(2, 'open') # on the sequencer and not prepared yet
+    for medict in dbinst.query_machines():
+        if medict['PLATFORM_ID'] != 1: continue # illumina only
+        minst = inst.prepare_machine_inst(medict)
+        try:
+            watcher.add_storage(minst, minst.get_rawstorage_path(options.fromhere), [fcdict['CODE'] for fcdict in openflowcells if fcdict['MACHINE_ID'] == minst.dbid])
+        except OSError as err:
+            watcher.show_log('error', "storage of machine '{0}' cannot be watched: {1}".format(minst.name, err))
+    watcher.run()
+    dbinst.closeConnection()
+    mainlog.close()
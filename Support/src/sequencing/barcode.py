@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import numpy as np
+
+''' lookup table for the complement of the bases, all other bytes stay as they are (same as io_module.get_reverse_complement) '''
+COMPLEMENT = np.arange(256, dtype = np.uint8)
+COMPLEMENT[np.frombuffer(b'ACGTNacgtn', dtype = np.uint8)] = np.frombuffer(b'TGCANtgcan', dtype = np.uint8)
+
+'''
+Class describing the barcodes of a lane as fixed-width byte array (one row per barcode, shorter
+barcodes are padded with zero bytes) with the length of each barcode. Truncation, reverse complement
+and the length statistics work on the whole array at once.
+'''
+class BarcodeTable(object):
+    def __init__(self, barcodes):
+        encoded = [barcode.encode('ascii') for barcode in barcodes]
+        self.__lengths = np.array([len(barcode) for barcode in encoded], dtype = np.int64)
+        width = int(self.__lengths.max()) if len(encoded) != 0 else 0
+        if width == 0:
+            self.__array = np.zeros((len(encoded), 0), dtype = np.uint8)
+        else:
+            self.__array = np.array(encoded, dtype = 'S{0}'.format(width)).view(np.uint8).reshape(len(encoded), width)
+
+    def __len__(self):
+        return len(self.__lengths)
+
+    '''
+    method returns the minimal and maximal barcode length and if one barcode is empty
+    @return: int, int, boolean
+    '''
+    def get_length_stats(self):
+        if len(self.__lengths) == 0: return 0, 0, False
+        return int(self.__lengths.min()), int(self.__lengths.max()), bool((self.__lengths == 0).any())
+
+    '''
+    method cuts all barcodes to length
+    @param length: integer
+    '''
+    def truncate(self, length):
+        self.__array = self.__array[:, :length]
+        self.__lengths = np.minimum(self.__lengths, length)
+
+    '''
+    method replaces all barcodes by their reverse complement. after reversing a row the padding is
+    in front of the barcode, so each row is shifted by its padding (nothing to shift if all barcodes
+    have the same length)
+    '''
+    def reverse_complement(self):
+        width = self.__array.shape[1]
+        reverse = COMPLEMENT[self.__array[:, ::-1]]
+        padding = width - self.__lengths
+        if padding.any():
+            columns = np.arange(width)[np.newaxis, :]
+            reverse = np.take_along_axis(reverse, (columns + padding[:, np.newaxis]) % width, axis = 1)
+            reverse[columns >= self.__lengths[:, np.newaxis]] = 0
+        self.__array = np.ascontiguousarray(reverse)
+
+    '''
+    method returns the barcodes as list of strings
+    @return: list of strings
+    '''
+    def tolist(self):
+        width = self.__array.shape[1]
+        if width == 0: return [''] * len(self.__lengths)
+        return [barcode.decode('ascii') for barcode in np.ascontiguousarray(self.__array).view('S{0}'.format(width)).ravel()]
+
+    def get_lengths(self):
+        return self.__lengths.copy()
+
+    def get_array(self):
+        return self.__array
+
+    lengths = property(get_lengths)
+    array = property(get_array)
+
+
+''' 2 bit code of the bases, all other bytes (e.g. N) get code 0 and are marked in a separate mask '''
+BASECODE = np.zeros(256, dtype = np.uint64)
+BASECODE[np.frombuffer(b'CGTcgt', dtype = np.uint8)] = np.array([1, 2, 3, 1, 2, 3], dtype = np.uint64)
+ISBASE = np.zeros(256, dtype = bool)
+ISBASE[np.frombuffer(b'ACGTacgt', dtype = np.uint8)] = True
+EVENBITS = np.uint64(0x5555555555555555)
+''' number of set bits of each byte, for numpy versions before 2.0 without np.bitwise_count '''
+POPCOUNT = np.array([bin(value).count('1') for value in range(256)], dtype = np.uint8)
+
+'''
+    Method packs barcodes of at most 32 bases into 2 bits per base (one uint64 per barcode). bases
+    which are not A, C, G or T are marked in a mask at the lower bit of their position, so they
+    differ from every base but another N
+    @param barcodes: list of strings
+    @return: numpy array (uint64), numpy array (uint64)
+'''
+def pack_barcodes(barcodes):
+    table = BarcodeTable(barcodes)
+    array = table.array
+    if array.shape[1] > 32: raise ValueError('barcodes with more than 32 bases cannot be packed into 64 bits')
+    codes = np.zeros(len(table), dtype = np.uint64)
+    nmask = np.zeros(len(table), dtype = np.uint64)
+    valid = np.arange(array.shape[1])[np.newaxis, :] < table.lengths[:, np.newaxis]
+    for position in range(array.shape[1]):
+        shift = np.uint64(2 * position)
+        codes |= BASECODE[array[:, position]] << shift
+        nmask |= (~ISBASE[array[:, position]] & valid[:, position]).astype(np.uint64) << shift
+    return codes, nmask
+
+'''
+    Method returns the number of set bits of each uint64 of an array. it uses np.bitwise_count
+    (numpy >= 2.0) and otherwise sums up the bits of the 8 bytes with a lookup table
+    @param array: numpy array (uint64)
+    @return: numpy array (uint8)
+'''
+def bitwise_count(array):
+    if hasattr(np, 'bitwise_count'): return np.bitwise_count(array)
+    array = np.ascontiguousarray(array)
+    return POPCOUNT[array.view(np.uint8)].reshape(array.shape + (8, )).sum(axis = -1, dtype = np.uint8)
+
+'''
+    Method returns the hamming distances between the packed barcodes of block and all packed barcodes
+    as matrix (block x all). XOR marks the differing bits, folding both bits of a base to the lower bit
+    and counting the set bits gives the number of differing bases
+    @param blockcodes: numpy array (uint64)
+    @param blockmask: numpy array (uint64)
+    @param codes: numpy array (uint64)
+    @param nmask: numpy array (uint64)
+    @return: numpy array (uint8)
+'''
+def get_hamming_distances(blockcodes, blockmask, codes, nmask):
+    diff = blockcodes[:, np.newaxis] ^ codes[np.newaxis, :]
+    diff = (diff | (diff >> np.uint64(1))) & EVENBITS
+    diff |= blockmask[:, np.newaxis] ^ nmask[np.newaxis, :]
+    return bitwise_count(diff)
+
+'''
+Class detecting barcode collisions between the tracks of lanes. For every pair of tracks on a lane
+the hamming distances d1 and d2 of both indexes are computed (bit packed, in blocks of blocksize
+barcodes) and counted in a histogram. A pair collides with the mismatch values (m1, m2) if a read
+could be assigned to both tracks, i.e. d1 <= 2*m1 and d2 <= 2*m2. Lanes are added with add_lane and
+the highest mismatch values without collision are returned by get_safe_mismatches.
+'''
+class CollisionDetector(object):
+    MAXMISMATCH = 2 # highest value allowed by bcl2fastq
+
+    def __init__(self, blocksize = 1024, maxpairs = 100):
+        self.__blocksize = blocksize
+        self.__maxpairs = maxpairs
+        self.__limit = 2 * CollisionDetector.MAXMISMATCH + 1 # distances above are safe for all mismatch values
+        self.__histogram = np.zeros((self.__limit + 1, self.__limit + 1), dtype = np.int64)
+        self.__collisions = []
+
+    '''
+    method adds the pairwise distances of the barcodes of a lane. bc2list may contain empty
+    barcodes only if the second index isn't used
+    @param lane: integer
+    @param bc1list: list of strings
+    @param bc2list: list of strings
+    '''
+    def add_lane(self, lane, bc1list, bc2list):
+        codes1, nmask1 = pack_barcodes(bc1list)
+        codes2, nmask2 = pack_barcodes(bc2list)
+        count = len(codes1)
+        for start in range(0, count, self.__blocksize):
+            stop = min(start + self.__blocksize, count)
+            dist1 = get_hamming_distances(codes1[start:stop], nmask1[start:stop], codes1, nmask1)
+            dist2 = get_hamming_distances(codes2[start:stop], nmask2[start:stop], codes2, nmask2)
+            rows, columns = np.nonzero(np.arange(count)[np.newaxis, :] > np.arange(start, stop)[:, np.newaxis]) # each pair once
+            dist1, dist2 = np.minimum(dist1[rows, columns], self.__limit), np.minimum(dist2[rows, columns], self.__limit)
+            np.add.at(self.__histogram, (dist1, dist2), 1)
+
+            close = np.nonzero((dist1 <= 2) & (dist2 <= 2))[0] # collisions with the default of one mismatch
+            for pair in close[:max(0, self.__maxpairs - len(self.__collisions))]:
+                first, second = start + rows[pair], columns[pair]
+                self.__collisions.append((lane, bc1list[first], bc2list[first], bc1list[second], bc2list[second], int(dist1[pair]), int(dist2[pair])))
+
+    '''
+    method checks if a pair of tracks collides with the mismatch values
+    @param mismatch1: integer
+    @param mismatch2: integer
+    @return: boolean
+    '''
+    def has_collision(self, mismatch1, mismatch2):
+        return bool(self.__histogram[:2 * mismatch1 + 1, :2 * mismatch2 + 1].any())
+
+    '''
+    method returns the highest mismatch values without collision, preferring the highest sum and then
+    values which are equal. it returns None if two tracks have identical barcodes
+    @return: tuple(integer, integer)
+    '''
+    def get_safe_mismatches(self):
+        values = range(CollisionDetector.MAXMISMATCH + 1)
+        candidates = sorted([(m1, m2) for m1 in values for m2 in values], key = lambda m: (-(m[0] + m[1]), abs(m[0] - m[1]), -m[0]))
+        for mismatch1, mismatch2 in candidates:
+            if not self.has_collision(mismatch1, mismatch2): return mismatch1, mismatch2
+        return None
+
+    def get_histogram(self):
+        return self.__histogram.copy()
+
+    def get_collisions(self):
+        return list(self.__collisions)
+
+    histogram = property(get_histogram)
+    collisions = property(get_collisions)
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import json
+import logging
+
+from re import compile
+
+''' keys of the Stats.json read by the stream reader '''
+STATSKEY = compile(r'"(LaneNumber|DemuxResults)"\s*:\s*')
+WHITESPACE = ' \t\n\r,'
+''' Sample_ID of a track (see IlluminaFlowcell.add_tracks_to_lanedict) '''
+LIBSTRING = compile(r'^L(\d+)_Track-(\d+)$')
+
+'''
+Class reading the Stats/Stats.json of bcl2fastq in chunks. Only the entries of the DemuxResults
+arrays are decoded, one sample at a time, together with the LaneNumber of their conversion result,
+so the whole file is never loaded. Iterating yields tuples (lane, sample dictionary).
+'''
+class StatsReader(object):
+    def __init__(self, filename, chunksize = 1 << 20):
+        self.__filename = filename
+        self.__chunksize = chunksize
+
+    def __iter__(self):
+        decoder = json.JSONDecoder()
+        with open(self.__filename, 'r') as filein:
+            buffer, position, lane, inarray, eof = '', 0, None, False, False
+            while True:
+                if not inarray:
+                    match = STATSKEY.search(buffer, position)
+                    if match is not None and match.group(1) == 'DemuxResults' and match.end() < len(buffer):
+                        if buffer[match.end()] != '[': raise ValueError("DemuxResults of '{0}' is not a list".format(self.__filename))
+                        position, inarray = match.end() + 1, True
+                        continue
+                    if match is not None and match.group(1) == 'LaneNumber':
+                        try:
+                            value, end = decoder.raw_decode(buffer, match.end())
+                        except json.JSONDecodeError:
+                            end = len(buffer)
+                        if end < len(buffer): # the number may continue in the next chunk otherwise
+                            lane, position = value, end
+                            continue
+                    elif match is None:
+                        position = max(position, len(buffer) - 32) # a key may start at the end of the chunk
+                else:
+                    while position < len(buffer) and buffer[position] in WHITESPACE: position += 1
+                    if position < len(buffer):
+                        if buffer[position] == ']':
+                            position, inarray = position + 1, False
+                            continue
+                        try:
+                            sample, end = decoder.raw_decode(buffer, position)
+                            yield lane, sample
+                            position = end
+                            continue
+                        except json.JSONDecodeError:
+                            if eof: raise
+                if eof: return
+                chunk = filein.read(self.__chunksize)
+                buffer, position = buffer[position:] + chunk, 0
+                eof = chunk == ''
+
+
+'''
+Class collecting the demultiplexing results of the tracks from a Stats.json. The Sample_ID of a
+track is its libstring L{libid}_Track-{trackid}; read count, yield and the bases >= Q30 are summed
+over the lanes and reads of a track.
+'''
+class DemultiplexStats(object):
+    def __init__(self, filename):
+        self.__filename = filename
+        self.__tracks = {} # trackid: [reads, yield, yield q30, yield of the read metrics]
+        self.__unknown = [] # sample ids which are no libstring
+        self.__logger = logging.getLogger('support.demultiplex_stats')
+
+    def show_log(self, level, message):
+        if level == 'debug':
+            self.__logger.debug(message)
+        elif level == 'info':
+            self.__logger.info(message)
+        elif level == 'warning':
+            self.__logger.warning(message)
+        elif level == 'error':
+            self.__logger.error(message)
+        elif level == 'critical':
+            self.__logger.critical(message)
+
+    '''
+    method reads the samples of the Stats.json
+    @return: DemultiplexStats
+    '''
+    def parse(self):
+        for lane, sample in StatsReader(self.__filename):
+            match = LIBSTRING.match(sample.get('SampleId', ''))
+            if match is None:
+                self.__unknown.append(sample.get('SampleId', ''))
+                continue
+            entry = self.__tracks.setdefault(int(match.group(2)), [0, 0, 0, 0])
+            entry[0] += sample.get('NumberReads', 0)
+            entry[1] += sample.get('Yield', 0)
+            for readmetric in sample.get('ReadMetrics', []):
+                entry[2] += readmetric.get('YieldQ30', 0)
+                entry[3] += readmetric.get('Yield', 0)
+        if len(self.__unknown) != 0: self.show_log('warning', "{0} samples of '{1}' are no tracks: {2}".format(len(self.__unknown), self.__filename, ', '.join(sorted(set(self.__unknown))[:10])))
+        self.show_log('info', "{0} tracks read from '{1}'".format(len(self.__tracks), self.__filename))
+        return self
+
+    '''
+    method returns the results as list of tuples (trackid, reads, yield, percent q30) for
+    Database.update_demultiplex_stats_into_tracks_batch
+    @return: list of tuples
+    '''
+    def get_statslist(self):
+        statslist = []
+        for trackid, (reads, bases, q30bases, readbases) in sorted(self.__tracks.items()):
+            statslist.append((trackid, reads, bases, round(100.0 * q30bases / readbases, 2) if readbases != 0 else None))
+        return statslist
+
+    '''
+    method writes the results into the Tracks table in one transaction, it's rolled back if an error occurs.
+    only tracks of the flowcell are written, the others are reported. it needs the columns of
+    Support/files/tracks_demultiplex_stats.sql
+    @param dbinst: database instance
+    @param flowcellid: integer
+    @return: list of integers (track ids of the Stats.json which are no tracks of the flowcell)
+    '''
+    def write_into_database(self, dbinst, flowcellid):
+        statslist = self.get_statslist()
+        try:
+            missing = dbinst.update_demultiplex_stats_into_tracks_batch(flowcellid, statslist)
+            dbinst.commitConnection()
+        except Exception:
+            dbinst.rollbackConnection()
+            raise
+        if len(missing) != 0: self.show_log('warning', "{0} tracks of '{1}' are no tracks of flowcell {2}: {3}".format(len(missing), self.__filename, flowcellid, ', '.join([str(trackid) for trackid in missing])))
+        self.show_log('info', '{0} tracks of flowcell {1} updated with the demultiplexing results'.format(len(statslist) - len(missing), flowcellid))
+        return missing
+
+    def get_tracks(self):
+        return self.__tracks
+
+    def get_unknown(self):
+        return self.__unknown
+
+    tracks = property(get_tracks)
+    unknown = property(get_unknown)
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    from helper.helper_logger import MainLogger
+    from helper.database import Database
+    from helper.support_information import SupportInformation as SI
+
+    parser = ArgumentParser(description = 'Writes read count, yield and % >= Q30 of the tracks from the Stats/Stats.json of bcl2fastq into the Tracks table (columns of Support/files/tracks_demultiplex_stats.sql).')
+    parser.add_argument('statsfile', type = str, help = 'Stats.json of bcl2fastq')
+    parser.add_argument('-f', '--flowcell', dest = 'flowcellid', metavar = 'INT', type = int, required = True, help = 'database id of the flowcell the Stats.json belongs to')
+    options = parser.parse_args()
+
+    mainlog = MainLogger('support')
+    dbinst = Database(SI.DB_HOST, SI.DB_USER, SI.DB_PW, SI.DB)
+    if not dbinst.setConnection():
+        mainlog.close()
+        exit(2)
+    DemultiplexStats(options.statsfile).parse().write_into_database(dbinst, options.flowcellid)
+    dbinst.closeConnection()
+    mainlog.close()
@@ -33,19 +33,25 @@ import logging
 
 from collections import defaultdict
 
-from operator import itemgetter
+from operator import attrgetter
 
 from os.path import join as pathjoin
-from os.path import join as isfile
+from os.path import isfile
 from os.path import isdir
 
-from re import compile
+from xml.etree.ElementTree import ParseError
 
 
 ''' own modules '''
 from sequencing.machine import Machine
-from helper.io_module import get_reverse_complement
-from helper.io_module import read_file_get_list
+from sequencing.barcode import BarcodeTable
+from sequencing.barcode import CollisionDetector
+from sequencing.interop import InterOp
+from sequencing.progress import CycleProgress
+from sequencing.runinfo import RUNINFO_CACHE
+from sequencing.samplesheet import Samplesheet
+from sequencing.samplesheet import get_samplesheet_template
+from sequencing.track import Track
 
 from helper.support_information import SupportInformation as SI
 
@@ -54,6 +60,10 @@ Class describing a flowcell. It's has the main attributes from the database mode
 '''
 
 class Flowcell(object):
+    __slots__ = ('_cmcbpath', '_zihpath', '_objectstore_id', '_objectstore_date', '_archivepath', '_archivedate', '_code', '_name', '_dbid', '_machine',
+                 '_number', '_seqstatus', '_pipestatus', '_issingle', '_reverse_complement', '_readlist', '_indexlist', '_seqorder', '_pathdict')
+    _logger = logging.getLogger('support.flowcell') # shared by all instances
+
     def __init__(self, machine, code):
         self._cmcbpath = ''
         self._zihpath = ''
@@ -78,9 +88,7 @@ class Flowcell(object):
         self._indexlist = [] # length of each index
         self._seqorder = [] # order of sequencing I .. Index, R .. normal Reads
         
-        self._pathdict = {}
-        
-        self._logger = logging.getLogger('support.flowcell')
+        self._pathdict = None # built on first use, see get_pathdict
 
     def show_log(self, level, message):
         if level == 'debug':
@@ -94,11 +102,19 @@ class Flowcell(object):
         elif level == 'critical':
             self._logger.critical(message)
 
+    '''
+    method returns the dictionary of the paths. the base class has no paths
+    @return: dictionary
+    '''
+    def build_path_dict(self):
+        return {}
+
     def get_pathdict(self):
+        if self._pathdict is None: self._pathdict = self.build_path_dict()
         return self._pathdict
 
     def get_pathdict_with_location(self, location):
-        return self._pathdict[location]
+        return self.get_pathdict()[location]
 
     '''
     method sets the path for the cmcb storage. if machine is an instance,
@@ -108,6 +124,7 @@ class Flowcell(object):
     def set_cmcbpath(self, pathstring):
         if isdir(pathstring):
             self._cmcbpath = pathstring
+            self._pathdict = None
         else:
             self.show_log('warning', '{0} is not a valid path for the flowcell at the CMCB'.format(pathstring))
 
@@ -119,6 +136,7 @@ class Flowcell(object):
     def set_cmcbpath_machine(self, flowcellname):
         if isinstance(self._machine, Machine):
             self._cmcbpath = pathjoin(self._machine.cmcbstorage, flowcellname)
+            self._pathdict = None
         else:
             self.show_log('warning', 'machine instance does not exist. cannot create CMCB path for flowcell')
 
@@ -130,6 +148,7 @@ class Flowcell(object):
     def set_zihpath(self, pathstring):
         if isdir(pathstring):
             self._zihpath = pathstring
+            self._pathdict = None
         else:
             self.show_log('warning', '{0} is not a valid path for the flowcell at the ZIH'.format(pathstring))
 
@@ -141,6 +160,7 @@ class Flowcell(object):
     def set_zihpath_machine(self, flowcellname):
         if isinstance(self._machine, Machine):
             self._zihpath = pathjoin(self._machine.zihstorage, flowcellname)
+            self._pathdict = None
         else:
             self.show_log('warning', 'machine instance does not exist. cannot create ZIH path for flowcell')
     
@@ -158,9 +178,11 @@ class Flowcell(object):
         
     def set_name(self, name):
         self._name = name
+        self._pathdict = None
     
     def set_machine(self, machine):
         self._machine = machine
+        self._pathdict = None
     
     def set_code(self, code):
         self._code = code
@@ -204,10 +226,26 @@ class Flowcell(object):
     def get_pipestatus(self):
         return self._pipestatus
     
+    '''
+    method returns the path at the cmcb storage. a path of None is derived from machine
+    and name on first use
+    @return: string
+    '''
     def get_cmcbpath(self):
+        if self._cmcbpath is None:
+            self._cmcbpath = ''
+            self.set_cmcbpath_machine(self._name)
         return self._cmcbpath
     
+    '''
+    method returns the path at the zih storage. a path of None is derived from machine
+    and name on first use
+    @return: string
+    '''
     def get_zihpath(self):
+        if self._zihpath is None:
+            self._zihpath = ''
+            self.set_zihpath_machine(self._name)
         return self._zihpath
 
     def get_objectstore_id(self):
@@ -278,87 +316,108 @@ class Flowcell(object):
      
 
 class IlluminaFlowcell(Flowcell):
+    __slots__ = ('__basemaskdict', '__lanedict', '__samplesheetdict', '__mismatchdict', '__runinfo', '__csvcounter')
+
     def __init__(self, machine, code, name, dbid):
         Flowcell.__init__(self, machine, code)
         
         self._name = name
         self._dbid = dbid
         self._number = '_'.join(self._name.split('_')[1:3]) # .replace('_0', '_')
-        
-        self.__rtapath_cmcb = pathjoin(machine.cmcbstorage, self._name, 'RTAComplete.txt')
-        self.__runinfopath_cmcb = pathjoin(machine.cmcbstorage, self._name, 'RunInfo.xml')
-        
-        self.__rtapath_zih = pathjoin(machine.zihstorage, self._name, 'RTAComplete.txt')
-        self.__runinfopath_zih = pathjoin(machine.zihstorage, self._name, 'RunInfo.xml')
+        self._cmcbpath = None # derived from machine and name on first use
+        self._zihpath = None
 
         self.__basemaskdict = defaultdict(list)
         self.__lanedict = defaultdict(list)
         self.__samplesheetdict = {}
-
-        self.__regnumber = compile('Number="[0-9]"')
-        self.__regcycles = compile('NumCycles="[0-9]+"')
-        self.__regindex = compile('IsIndexedRead="[Y|N]"')
+        self.__mismatchdict = {}
+        self.__runinfo = None
     
         self.__csvcounter = 1
 
         self.set_reversecomplement_machine()
-        self.set_zihpath_machine(self._name)
-        self.set_cmcbpath_machine(self._name)
-        
-        self.build_path_dict()
 
 
+    '''
+    method builds the paths of RTAComplete.txt, RunInfo.xml and the flowcell directory for the cmcb and zih storage.
+    it's called on first use of the pathdict, so flowcells which are only listed don't build any path
+    @return: dictionary
+    '''
     def build_path_dict(self):
         cmcb = {
-            'rtapath' : self.__rtapath_cmcb,
-            'runinfopath' : self.__runinfopath_cmcb,
-            'machinepath' : self._cmcbpath
+            'rtapath' : pathjoin(self._machine.cmcbstorage, self._name, 'RTAComplete.txt'),
+            'runinfopath' : pathjoin(self._machine.cmcbstorage, self._name, 'RunInfo.xml'),
+            'machinepath' : self.get_cmcbpath()
             }
 
         zih = {
-            'rtapath' : self.__rtapath_zih,
-            'runinfopath' : self.__runinfopath_zih,
-            'machinepath' : self._zihpath
+            'rtapath' : pathjoin(self._machine.zihstorage, self._name, 'RTAComplete.txt'),
+            'runinfopath' : pathjoin(self._machine.zihstorage, self._name, 'RunInfo.xml'),
+            'machinepath' : self.get_zihpath()
             }
 
-        self._pathdict = {
+        return {
             'cmcb' : cmcb,
             'zih' : zih
             }
 
 
     '''
-    check if file RTAcomplete exists and return True/False.
+    check if file RTAcomplete exists at the cmcb or zih storage and return True/False.
     @param where: string
     @return: boolean
     '''
     def is_RTAcomplete(self, where = 'cmcb'):
-        if where == 'cmcb': 
-            if isfile(self._pathdict[where]['rtapath']): return True
-        else:
-            return False
+        return isfile(self.get_pathdict_with_location(where)['rtapath'])
 
     '''
     method reads in the RunInfo.xml to extract the length of the sequenced reads and how many barcodes were used.
-    select the path with the where parameter for either cmcb or zih
+    select the path with the where parameter for either cmcb or zih. the parsed file is cached until it changes
     @param where: string
     '''
     def parse_runinfo_file(self, where = 'cmcb'):
-        with open(self._pathdict[where]['runinfopath'], 'r') as filein:
-            for line in filein:
-                number = self.__regnumber.findall(line)
-                cycles = self.__regcycles.findall(line)
-                index = self.__regindex.findall(line)
-                if len(number) != 0:
-                    number, cycles, index = int(number[0].split('"')[1]), int(cycles[0].split('"')[1]), index[0].split('"')[1]
-                    if index == 'Y':
-                        self._indexlist.append(cycles)
-                        self._seqorder.append('I')
-                    else:
-                        self._readlist.append(cycles)
-                        self._seqorder.append('R')
+        self.__runinfo = RUNINFO_CACHE.get_runinfo(self.get_pathdict_with_location(where)['runinfopath'])
+        self._readlist = self.__runinfo.readlist
+        self._indexlist = self.__runinfo.indexlist
+        self._seqorder = self.__runinfo.seqorder
         self.show_log('info', "flowcell status: '{0}' No. Reads: {3} Length: {1} - No. Barcodes: {4} Length: {2}".format(self._code, self._readlist, self._indexlist, len(self._readlist), len(self._indexlist)))
     
+    '''
+    method counts the completed cycles of a running flowcell and estimates the time until the run is complete
+    (see CycleProgress). the RunInfo.xml is parsed if it isn't yet
+    @param where: string
+    @return: CycleProgress
+    '''
+    def get_cycle_progress(self, where = 'cmcb'):
+        if self.__runinfo is None: self.parse_runinfo_file(where)
+        progress = CycleProgress(self.get_pathdict_with_location(where)['machinepath'], self.__runinfo.totalcycles, self.__runinfo.lanecount).scan()
+        remaining = progress.remaining
+        estimate = 'unknown' if remaining is None else '{0:.0f} min'.format(remaining / 60)
+        self.show_log('info', "flowcell status: '{0}' cycle {1}/{2} ({3:.1f}%) lanes: {4} - estimated time to completion: {5}".format(self._code, progress.completed, progress.totalcycles, progress.percent, progress.lanecycles, estimate))
+        return progress
+
+    '''
+    method reads the InterOp metrics of the run and returns cluster density, % pf, % >= q30, error rate and
+    first cycle intensity per lane (see InterOp.get_lane_summary). the lane count is taken from the FlowcellLayout
+    of the RunInfo.xml, which is parsed if it isn't yet. None is returned if the lane count cannot be read
+    @param where: string
+    @return: dictionary
+    '''
+    def get_interop_summary(self, where = 'cmcb'):
+        if self.__runinfo is None:
+            try:
+                self.parse_runinfo_file(where)
+            except (OSError, ParseError) as err:
+                self.show_log('warning', "flowcell status: '{0}' RunInfo.xml is not readable, no InterOp summary: {1}".format(self._code, err))
+                return None
+        if self.__runinfo.lanecount == 0:
+            self.show_log('warning', "flowcell status: '{0}' RunInfo.xml has no lane count, no InterOp summary".format(self._code))
+            return None
+        summary = InterOp(self.get_pathdict_with_location(where)['machinepath']).get_lane_summary(self.__runinfo.lanecount)
+        for lane, values in sorted(summary.items()):
+            self.show_log('info', "flowcell status: '{0}' lane: {1} InterOp {2}".format(self._code, lane, ', '.join(['{0}: {1:.2f}'.format(name, value) for name, value in sorted(values.items())])))
+        return summary
+
     '''
     method counts how many tracks per lane exist and returns either an empty
     list or a list of integers
@@ -377,31 +436,36 @@ class IlluminaFlowcell(Flowcell):
 
     '''
     method queries database and retrieves all tracks belonging to the flowcell and having a certain status.
-    next, for each track the libid, owner, barcodes and barcode name is retrieved and everything is stored
-    in a dictionary where the key is the lane number and the value is a list of tuples defined as
-    (client id, libstring (L{libid}_Track-{trackid}), samplename, bc name, bc1, bc2
+    the libid, owner, barcodes and barcode name of the tracks are joined in the same query and everything is stored
+    in a dictionary where the key is the lane number and the value is a list of Track instances with
+    client id, libstring (L{libid}_Track-{trackid}), libid, samplename, bc name, bc1, bc2
     @param dbinst: database instance
     @param trackstatus: tuple
     '''
     def build_lanedict(self, dbinst, trackstatus = (1,2,3)):
-        tracklist = dbinst.query_tracks_with_flowcellid(self._dbid)
+        tracklist = dbinst.query_tracks_join_tables_with_flowcellids(self._dbid, trackstatus)
+        self.add_tracks_to_lanedict(tracklist)
+        self.collect_lane_stats()
+
+    '''
+    method adds the joined track entries (see Database.query_tracks_join_tables_with_flowcellids)
+    to the lane dictionary. it allows to fill the lanes of several flowcells from a single query.
+    tracks without library, sample or client (logged by the query) are left out
+    @param tracklist: list of dictionaries
+    '''
+    def add_tracks_to_lanedict(self, tracklist):
         for trackdict in tracklist:
-            if trackdict['TRACKSSTATUS_ID'] not in trackstatus: continue
+            if trackdict['CLIENT_ID'] is None: continue
             libid = trackdict['LIBRARY_ID']
-            libdict = dbinst.query_libraries_with_libid(libid) # get the lib entry
-            sampledict = dbinst.query_samples_with_sampleid(libdict['SAMPLE_ID']) # with lib get sample
-            clientdict = dbinst.query_clients_with_clientid(sampledict['CLIENT_ID']) # with sample get client
-            libstring = 'L{0}_Track-{1}'.format(libid, trackdict['ID'])
-    
-            if libdict['INDEX_ID'] is None:
-                self.__lanedict[trackdict['COMPARTMENT']].append([clientdict['ID'], libstring, libid, sampledict['NAME'].replace(' ', '_'), 'NoBarcode', '', '']) # add to dictionary        
+            libstring = 'L{0}_Track-{1}'.format(libid, trackdict['TRACK_ID'])
+            samplename = trackdict['SAMPLE_NAME'].replace(' ', '_')
+
+            if trackdict['INDEX_ID'] is None:
+                self.__lanedict[trackdict['COMPARTMENT']].append(Track(trackdict['CLIENT_ID'], libstring, libid, samplename, 'NoBarcode')) # add to dictionary
             else:
-                bcdict = dbinst.query_indexes_with_indexid(libdict['INDEX_ID']) # with lib get barcode
-                bc1 = '' if bcdict['SEQ'] is None else bcdict['SEQ']
-                bc2 = '' if bcdict['SEQ2'] is None else bcdict['SEQ2']
-                self.__lanedict[trackdict['COMPARTMENT']].append([clientdict['ID'], libstring, libid, sampledict['NAME'].replace(' ', '_'), bcdict['NAME'], bc1, bc2]) # add to dictionary
-        
-        self.collect_lane_stats()
+                bc1 = '' if trackdict['SEQ'] is None else trackdict['SEQ']
+                bc2 = '' if trackdict['SEQ2'] is None else trackdict['SEQ2']
+                self.__lanedict[trackdict['COMPARTMENT']].append(Track(trackdict['CLIENT_ID'], libstring, libid, samplename, trackdict['INDEX_NAME'], bc1, bc2)) # add to dictionary
 
     '''
     method calculates the min and max length of a list of barcodes (are a list as strings (e.g. ACGTACGT))
@@ -410,10 +474,7 @@ class IlluminaFlowcell(Flowcell):
     @return: int, int, boolean
     '''
     def get_min_max_empty_len(self, templanelist):
-        templen = [len(i) for i in templanelist] # the length of the barcodes
-        minvalue, maxvalue = min(templen), max(templen) # minimum and maximum length of the barcodes
-        emptybc = True if sum([1 for i in templen if i == 0]) > 0 else False # is one barcode empty, then all are empty
-        return minvalue, maxvalue, emptybc
+        return BarcodeTable(templanelist).get_length_stats()
 
     '''
     methods builds the basesmask string for the bcl2fastq
@@ -464,32 +525,29 @@ class IlluminaFlowcell(Flowcell):
     @return: list, tuple(integer, integer)
     '''
     def modify_BC_per_lane(self, lanelist, lane):
-        lanelist = sorted(lanelist, key = itemgetter(0, 1)) # sort by client and then by libstring
-#         bc1list, bc2list = [i[5] for i in lanelist], [i[6] for i in lanelist] # lists with bc1 and bc2
-        bc1list, bc2list = zip(*[(i[5], i[6]) for i in lanelist])
+        lanelist.sort(key = attrgetter('client', 'libstring')) # sort by client and then by libstring
+        bc1table, bc2table = BarcodeTable([track.bc1 for track in lanelist]), BarcodeTable([track.bc2 for track in lanelist])
 #         get min, max and check if several bcs are empty
-        minbc1, maxbc1, emptybc1 = self.get_min_max_empty_len(bc1list)
-        minbc2, maxbc2, emptybc2 = self.get_min_max_empty_len(bc2list)
+        minbc1, maxbc1, emptybc1 = bc1table.get_length_stats()
+        minbc2, maxbc2, emptybc2 = bc2table.get_length_stats()
 #         a)
         if emptybc2 or self._issingle:
-            for i in range(len(lanelist)):
-                lanelist[i][6] = ''
+            bc2table.truncate(0)
             minbc2, maxbc2, emptybc2 = 0, 0, True
 #         b)
         if emptybc1:
 #             one of the first barcodes of the tracks on this lane is empty; all have to be empty; return single track
             self.show_log('info', 'pipeline status: {0} lane: {1} some bc1 are empty -> reduce whole lane to single track'.format(self._code, lane))
-            lanelist[0][5], lanelist[0][6] = '', ''
+            lanelist[0].bc1, lanelist[0].bc2 = '', ''
             return (lanelist[0], ), (0, 0)
       
-        for i in range(len(lanelist)):
-            if minbc1 != maxbc1: lanelist[i][5] = lanelist[i][5][:minbc1] # c1)
-            if minbc1 > self._indexlist[0]: lanelist[i][5] = lanelist[i][5][:self._indexlist[0]] # c2)
-        
-            if not self._issingle and not emptybc2:
-                if minbc2 != maxbc2: lanelist[i][6] = lanelist[i][6][:minbc2] # d1)
-                if minbc2 > self._indexlist[1]: lanelist[i][6] = lanelist[i][6][:self._indexlist[1]] # d2)
-                if self._reverse_complement: lanelist[i][6] = get_reverse_complement(lanelist[i][6]) # d3)
+        bc1table.truncate(min(minbc1, self._indexlist[0])) # c1) and c2)
+        if not self._issingle and not emptybc2:
+            bc2table.truncate(min(minbc2, self._indexlist[1])) # d1) and d2)
+            if self._reverse_complement: bc2table.reverse_complement() # d3)
+
+        for track, bc1, bc2 in zip(lanelist, bc1table.tolist(), bc2table.tolist()):
+            track.bc1, track.bc2 = bc1, bc2
         return lanelist, (minbc1, minbc2)
 
     '''
@@ -501,14 +559,47 @@ class IlluminaFlowcell(Flowcell):
             bmaskstring = self.build_basesMask_string(barcodedblen)
             self.__basemaskdict[bmaskstring].append(lane)
 
+    '''
+    method selects the barcode mismatches for the lanes of a samplesheet. the pairwise hamming distances
+    of the tracks on each lane are computed and the highest mismatch values (at most 2) are chosen which
+    don't assign a read to two tracks. pairs colliding with one mismatch are reported. an index without
+    barcodes on these lanes gets 0, identical barcodes get 0 for all indexes (bcl2fastq stops on them).
+    if the samplesheet has no lane column (reverse complement), bcl2fastq matches every track against
+    the reads of all lanes, so the tracks of all lanes are compared with each other (a track on several
+    lanes is taken once)
+    @param lanes: list of integers
+    @return: tuple of integers (one per sequenced index)
+    '''
+    def select_barcode_mismatches(self, lanes):
+        detector = CollisionDetector()
+        usedindex = [False, False]
+        if self._reverse_complement:
+            tracks = list({(track.libstring, track.bc1, track.bc2): track for lane in sorted(lanes) for track in self.__lanedict[lane]}.values())
+            lanegroups = [(','.join([str(lane) for lane in sorted(lanes)]), tracks)]
+        else:
+            lanegroups = [(lane, self.__lanedict[lane]) for lane in sorted(lanes)]
+        for lane, tracks in lanegroups:
+            usedindex = [usedindex[0] or any([track.bc1 != '' for track in tracks]), usedindex[1] or any([track.bc2 != '' for track in tracks])]
+            detector.add_lane(lane, [track.bc1 for track in tracks], [track.bc2 for track in tracks])
+
+        for lane, bc1first, bc2first, bc1second, bc2second, dist1, dist2 in detector.collisions:
+            self.show_log('warning', "flowcell status: '{0}' lane: {1} barcodes {2}-{3} and {4}-{5} differ in {6}/{7} bases".format(self._code, lane, bc1first, bc2first, bc1second, bc2second, dist1, dist2))
+        mismatches = detector.get_safe_mismatches()
+        if mismatches is None:
+            self.show_log('error', "flowcell status: '{0}' lanes: {1} contain tracks with identical barcodes".format(self._code, sorted(lanes)))
+            mismatches = (0, 0)
+        mismatches = tuple([value if used else 0 for value, used in zip(mismatches, usedindex)])
+        self.show_log('info', "flowcell status: '{0}' lanes: {1} barcode mismatches: {2}".format(self._code, sorted(lanes), mismatches[:len(self._indexlist)]))
+        return mismatches[:len(self._indexlist)]
+
     '''
     prepare the samplesheet for demultiplexing and create for each different basesmask a samplesheet
     '''
     def prepare_samplesheet(self, fcloc):
-        ssheetlist = read_file_get_list(pathjoin(SI.STORAGEDICT[fcloc]['FILEFOLDER'], SI.SAMPLESHEET_NAME))
+        template = get_samplesheet_template(pathjoin(SI.STORAGEDICT[fcloc]['FILEFOLDER'], SI.SAMPLESHEET_NAME), SI.SAMPLESHEETLINE)
         
         for basemask, lanes in self.__basemaskdict.items():
-            tempsheet = ssheetlist[::]
+            samplesheet = Samplesheet(template)
             for lane in sorted(lanes):
                 tracks = self.__lanedict[lane]
 #         Client,Sample_ID/Sample_Name,Barcode Name,BC1, BC2
@@ -516,15 +607,11 @@ class IlluminaFlowcell(Flowcell):
 #         to
 #         'LIBTRACK,LIBTRACK,CLIENT,LANE,BC1,BC2'
 #         Sample_ID,Sample_Name,Sample_Project,Lane,index,index2
+                lanestring = '' if self._reverse_complement else str(lane)
                 for track in tracks:
-                    trackstring = SI.SAMPLESHEETLINE.replace('LIBTRACK', track[1]).replace('CLIENT', track[0]).replace('BC1', track[5]).replace('BC2', track[6])
-                    if self._reverse_complement:
-                        trackstring = trackstring.replace('LANE', '')
-                    else:
-                        trackstring = trackstring.replace('LANE', str(lane))
-                    tempsheet.append(trackstring)
-                tempsheet = [i+'\n' for i in tempsheet]
-            self.__samplesheetdict['{0}_{1}'.format(self._number, self.__csvcounter)] = (tempsheet, basemask)
+                    samplesheet.add_row(track.libstring, track.client, lanestring, track.bc1, track.bc2)
+            self.__samplesheetdict['{0}_{1}'.format(self._number, self.__csvcounter)] = (samplesheet, basemask)
+            self.__mismatchdict['{0}_{1}'.format(self._number, self.__csvcounter)] = self.select_barcode_mismatches(lanes)
             self.__csvcounter += 1
 
 
@@ -534,8 +621,16 @@ class IlluminaFlowcell(Flowcell):
     def get_samplesheetdict(self):
         return self.__samplesheetdict
 
+    def get_mismatchdict(self):
+        return self.__mismatchdict
+
+    def get_runinfo(self):
+        return self.__runinfo
+
     basemaskdict = property(get_basemaskdict)
     samplesheetdict = property(get_samplesheetdict)
+    mismatchdict = property(get_mismatchdict)
+    runinfo = property(get_runinfo)
     
 
             
\ No newline at end of file
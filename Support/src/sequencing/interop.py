@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import logging
+
+import numpy as np
+
+from os.path import isfile
+from os.path import join as pathjoin
+
+''' record layouts of the supported InterOp versions (little endian) '''
+TILE_V2 = np.dtype([('lane', '<u2'), ('tile', '<u2'), ('code', '<u2'), ('value', '<f4')])
+TILE_V3 = np.dtype([('lane', '<u2'), ('tile', '<u4'), ('code', 'u1'), ('value1', '<f4'), ('value2', '<f4')]) # code 't': cluster count, pf cluster count; 'r': read, % aligned
+ERROR_V3 = np.dtype([('lane', '<u2'), ('tile', '<u2'), ('cycle', '<u2'), ('error_rate', '<f4'), ('errors', '<u4', (5, ))])
+ERROR_V4 = np.dtype([('lane', '<u2'), ('tile', '<u4'), ('cycle', '<u2'), ('error_rate', '<f4')])
+EXTRACTION_V2 = np.dtype([('lane', '<u2'), ('tile', '<u2'), ('cycle', '<u2'), ('fwhm', '<f4', (4, )), ('intensity', '<u2', (4, )), ('datetime', '<u8')])
+
+''' tile metric codes of version 2 '''
+CODE_DENSITY = 100
+CODE_DENSITY_PF = 101
+CODE_CLUSTER = 102
+CODE_CLUSTER_PF = 103
+
+'''
+Class reading the binary metric files of the InterOp folder of a run directory. The records of
+TileMetricsOut.bin, ErrorMetricsOut.bin, QMetricsOut.bin and ExtractionMetricsOut.bin are
+memory-mapped as NumPy structured arrays behind the header of the file, so nothing is copied
+until the lane summary reduces them with bincount over the lane numbers.
+'''
+class InterOp(object):
+    TILEFILE = 'TileMetricsOut.bin'
+    ERRORFILE = 'ErrorMetricsOut.bin'
+    QFILE = 'QMetricsOut.bin'
+    EXTRACTIONFILE = 'ExtractionMetricsOut.bin'
+
+    def __init__(self, rundir):
+        self.__interopdir = pathjoin(rundir, 'InterOp')
+        self.__tilearea = None # mm², given by the header of tile metrics version 3
+        self.__qbins = None # q-score of each histogram bin
+        self.__logger = logging.getLogger('support.interop')
+
+    def show_log(self, level, message):
+        if level == 'debug':
+            self.__logger.debug(message)
+        elif level == 'info':
+            self.__logger.info(message)
+        elif level == 'warning':
+            self.__logger.warning(message)
+        elif level == 'error':
+            self.__logger.error(message)
+        elif level == 'critical':
+            self.__logger.critical(message)
+
+    '''
+    method reads the header of a metric file and returns the version, the record size and the
+    raw header bytes which follow them (at most 1024)
+    @param filename: string
+    @return: integer, integer, bytes
+    '''
+    def read_header(self, filename):
+        with open(filename, 'rb') as filein:
+            header = filein.read(1026)
+        if len(header) < 2: raise ValueError("InterOp file '{0}' has no header".format(filename))
+        return header[0], header[1], header[2:]
+
+    '''
+    method maps the records of a metric file as structured array
+    @param filename: string
+    @param dtype: numpy dtype
+    @param offset: integer (size of the header)
+    @param recordsize: integer (record size given by the header)
+    @return: numpy memmap
+    '''
+    def map_records(self, filename, dtype, offset, recordsize):
+        if dtype.itemsize != recordsize: raise ValueError("InterOp file '{0}' has records of {1} bytes, expected {2}".format(filename, recordsize, dtype.itemsize))
+        return np.memmap(filename, dtype = dtype, mode = 'r', offset = offset, shape = ((self.get_filesize(filename) - offset) // recordsize, ))
+
+    def get_filesize(self, filename):
+        with open(filename, 'rb') as filein:
+            return filein.seek(0, 2)
+
+    '''
+    method maps TileMetricsOut.bin (version 2 and 3)
+    @return: integer (version), numpy memmap
+    '''
+    def read_tile_metrics(self):
+        filename = pathjoin(self.__interopdir, InterOp.TILEFILE)
+        version, recordsize, header = self.read_header(filename)
+        if version == 2: return version, self.map_records(filename, TILE_V2, 2, recordsize)
+        if version == 3:
+            self.__tilearea = float(np.frombuffer(header[:4], dtype = '<f4')[0])
+            return version, self.map_records(filename, TILE_V3, 6, recordsize)
+        raise ValueError("TileMetricsOut.bin version {0} is not supported".format(version))
+
+    '''
+    method maps ErrorMetricsOut.bin (version 3 and 4)
+    @return: numpy memmap
+    '''
+    def read_error_metrics(self):
+        filename = pathjoin(self.__interopdir, InterOp.ERRORFILE)
+        version, recordsize, header = self.read_header(filename)
+        if version == 3: return self.map_records(filename, ERROR_V3, 2, recordsize)
+        if version == 4: return self.map_records(filename, ERROR_V4, 2, recordsize)
+        raise ValueError("ErrorMetricsOut.bin version {0} is not supported".format(version))
+
+    '''
+    method maps QMetricsOut.bin (version 4 to 7). version 5 and later can store binned q-scores,
+    the header lists the bins (lower and upper limit and the q-score of the bin); version 5 keeps
+    the 50 histogram entries nevertheless, version 6 and 7 store one entry per bin
+    @return: numpy memmap
+    '''
+    def read_q_metrics(self):
+        filename = pathjoin(self.__interopdir, InterOp.QFILE)
+        version, recordsize, header = self.read_header(filename)
+        if version not in (4, 5, 6, 7): raise ValueError("QMetricsOut.bin version {0} is not supported".format(version))
+
+        offset, bincount, self.__qbins = 2, 50, np.arange(1, 51)
+        if version >= 5:
+            hasbins = header[0]
+            offset += 1
+            if hasbins:
+                count = header[1]
+                values = np.frombuffer(header[2 + 2 * count:2 + 3 * count], dtype = np.uint8)
+                offset += 1 + 3 * count
+                if version >= 6: bincount, self.__qbins = count, values.astype(np.int64)
+        tiletype = '<u4' if version == 7 else '<u2'
+        dtype = np.dtype([('lane', '<u2'), ('tile', tiletype), ('cycle', '<u2'), ('histogram', '<u4', (bincount, ))])
+        return self.map_records(filename, dtype, offset, recordsize)
+
+    '''
+    method maps ExtractionMetricsOut.bin (version 2 and 3). version 3 gives the number of channels in the header
+    @return: numpy memmap
+    '''
+    def read_extraction_metrics(self):
+        filename = pathjoin(self.__interopdir, InterOp.EXTRACTIONFILE)
+        version, recordsize, header = self.read_header(filename)
+        if version == 2: return self.map_records(filename, EXTRACTION_V2, 2, recordsize)
+        if version == 3:
+            channels = header[0]
+            dtype = np.dtype([('lane', '<u2'), ('tile', '<u4'), ('cycle', '<u2'), ('fwhm', '<f4', (channels, )), ('intensity', '<u2', (channels, ))])
+            return self.map_records(filename, dtype, 3, recordsize)
+        raise ValueError("ExtractionMetricsOut.bin version {0} is not supported".format(version))
+
+    '''
+    method returns a per lane mean or ratio of sums, lanes without records get nan
+    @param lanes: numpy array
+    @param values: numpy array
+    @param size: integer (highest lane + 1)
+    @param weights: numpy array (denominator of the ratio, the number of records if None)
+    @return: numpy array
+    '''
+    def per_lane(self, lanes, values, size, weights = None):
+        numerator = np.bincount(lanes, weights = values, minlength = size)
+        denominator = np.bincount(lanes, minlength = size) if weights is None else np.bincount(lanes, weights = weights, minlength = size)
+        return self.divide(numerator, denominator)
+
+    def divide(self, numerator, denominator):
+        size = max(len(numerator), len(denominator))
+        numerator, denominator = np.pad(numerator, (0, size - len(numerator))), np.pad(denominator, (0, size - len(denominator)))
+        with np.errstate(divide = 'ignore', invalid = 'ignore'):
+            return numerator / denominator
+
+    '''
+    method computes the tile metrics per lane: cluster density and pf cluster density (K/mm²) and % pf clusters
+    @return: dictionary (metric: numpy array indexed by lane)
+    '''
+    def summarise_tile_metrics(self, size):
+        version, records = self.read_tile_metrics()
+        lanes = records['lane'].astype(np.int64)
+        if version == 2:
+            codes, values = records['code'], records['value'].astype(np.float64)
+            density, densitypf = codes == CODE_DENSITY, codes == CODE_DENSITY_PF
+            clusters, clusterspf = codes == CODE_CLUSTER, codes == CODE_CLUSTER_PF
+            return {
+                'density': self.per_lane(lanes[density], values[density], size) / 1000,
+                'density_pf': self.per_lane(lanes[densitypf], values[densitypf], size) / 1000,
+                'percent_pf': 100 * self.divide(np.bincount(lanes[clusterspf], weights = values[clusterspf], minlength = size), np.bincount(lanes[clusters], weights = values[clusters], minlength = size))
+                }
+        tiles = records['code'] == ord('t')
+        lanes, clusters, clusterspf = lanes[tiles], records['value1'][tiles].astype(np.float64), records['value2'][tiles].astype(np.float64)
+        return {
+            'density': self.per_lane(lanes, clusters, size) / self.__tilearea / 1000,
+            'density_pf': self.per_lane(lanes, clusterspf, size) / self.__tilearea / 1000,
+            'percent_pf': 100 * self.per_lane(lanes, clusterspf, size, clusters)
+            }
+
+    '''
+    method computes the % of bases with a q-score of at least 30 per lane
+    @return: numpy array indexed by lane
+    '''
+    def summarise_q_metrics(self, size):
+        records = self.read_q_metrics()
+        histogram = records['histogram'].astype(np.float64)
+        return 100 * self.per_lane(records['lane'].astype(np.int64), histogram[:, self.__qbins >= 30].sum(axis = 1), size, histogram.sum(axis = 1))
+
+    '''
+    method computes the mean error rate (%) per lane
+    @return: numpy array indexed by lane
+    '''
+    def summarise_error_metrics(self, size):
+        records = self.read_error_metrics()
+        return self.per_lane(records['lane'].astype(np.int64), records['error_rate'].astype(np.float64), size)
+
+    '''
+    method computes the mean intensity of the first cycle per lane (mean over the channels)
+    @return: numpy array indexed by lane
+    '''
+    def summarise_extraction_metrics(self, size):
+        records = self.read_extraction_metrics()
+        first = records['cycle'] == 1
+        return self.per_lane(records['lane'][first].astype(np.int64), records['intensity'][first].astype(np.float64).mean(axis = 1), size)
+
+    '''
+    method returns the metrics per lane as dictionary (lane: dictionary with density, density_pf,
+    percent_pf, percent_q30, error_rate and intensity_c1). missing or unsupported files are
+    reported and their metrics are left out
+    @param lanecount: integer
+    @return: dictionary
+    '''
+    def get_lane_summary(self, lanecount = 8):
+        size = lanecount + 1
+        metrics = {}
+        for filename, method, names in ((InterOp.TILEFILE, self.summarise_tile_metrics, None), (InterOp.QFILE, self.summarise_q_metrics, 'percent_q30'),
+                                        (InterOp.ERRORFILE, self.summarise_error_metrics, 'error_rate'), (InterOp.EXTRACTIONFILE, self.summarise_extraction_metrics, 'intensity_c1')):
+            if not isfile(pathjoin(self.__interopdir, filename)):
+                self.show_log('debug', "InterOp file '{0}' doesn't exist".format(pathjoin(self.__interopdir, filename)))
+                continue
+            try:
+                result = method(size)
+            except ValueError as err:
+                self.show_log('warning', str(err))
+                continue
+            if names is None: metrics.update(result)
+            else: metrics[names] = result
+
+        summary = {}
+        for lane in range(1, size):
+            values = dict([(name, float(array[lane])) for name, array in metrics.items() if lane < len(array) and not np.isnan(array[lane])])
+            if len(values) != 0: summary[lane] = values
+        return summary
+
+    def get_interopdir(self):
+        return self.__interopdir
+
+    interopdir = property(get_interopdir)
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description = 'Prints cluster density, % PF, % >= Q30, error rate and first cycle intensity per lane from the InterOp folder of a run.')
+    parser.add_argument('rundir', type = str, help = 'run directory with the InterOp folder')
+    parser.add_argument('-l', '--lanes', dest = 'lanes', metavar = 'INT', type = int, default = 8, help = 'highest lane number (default: %(default)s)')
+    options = parser.parse_args()
+
+    columns = ('density', 'density_pf', 'percent_pf', 'percent_q30', 'error_rate', 'intensity_c1')
+    print('lane\t{0}'.format('\t'.join(columns)))
+    for lane, values in sorted(InterOp(options.rundir).get_lane_summary(options.lanes).items()):
+        print('{0}\t{1}'.format(lane, '\t'.join(['{0:.2f}'.format(values[name]) if name in values else '-' for name in columns])))
@@ -32,6 +32,9 @@ contact: mathias.lesche(at)tu-dresden.de
 import logging
 
 class Machine(object):
+    __slots__ = ('__name', '__code', '__cmcbstorage', '__zihstorage', '__platform', '__dbid', '__reverse_complement')
+    __logger = logging.getLogger('support.machine') # shared by all instances
+
     def __init__(self, name, code, cmcbstorage, zihstorage, platform, dbid):
         self.__name = name
         self.__code = code
@@ -39,8 +42,6 @@ class Machine(object):
         self.__zihstorage = zihstorage
         self.__platform = platform
         self.__dbid = dbid
-        
-        self.__logger = logging.getLogger('support.machine')
 
         if self.__name.find('Nextseq') or self.__name.find('Novaseq'):
             self.__reverse_complement = True
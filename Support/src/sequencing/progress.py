@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import time
+
+from os import scandir
+from os.path import isdir
+from os.path import join as pathjoin
+
+from re import compile
+
+''' cycle directories (C12.1, with bcl or cbcl files) and cycle files of the NextSeq (0012.bcl.bgzf) '''
+CYCLEDIR = compile(r'^C(\d+)\.1$')
+CYCLEFILE = compile(r'^(\d+)\.bcl(?:\.bgzf)?$')
+
+'''
+Class describing the sequencing progress of a running Illumina flowcell. The cycles of each lane are
+counted under Data/Intensities/BaseCalls/L00x (one scandir per lane). A cycle is completed if all
+cycles up to it exist and a later one exists too, the newest cycle may still be written. The time
+per cycle is taken from the modification times of the completed cycles and gives the estimated
+time until the run is complete.
+'''
+class CycleProgress(object):
+    def __init__(self, rundir, totalcycles, lanecount):
+        self.__basecalls = pathjoin(rundir, 'Data', 'Intensities', 'BaseCalls')
+        self.__totalcycles = totalcycles
+        self.__lanecount = lanecount
+        self.__lanecycles = {} # lane: number of completed cycles
+        self.__cycletimes = {} # cycle: modification time (of the lane with the most cycles)
+
+    '''
+    method returns the cycles of a lane directory with their modification time
+    @param lanedir: string
+    @return: dictionary (cycle: mtime)
+    '''
+    def scan_lane(self, lanedir):
+        cycles = {}
+        with scandir(lanedir) as entries:
+            for entry in entries:
+                match = CYCLEDIR.match(entry.name) if entry.is_dir() else CYCLEFILE.match(entry.name)
+                if match is not None: cycles[int(match.group(1))] = entry.stat().st_mtime
+        return cycles
+
+    '''
+    method counts the completed cycles of all lanes
+    @return: CycleProgress
+    '''
+    def scan(self):
+        self.__lanecycles, self.__cycletimes = {}, {}
+        for lane in range(1, self.__lanecount + 1):
+            lanedir = pathjoin(self.__basecalls, 'L{0:03d}'.format(lane))
+            if not isdir(lanedir): continue
+            cycles = self.scan_lane(lanedir)
+            present = 0
+            while present + 1 in cycles: present += 1
+            completed = present if present >= self.__totalcycles else max(0, present - 1)
+            self.__lanecycles[lane] = min(completed, self.__totalcycles)
+            if completed >= len(self.__cycletimes): self.__cycletimes = dict([(cycle, cycles[cycle]) for cycle in range(1, completed + 1)])
+        return self
+
+    '''
+    method returns the completed cycles of the run, i.e. of the slowest lane
+    @return: integer
+    '''
+    def get_completed(self):
+        if len(self.__lanecycles) == 0: return 0
+        return min(self.__lanecycles.values())
+
+    def get_percent(self):
+        if self.__totalcycles == 0: return 0.0
+        return 100.0 * self.get_completed() / self.__totalcycles
+
+    '''
+    method returns the mean seconds per cycle between the first and the last completed cycle or None
+    if there are less than two completed cycles
+    @return: float
+    '''
+    def get_seconds_per_cycle(self):
+        if len(self.__cycletimes) < 2: return None
+        last = max(self.__cycletimes)
+        return max(0.0, (self.__cycletimes[last] - self.__cycletimes[1]) / (last - 1))
+
+    '''
+    method returns the estimated seconds until all cycles are completed or None without an estimate
+    @return: float
+    '''
+    def get_remaining_seconds(self):
+        if self.get_completed() >= self.__totalcycles and self.__totalcycles != 0: return 0.0
+        secondspercycle = self.get_seconds_per_cycle()
+        if secondspercycle is None: return None
+        elapsed = max(0.0, time.time() - self.__cycletimes[max(self.__cycletimes)]) # time spent on the current cycle
+        return max(0.0, (self.__totalcycles - self.get_completed()) * secondspercycle - elapsed)
+
+    '''
+    method returns the estimated completion as unix time or None
+    @return: float
+    '''
+    def get_estimated_completion(self):
+        remaining = self.get_remaining_seconds()
+        if remaining is None: return None
+        return time.time() + remaining
+
+    def get_lanecycles(self):
+        return dict(self.__lanecycles)
+
+    def get_totalcycles(self):
+        return self.__totalcycles
+
+    lanecycles = property(get_lanecycles)
+    totalcycles = property(get_totalcycles)
+    completed = property(get_completed)
+    percent = property(get_percent)
+    secondspercycle = property(get_seconds_per_cycle)
+    remaining = property(get_remaining_seconds)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import threading
+
+from collections import OrderedDict
+
+from os import stat
+
+from xml.etree.ElementTree import iterparse
+
+'''
+Class describing the content of a RunInfo.xml: run id and number, instrument, flowcell, date,
+the reads (number, cycles, index read) and the flowcell layout (lanes, surfaces, swaths, tiles).
+'''
+class RunInfo(object):
+    def __init__(self, path):
+        self.__path = path
+        self.__runid = ''
+        self.__number = 0
+        self.__instrument = ''
+        self.__flowcell = ''
+        self.__date = ''
+        self.__reads = [] # tuples (number, cycles, isindex)
+        self.__lanecount = 0
+        self.__surfacecount = 0
+        self.__swathcount = 0
+        self.__tilecount = 0
+        self.__tiles = [] # tile names, e.g. 1_1101
+
+    '''
+    method parses the RunInfo.xml element by element. the elements are cleared after they
+    are read, so the tile lists of large flowcells don't stay in memory as tree
+    '''
+    def parse(self):
+        for event, element in iterparse(self.__path, events = ('start', 'end')):
+            if event == 'start':
+                if element.tag == 'Run':
+                    self.__runid = element.get('Id', '')
+                    self.__number = int(element.get('Number', 0))
+                continue
+
+            if element.tag == 'Read':
+                self.__reads.append((int(element.get('Number')), int(element.get('NumCycles')), element.get('IsIndexedRead') == 'Y'))
+            elif element.tag == 'Instrument':
+                self.__instrument = (element.text or '').strip()
+            elif element.tag == 'Flowcell':
+                self.__flowcell = (element.text or '').strip()
+            elif element.tag == 'Date':
+                self.__date = (element.text or '').strip()
+            elif element.tag == 'Tile':
+                self.__tiles.append((element.text or '').strip())
+            elif element.tag == 'FlowcellLayout':
+                self.__lanecount = int(element.get('LaneCount', 0))
+                self.__surfacecount = int(element.get('SurfaceCount', 0))
+                self.__swathcount = int(element.get('SwathCount', 0))
+                self.__tilecount = int(element.get('TileCount', 0))
+            elif element.tag == 'Tiles':
+                element.clear()
+        self.__reads.sort()
+        return self
+
+    def get_path(self):
+        return self.__path
+
+    def get_runid(self):
+        return self.__runid
+
+    def get_number(self):
+        return self.__number
+
+    def get_instrument(self):
+        return self.__instrument
+
+    def get_flowcell(self):
+        return self.__flowcell
+
+    def get_date(self):
+        return self.__date
+
+    def get_reads(self):
+        return list(self.__reads)
+
+    def get_readlist(self):
+        return [cycles for number, cycles, isindex in self.__reads if not isindex]
+
+    def get_indexlist(self):
+        return [cycles for number, cycles, isindex in self.__reads if isindex]
+
+    def get_seqorder(self):
+        return ['I' if isindex else 'R' for number, cycles, isindex in self.__reads]
+
+    def get_totalcycles(self):
+        return sum([cycles for number, cycles, isindex in self.__reads])
+
+    def get_lanecount(self):
+        return self.__lanecount
+
+    def get_surfacecount(self):
+        return self.__surfacecount
+
+    def get_swathcount(self):
+        return self.__swathcount
+
+    def get_tilecount(self):
+        return self.__tilecount
+
+    def get_tiles(self):
+        return list(self.__tiles)
+
+    path = property(get_path)
+    runid = property(get_runid)
+    number = property(get_number)
+    instrument = property(get_instrument)
+    flowcell = property(get_flowcell)
+    date = property(get_date)
+    reads = property(get_reads)
+    readlist = property(get_readlist)
+    indexlist = property(get_indexlist)
+    seqorder = property(get_seqorder)
+    totalcycles = property(get_totalcycles)
+    lanecount = property(get_lanecount)
+    surfacecount = property(get_surfacecount)
+    swathcount = property(get_swathcount)
+    tilecount = property(get_tilecount)
+    tiles = property(get_tiles)
+
+
+'''
+Class caching parsed RunInfo.xml files. An entry is valid as long as mtime and size of the file
+are unchanged, otherwise the file is parsed again. At most maxsize files are kept.
+'''
+class RunInfoCache(object):
+    def __init__(self, maxsize = 1024):
+        self.__maxsize = maxsize
+        self.__entries = OrderedDict() # path: ((mtime, size), RunInfo)
+        self.__lock = threading.Lock()
+
+    '''
+    method returns the RunInfo of a file, parsed or from the cache
+    @param path: string
+    @return: RunInfo
+    '''
+    def get_runinfo(self, path):
+        status = stat(path)
+        key = (status.st_mtime_ns, status.st_size)
+        with self.__lock:
+            entry = self.__entries.get(path)
+            if entry is not None and entry[0] == key:
+                self.__entries.move_to_end(path)
+                return entry[1]
+        runinfo = RunInfo(path).parse()
+        with self.__lock:
+            self.__entries[path] = (key, runinfo)
+            self.__entries.move_to_end(path)
+            while len(self.__entries) > self.__maxsize:
+                self.__entries.popitem(last = False)
+        return runinfo
+
+    def clear(self):
+        with self.__lock:
+            self.__entries.clear()
+
+RUNINFO_CACHE = RunInfoCache()
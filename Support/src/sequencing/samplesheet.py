@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import threading
+
+from os import stat
+
+from re import compile
+
+from helper.io_module import get_fileobject
+from helper.io_module import read_file_get_list
+
+''' placeholders of the samplesheet line (see SupportInformation.SAMPLESHEETLINE) '''
+PLACEHOLDER = compile(r'LIBTRACK|CLIENT|LANE|BC1|BC2')
+
+'''
+Class describing the samplesheet template: the header lines of the template file and the formatter
+for a data line. The formatter is compiled once from the placeholders of the line (LIBTRACK, CLIENT,
+LANE, BC1, BC2) into a format string, so a row is built by a single format call and values which
+contain a placeholder name are not replaced again.
+'''
+class SamplesheetTemplate(object):
+    def __init__(self, filename, line):
+        self.__filename = filename
+        self.__line = line
+        self.__header = [] # lines with newline
+        self.__formatter = PLACEHOLDER.sub(lambda match: '{{{0}}}'.format(match.group(0)), line.replace('{', '{{').replace('}', '}}')) + '\n'
+
+    '''
+    method reads the header lines of the template file
+    '''
+    def parse(self):
+        self.__header = ['{0}\n'.format(line) for line in read_file_get_list(self.__filename)]
+        return self
+
+    '''
+    method returns a data line of the samplesheet (with newline)
+    @param libtrack: string
+    @param client: string
+    @param lane: string
+    @param bc1: string
+    @param bc2: string
+    @return: string
+    '''
+    def format_row(self, libtrack, client, lane, bc1, bc2):
+        return self.__formatter.format(LIBTRACK = libtrack, CLIENT = client, LANE = lane, BC1 = bc1, BC2 = bc2)
+
+    def get_filename(self):
+        return self.__filename
+
+    def get_line(self):
+        return self.__line
+
+    def get_header(self):
+        return list(self.__header)
+
+    filename = property(get_filename)
+    line = property(get_line)
+    header = property(get_header)
+
+
+''' templates parsed so far, path: ((mtime, size, line), SamplesheetTemplate) '''
+TEMPLATE_CACHE = {}
+TEMPLATE_LOCK = threading.Lock()
+
+'''
+    Method returns the parsed samplesheet template of a file. it is parsed once and taken from the
+    cache as long as the file and the line are unchanged
+    @param filename: string
+    @param line: string
+    @return: SamplesheetTemplate
+'''
+def get_samplesheet_template(filename, line):
+    status = stat(filename)
+    key = (status.st_mtime_ns, status.st_size, line)
+    with TEMPLATE_LOCK:
+        entry = TEMPLATE_CACHE.get(filename)
+        if entry is None or entry[0] != key:
+            entry = (key, SamplesheetTemplate(filename, line).parse())
+            TEMPLATE_CACHE[filename] = entry
+    return entry[1]
+
+
+'''
+Class describing a samplesheet for bcl2fastq. Tracks are added as rows (the values of the
+placeholders); the lines are only formatted while the samplesheet is written, so a samplesheet
+is streamed to disk without building the whole file in memory.
+'''
+class Samplesheet(object):
+    def __init__(self, template):
+        self.__template = template
+        self.__rows = [] # tuples (libtrack, client, lane, bc1, bc2)
+
+    def __len__(self):
+        return len(self.__rows)
+
+    '''
+    method adds a row to the samplesheet. lane is an empty string if the lane column stays empty
+    @param libtrack: string
+    @param client: string
+    @param lane: string
+    @param bc1: string
+    @param bc2: string
+    '''
+    def add_row(self, libtrack, client, lane, bc1, bc2):
+        self.__rows.append((libtrack, client, lane, bc1, bc2))
+
+    '''
+    method yields the lines of the samplesheet (header and data lines with newline)
+    '''
+    def iter_lines(self):
+        yield from self.__template.header
+        format_row = self.__template.format_row
+        for row in self.__rows:
+            yield format_row(*row)
+
+    '''
+    method writes the samplesheet line by line
+    @param filename: string
+    '''
+    def write(self, filename):
+        with get_fileobject(filename, 'w') as fileout:
+            fileout.writelines(self.iter_lines())
+
+    def get_template(self):
+        return self.__template
+
+    def get_rows(self):
+        return list(self.__rows)
+
+    template = property(get_template)
+    rows = property(get_rows)
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+
+'''
+Class describing a track of a lane as compact record: client, libstring (L{libid}_Track-{trackid}),
+libid, sample name, barcode name and both barcodes. The attributes live in slots, so a track needs
+no instance dictionary when the lanes of many flowcells are kept in memory.
+'''
+class Track(object):
+    __slots__ = ('client', 'libstring', 'libid', 'samplename', 'bcname', 'bc1', 'bc2')
+
+    def __init__(self, client, libstring, libid, samplename, bcname, bc1 = '', bc2 = ''):
+        self.client = client
+        self.libstring = libstring
+        self.libid = libid
+        self.samplename = samplename
+        self.bcname = bcname
+        self.bc1 = bc1
+        self.bc2 = bc2
+
+    def __repr__(self):
+        return 'Track({0!r}, {1!r}, {2!r}, {3!r}, {4!r}, {5!r}, {6!r})'.format(self.client, self.libstring, self.libid, self.samplename, self.bcname, self.bc1, self.bc2)
+
+    '''
+    method returns the fields of the track as tuple (same order as the arguments)
+    @return: tuple
+    '''
+    def astuple(self):
+        return (self.client, self.libstring, self.libid, self.samplename, self.bcname, self.bc1, self.bc2)
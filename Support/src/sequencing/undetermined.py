@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import gzip
+import logging
+
+from collections import Counter
+
+from concurrent.futures import ProcessPoolExecutor
+
+from glob import glob
+
+from itertools import islice
+
+from os.path import basename
+from os.path import isfile
+from os.path import join as pathjoin
+
+from re import compile
+
+from helper.io_module import get_reverse_complement
+
+''' index read fastq files of the undetermined reads written by bcl2fastq '''
+UNDETERMINED = 'Undetermined_S0_L{0:03d}_{1}_001.fastq.gz'
+UNDETERMINEDLANE = compile(r'^Undetermined_S0_L(\d{3})_I1_001\.fastq\.gz$')
+
+'''
+    Method streams the index reads of a lane and counts the exact barcodes (bc1+bc2 joined by '+'
+    for dual indexes). only the sequence lines are read, at most maxreads reads
+    @param i1file: string
+    @param i2file: string (empty if there's no second index read)
+    @param maxreads: integer (None for all)
+    @return: Counter (bytes: integer)
+'''
+def count_barcodes(i1file, i2file = '', maxreads = None):
+    counter = Counter()
+    with gzip.open(i1file, 'rb') as i1in:
+        sequences = islice(i1in, 1, None, 4)
+        if i2file == '':
+            counter.update(line.rstrip() for line in islice(sequences, maxreads))
+        else:
+            with gzip.open(i2file, 'rb') as i2in:
+                pairs = zip(sequences, islice(i2in, 1, None, 4))
+                counter.update(first.rstrip() + b'+' + second.rstrip() for first, second in islice(pairs, maxreads))
+    return counter
+
+'''
+    Method counts the undetermined barcodes of a lane and returns the lane, the number of reads, the
+    number of distinct barcodes and the top barcodes. it's the task of the process pool, so only
+    the top of the counter is sent back
+    @param args: tuple (lane, fastq directory, top, maxreads)
+    @return: tuple(integer, integer, integer, list of tuples (string, integer))
+'''
+def count_lane(args):
+    lane, fqdir, top, maxreads = args
+    i2file = pathjoin(fqdir, UNDETERMINED.format(lane, 'I2'))
+    counter = count_barcodes(pathjoin(fqdir, UNDETERMINED.format(lane, 'I1')), i2file if isfile(i2file) else '', maxreads)
+    return lane, sum(counter.values()), len(counter), [(barcode.decode('ascii'), count) for barcode, count in counter.most_common(top)]
+
+
+'''
+Class matching barcodes against the Indexes table. Besides the exact pair it recognises the reverse
+complement of bc2 (NovaSeq/NextSeq read the i5 index in the other orientation), bc1 and bc2 in swapped
+order and index swaps, i.e. bc1 and bc2 which belong to two different indexes. Database barcodes longer
+than the read barcode are compared with their prefix.
+'''
+class IndexMatcher(object):
+    def __init__(self, indexlist):
+        self.__indexlist = [(row['NAME'], row['SEQ'] or '', row['SEQ2'] or '') for row in indexlist]
+        self.__lookups = {} # (length1, length2): dictionaries of the truncated barcodes
+
+    '''
+    method builds the dictionaries of the index barcodes cut to the barcode lengths of the reads
+    @param length1: integer
+    @param length2: integer
+    @return: dictionary
+    '''
+    def get_lookup(self, length1, length2):
+        key = (length1, length2)
+        if key not in self.__lookups:
+            lookup = {'pair': {}, 'pairrc': {}, 'bc1': {}, 'bc2': {}, 'bc2rc': {}}
+            for name, seq, seq2 in self.__indexlist:
+                if len(seq) < length1 or len(seq2) < length2: continue
+                bc1, bc2, bc2rc = seq[:length1], seq2[:length2], get_reverse_complement(seq2)[:length2]
+                lookup['pair'].setdefault((bc1, bc2), name)
+                lookup['pairrc'].setdefault((bc1, bc2rc), name)
+                lookup['bc1'].setdefault(bc1, name)
+                if length2 != 0:
+                    lookup['bc2'].setdefault(bc2, name)
+                    lookup['bc2rc'].setdefault(bc2rc, name)
+            self.__lookups[key] = lookup
+        return self.__lookups[key]
+
+    '''
+    method returns a description of the barcode (bc1 or bc1+bc2) in the Indexes table
+    @param barcode: string
+    @return: string
+    '''
+    def match(self, barcode):
+        bc1, separator, bc2 = barcode.partition('+')
+        lookup = self.get_lookup(len(bc1), len(bc2))
+        if (bc1, bc2) in lookup['pair']: return 'index {0}'.format(lookup['pair'][(bc1, bc2)])
+        if len(bc2) != 0:
+            if (bc1, bc2) in lookup['pairrc']: return 'index {0} with reverse complement bc2'.format(lookup['pairrc'][(bc1, bc2)])
+            if bc2 in lookup['bc1'] and bc1 in lookup['bc2']: return 'index {0} with bc1 and bc2 swapped'.format(lookup['bc1'][bc2])
+            if bc1 in lookup['bc1'] and bc2 in lookup['bc2']: return 'index swap bc1 {0} / bc2 {1}'.format(lookup['bc1'][bc1], lookup['bc2'][bc2])
+            if bc1 in lookup['bc1'] and bc2 in lookup['bc2rc']: return 'index swap bc1 {0} / reverse complement bc2 {1}'.format(lookup['bc1'][bc1], lookup['bc2rc'][bc2])
+            if bc2 in lookup['bc2']: return 'bc2 of index {0}'.format(lookup['bc2'][bc2])
+            if bc2 in lookup['bc2rc']: return 'reverse complement bc2 of index {0}'.format(lookup['bc2rc'][bc2])
+        if bc1 in lookup['bc1']: return 'bc1 of index {0}'.format(lookup['bc1'][bc1])
+        return 'unknown'
+
+
+'''
+Class counting the barcodes of the undetermined reads of a bcl2fastq output directory per lane (one
+process per lane) and matching the most frequent ones against the Indexes table.
+'''
+class UndeterminedCensus(object):
+    def __init__(self, fqdir, indexlist = None, top = 20, maxreads = None, processes = 4):
+        self.__fqdir = fqdir
+        self.__matcher = None if indexlist is None else IndexMatcher(indexlist)
+        self.__top = top
+        self.__maxreads = maxreads
+        self.__processes = processes
+        self.__lanes = {} # lane: dictionary (reads, distinct, barcodes)
+        self.__logger = logging.getLogger('support.undetermined')
+
+    def show_log(self, level, message):
+        if level == 'debug':
+            self.__logger.debug(message)
+        elif level == 'info':
+            self.__logger.info(message)
+        elif level == 'warning':
+            self.__logger.warning(message)
+        elif level == 'error':
+            self.__logger.error(message)
+        elif level == 'critical':
+            self.__logger.critical(message)
+
+    '''
+    method returns the lanes with undetermined index reads in the fastq directory
+    @return: list of integers
+    '''
+    def find_lanes(self):
+        lanes = [UNDETERMINEDLANE.match(basename(filename)) for filename in glob(pathjoin(self.__fqdir, 'Undetermined_S0_L*_I1_001.fastq.gz'))]
+        return sorted([int(match.group(1)) for match in lanes if match is not None])
+
+    '''
+    method counts the barcodes of the lanes, in parallel if there are several lanes and processes
+    @param lanes: list of integers (all lanes of the directory if None)
+    @return: dictionary (lane: dictionary with reads, distinct and barcodes (list of tuples (barcode, count, match)))
+    '''
+    def run(self, lanes = None):
+        if lanes is None: lanes = self.find_lanes()
+        if len(lanes) == 0:
+            self.show_log('warning', "no undetermined index reads found in '{0}'".format(self.__fqdir))
+            return {}
+        tasks = [(lane, self.__fqdir, self.__top, self.__maxreads) for lane in lanes]
+        if self.__processes > 1 and len(tasks) > 1:
+            with ProcessPoolExecutor(max_workers = min(self.__processes, len(tasks))) as executor:
+                results = list(executor.map(count_lane, tasks))
+        else:
+            results = [count_lane(task) for task in tasks]
+
+        for lane, reads, distinct, barcodes in results:
+            barcodes = [(barcode, count, '' if self.__matcher is None else self.__matcher.match(barcode)) for barcode, count in barcodes]
+            self.__lanes[lane] = {'reads': reads, 'distinct': distinct, 'barcodes': barcodes}
+            self.show_log('info', "lane {0}: {1} undetermined reads with {2} distinct barcodes".format(lane, reads, distinct))
+        return self.__lanes
+
+    '''
+    method returns the census as tab separated lines (lane, barcode, count, % of the undetermined reads, match)
+    @return: list of strings
+    '''
+    def get_report(self):
+        lines = ['lane\tbarcode\tcount\tpercent\tmatch']
+        for lane, entry in sorted(self.__lanes.items()):
+            for barcode, count, match in entry['barcodes']:
+                lines.append('{0}\t{1}\t{2}\t{3:.2f}\t{4}'.format(lane, barcode, count, 100.0 * count / max(1, entry['reads']), match))
+        return lines
+
+    def get_lanes(self):
+        return self.__lanes
+
+    lanes = property(get_lanes)
+
+
+if __name__ == '__main__':
+    from argparse import ArgumentParser
+    from helper.helper_logger import MainLogger
+
+    parser = ArgumentParser(description = 'Counts the barcodes of the undetermined reads of a bcl2fastq output directory and matches the most frequent ones against the Indexes table.')
+    parser.add_argument('fqdir', type = str, help = 'bcl2fastq output directory with the Undetermined_S0_L00x_I1/I2_001.fastq.gz files')
+    parser.add_argument('-l', '--lanes', dest = 'lanes', metavar = 'INT', type = int, nargs = '+', default = None, help = 'lanes (default: all lanes of the directory)')
+    parser.add_argument('-n', '--top', dest = 'top', metavar = 'INT', type = int, default = 20, help = 'most frequent barcodes per lane (default: %(default)s)')
+    parser.add_argument('-r', '--reads', dest = 'maxreads', metavar = 'INT', type = int, default = None, help = 'read at most this many reads per lane (default: all)')
+    parser.add_argument('-p', '--processes', dest = 'processes', metavar = 'INT', type = int, default = 4, help = 'lanes counted in parallel (default: %(default)s)')
+    parser.add_argument('--no-database', dest = 'nodatabase', action = 'store_true', help = "don't match the barcodes against the Indexes table")
+    options = parser.parse_args()
+
+    mainlog = MainLogger('support')
+    indexlist = None
+    if not options.nodatabase:
+        from helper.database import Database
+        from helper.support_information import SupportInformation as SI
+        dbinst = Database(SI.DB_HOST, SI.DB_USER, SI.DB_PW, SI.DB)
+        if not dbinst.setConnection():
+            mainlog.close()
+            exit(2)
+        indexlist = dbinst.query_indexes()
+        dbinst.closeConnection()
+
+    census = UndeterminedCensus(options.fqdir, indexlist, options.top, options.maxreads, options.processes)
+    census.run(options.lanes)
+    print('\n'.join(census.get_report()))
+    mainlog.close()
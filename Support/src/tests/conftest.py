@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import sys
+import types
+
+from os.path import abspath
+from os.path import dirname
+
+import pytest
+
+sys.path.insert(0, dirname(dirname(abspath(__file__)))) # the packages are imported from Support/src
+
+'''
+    helper.support_information holds the site configuration (database credentials, storages) and is
+    not part of the repository, the tests register a stand-in with the attributes the modules read
+'''
+class SupportInformation(object):
+    DB = 'lims'
+    DB_HOST = 'localhost'
+    DB_USER = 'support'
+    DB_PW = ''
+    SAMPLESHEET_NAME = 'samplesheet_template.csv'
+    SAMPLESHEETLINE = 'LIBTRACK,LIBTRACK,CLIENT,LANE,BC1,BC2'
+    SNAKE_BCL_YML_FILE = 'snake_bcl.yml'
+    STORAGESITE = ('cmcb', 'zih')
+    STORAGEDICT = {'cmcb': {'FILEFOLDER': '', 'RAWFOLDER': ''}, 'zih': {'FILEFOLDER': '', 'RAWFOLDER': ''}}
+
+if 'helper.support_information' not in sys.modules:
+    try:
+        import helper.support_information
+    except ImportError:
+        simodule = types.ModuleType('helper.support_information')
+        simodule.SupportInformation = SupportInformation
+        sys.modules['helper.support_information'] = simodule
+
+from helper.database_sqlite import SqliteDatabase
+from helper.database_sqlite import create_synthetic_fixtures
+
+'''
+    Fixture returns a SqliteDatabase with the LIMS schema and 2 flowcells with 2 lanes of 4 tracks
+    (track ids 1-8 on flowcell 1, 9-16 on flowcell 2)
+'''
+@pytest.fixture
+def dbinst(tmp_path):
+    dbinst = SqliteDatabase(str(tmp_path / 'lims.db'))
+    dbinst.create_schema()
+    dbinst.load_fixtures(create_synthetic_fixtures(flowcells = 2, lanes = 2, tracks_per_lane = 4, indexes = 16, clients = 2, storage = str(tmp_path)))
+    yield dbinst
+    dbinst.closeConnection()
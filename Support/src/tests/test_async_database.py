@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import asyncio
+import logging
+import threading
+
+from helper.async_database import AsyncDatabase
+
+def test_queries_run_in_the_worker_threads(dbinst):
+    asyncdb = AsyncDatabase(dbinst, max_workers = 2)
+    async def lookup():
+        machine = await asyncdb.query_machines_with_machineid(1)
+        tracklists = await asyncdb.gather('query_tracks_join_tables_with_flowcellids', [(1, (1, 2, 3)), (2, (1, 2, 3))])
+        return machine, tracklists
+    machine, tracklists = asyncio.run(lookup())
+    asyncdb.close()
+    assert machine['NAME'] == 'Novaseq'
+    assert [sorted(set([track['FLOWCELL_ID'] for track in tracklist])) for tracklist in tracklists] == [[1], [2]]
+
+def test_close_does_not_wait_for_a_busy_worker(dbinst, caplog):
+    release = threading.Event()
+    dbinst.block = lambda: release.wait(5)
+    asyncdb = AsyncDatabase(dbinst, max_workers = 2)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(asyncdb.call('block'))
+    loop.run_until_complete(asyncio.sleep(0.05)) # the call occupies one worker
+    timer = threading.Timer(0.5, release.set)
+    timer.start()
+    with caplog.at_level(logging.WARNING):
+        asyncdb.close(timeout = 0.1)
+    assert loop.run_until_complete(task) is True
+    loop.close()
+    assert 'not every worker thread' in caplog.text
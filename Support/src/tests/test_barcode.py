@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import numpy as np
+
+from sequencing.barcode import BarcodeTable
+from sequencing.barcode import CollisionDetector
+from sequencing.barcode import bitwise_count
+from sequencing.barcode import get_hamming_distances
+from sequencing.barcode import pack_barcodes
+
+
+def test_hamming_distances_of_packed_barcodes():
+    barcodes = ['ACGTACGT', 'ACGTACGA', 'TGCATGCA', 'ACGTNCGT', 'ACGTNCGA', 'NNNNNNNN']
+    codes, nmask = pack_barcodes(barcodes)
+    distances = get_hamming_distances(codes, nmask, codes, nmask)
+    for i, first in enumerate(barcodes):
+        for j, second in enumerate(barcodes):
+            assert distances[i, j] == sum([a != b for a, b in zip(first, second)]), (first, second) # N only equals N
+
+def test_bitwise_count_without_numpy_bitwise_count(monkeypatch):
+    values = np.random.default_rng(0).integers(0, np.iinfo(np.int64).max, size = (7, 9), dtype = np.uint64)
+    expected = np.array([[bin(int(value)).count('1') for value in row] for row in values], dtype = np.uint8)
+    assert (bitwise_count(values) == expected).all()
+    monkeypatch.delattr(np, 'bitwise_count', raising = False)
+    assert (bitwise_count(values) == expected).all()
+
+def test_collision_detector_finds_close_barcodes():
+    detector = CollisionDetector(blocksize = 2)
+    detector.add_lane(1, ['AAAAAAAA', 'AAAAAAAC', 'CCCCCCCC'], ['GGGGGGGG', 'GGGGGGGG', 'TTTTTTTT'])
+    assert detector.collisions == [(1, 'AAAAAAAA', 'GGGGGGGG', 'AAAAAAAC', 'GGGGGGGG', 1, 0)]
+    assert detector.has_collision(1, 1) and not detector.has_collision(0, 2)
+    assert detector.get_safe_mismatches() == (0, 2)
+    assert detector.histogram.sum() == 3 # each pair once
+
+def test_collision_detector_with_identical_barcodes():
+    detector = CollisionDetector()
+    detector.add_lane(1, ['ACGTACGT', 'ACGTACGT'], ['', ''])
+    assert detector.get_safe_mismatches() is None
+
+def test_barcode_table_with_different_lengths():
+    table = BarcodeTable(['ACGTT', 'AC', '', 'GGAN'])
+    assert table.get_length_stats() == (0, 5, True)
+    table.reverse_complement()
+    assert table.tolist() == ['AACGT', 'GT', '', 'NTCC']
+    table.truncate(3)
+    assert table.tolist() == ['AAC', 'GT', '', 'NTC'] and list(table.lengths) == [3, 2, 0, 3]
+    assert BarcodeTable([]).get_length_stats() == (0, 0, False)
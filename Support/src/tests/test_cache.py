@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import helper.cache
+
+from helper.cache import TTLCache
+
+def test_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(helper.cache, 'monotonic', lambda: now[0])
+    cache = TTLCache(ttl = 10, maxsize = 4)
+    cache.set('Novaseq', 1)
+    assert cache.get('Novaseq') == (True, 1)
+    now[0] = 110.0
+    assert cache.get('Novaseq') == (False, None)
+    assert cache.get_stats() == {'hits': 1, 'misses': 1, 'size': 0, 'maxsize': 4, 'ttl': 10}
+
+def test_least_recently_used_entry_is_removed():
+    cache = TTLCache(ttl = 600, maxsize = 2)
+    cache.set(1, 'a')
+    cache.set(2, 'b')
+    cache.get(1)
+    cache.set(3, 'c') # removes 2
+    assert (cache.get(1), cache.get(2), cache.get(3)) == ((True, 'a'), (False, None), (True, 'c'))
+    cache.maxsize = 1 # removes 1
+    assert cache.get(1) == (False, None) and cache.get(3) == (True, 'c')
+
+def test_invalidate():
+    cache = TTLCache()
+    for key in range(3):
+        cache.set(key, key)
+    cache.invalidate(0)
+    assert cache.get(0) == (False, None) and cache.get(1) == (True, 1)
+    cache.invalidate()
+    assert cache.get_stats()['size'] == 0
+
+def test_database_cache(dbinst):
+    assert dbinst.query_machines_with_machineid(1)['NAME'] == 'Novaseq'
+    assert dbinst.query_machines_with_machineid(1)['NAME'] == 'Novaseq'
+    assert dbinst.get_cache_stats()['Machines']['hits'] == 1
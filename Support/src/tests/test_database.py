@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import mysql.connector
+import pytest
+
+from helper.database import Database
+from helper.database_sqlite import SqliteCursor
+
+
+def query_tracks(dbinst, ids):
+    return dict([(row['ID'], row) for row in dbinst.fetch_rows('test', 'SELECT * FROM Tracks WHERE ID IN ({0})'.format(','.join(['%s']*len(ids))), ids)])
+
+def new_track(compartment, library_id, **kwargs):
+    return dict({'flowcell_id': 2, 'compartment': compartment, 'library_id': library_id, 'price_product_table': '2019', 'operator': 'illumina'}, **kwargs)
+
+
+def test_insert_tracks_batch_returns_the_ids_of_the_rows(dbinst, monkeypatch):
+    monkeypatch.setattr(Database, 'BATCH_SIZE', 2) # several chunks
+    tracklist = [new_track(1, 3), new_track(2, 1), new_track(1, 3, notes = 'second track of library 3'), new_track(2, 5, status = 'finished')]
+    ids = dbinst.insert_tracks_batch(tracklist)
+    dbinst.commitConnection()
+
+    assert ids == [17, 18, 19, 20]
+    rows = query_tracks(dbinst, ids)
+    for dbid, track in zip(ids, tracklist):
+        assert (rows[dbid]['FLOWCELL_ID'], rows[dbid]['COMPARTMENT'], rows[dbid]['LIBRARY_ID']) == (2, track['compartment'], track['library_id'])
+    assert rows[19]['NOTES'] == 'second track of library 3'
+    assert (rows[17]['TRACKSSTATUS_ID'], rows[20]['TRACKSSTATUS_ID']) == (1, 3)
+    assert (rows[17]['OPERATOR_ID'], rows[17]['PRICE_PRODUCT_TABLE_ID']) == (2, 2)
+
+def test_insert_tracks_batch_with_unknown_status(dbinst):
+    with pytest.raises(mysql.connector.errors.DataError):
+        dbinst.insert_tracks_batch([new_track(1, 1, status = 'lost')])
+    dbinst.rollbackConnection()
+    assert len(dbinst.query_tracks_with_flowcellid(1)) == 8
+
+def test_update_pipelinestatus_batch(dbinst, monkeypatch):
+    monkeypatch.setattr(Database, 'BATCH_SIZE', 1)
+    dbinst.update_sequencing_pipelinestatus_into_flowcells_batch([(1, 3, 'done'), (2, 1, 'open')])
+    dbinst.commitConnection()
+    flowcells = dbinst.query_flowcells_with_ids([1, 2])
+    assert (flowcells[1]['FLOWCELLSSTATUS_ID'], flowcells[1]['PIPELINING_STATUS']) == (3, 'done')
+    assert (flowcells[2]['FLOWCELLSSTATUS_ID'], flowcells[2]['PIPELINING_STATUS']) == (1, 'open')
+
+def test_update_demultiplex_stats_only_for_tracks_of_the_flowcell(dbinst):
+    missing = dbinst.update_demultiplex_stats_into_tracks_batch(1, [(1, 100, 15000, 91.5), (8, 200, 30000, None), (9, 300, 45000, 80.0), (999, 1, 1, 1.0)])
+    dbinst.commitConnection()
+    assert missing == [9, 999]
+    rows = query_tracks(dbinst, [1, 2, 8, 9])
+    assert (rows[1]['READ_COUNT'], rows[1]['YIELD'], rows[1]['PERCENT_Q30']) == (100, 15000, 91.5)
+    assert (rows[8]['READ_COUNT'], rows[8]['PERCENT_Q30']) == (200, None)
+    assert rows[2]['READ_COUNT'] is None and rows[9]['READ_COUNT'] is None # other tracks and other flowcells stay untouched
+
+def test_attach_products_batch(dbinst):
+    assert dbinst.attach_products_to_flowcells_by_name_batch([(1, 'NovaSeq S4 300 cycles'), (2, 'NovaSeq S4 300 cycles')]) == 2
+    with pytest.raises(mysql.connector.errors.DataError):
+        dbinst.attach_products_to_flowcells_by_name_batch([(1, 'MiSeq')])
+
+def test_rollback_to_savepoint_keeps_earlier_changes(dbinst):
+    dbinst.update_sequencing_pipelinestatus_into_flowcells(1, 3, 'done')
+    dbinst.setSavepoint('second')
+    dbinst.update_sequencing_pipelinestatus_into_flowcells(2, 3, 'done')
+    dbinst.rollbackToSavepoint('second')
+    dbinst.releaseSavepoint('second')
+    dbinst.commitConnection()
+    flowcells = dbinst.query_flowcells_with_ids([1, 2])
+    assert (flowcells[1]['PIPELINING_STATUS'], flowcells[2]['PIPELINING_STATUS']) == ('done', 'open')
+    with pytest.raises(ValueError):
+        dbinst.setSavepoint('no savepoint; DROP TABLE Tracks')
+
+def test_commit_and_rollback_without_connection(dbinst):
+    dbinst.closeConnection()
+    dbinst.commitConnection()
+    dbinst.rollbackConnection()
+
+def test_query_flowcells_since_accepts_only_flowcell_columns(dbinst):
+    assert [row['ID'] for row in dbinst.query_flowcells_since(1, ('ID', 'RAW_DATA_PATH'))] == [2]
+    with pytest.raises(ValueError):
+        dbinst.query_flowcells_since(0, ('ID FROM Tracks --', ))
+
+def test_query_tracks_join_tables(dbinst):
+    tracks = dbinst.query_tracks_join_tables_with_flowcellids([2])
+    assert [track['TRACK_ID'] for track in tracks] == list(range(9, 17))
+    assert all([track['SEQ'] is not None for track in tracks])
+    assert dbinst.query_tracks_join_tables_with_flowcellids([1], trackstatus = (1, )) == []
+
+def test_lost_read_is_repeated_outside_of_a_transaction(dbinst, monkeypatch):
+    execute = SqliteCursor.execute
+    failures = []
+    def lose_connection_once(cursor, query, values = ()):
+        if len(failures) == 0:
+            failures.append(query)
+            raise mysql.connector.errors.OperationalError(msg = 'Lost connection to MySQL server during query', errno = 2013)
+        return execute(cursor, query, values)
+    monkeypatch.setattr(SqliteCursor, 'execute', lose_connection_once)
+    assert len(dbinst.query_tracks_with_flowcellid(1)) == 8
+    assert len(failures) == 1
+    assert dbinst.get_registry().get_stats()['query_tracks_with_flowcellid']['errors'] == 1
+
+def test_lost_read_is_raised_in_a_transaction(dbinst, monkeypatch):
+    dbinst.update_sequencing_pipelinestatus_into_flowcells(1, 3, 'done')
+    def lose_connection(cursor, query, values = ()):
+        raise mysql.connector.errors.OperationalError(msg = 'MySQL server has gone away', errno = 2006)
+    monkeypatch.setattr(SqliteCursor, 'execute', lose_connection)
+    with pytest.raises(mysql.connector.errors.OperationalError):
+        dbinst.query_tracks_with_flowcellid(1)
+
+def test_prepared_statements_are_bounded(dbinst, monkeypatch):
+    monkeypatch.setattr(Database, 'PREPARED_MAXSIZE', 2)
+    dbinst.set_prepared(True)
+    for count in range(1, 5): # the IN list gives a statement per number of flowcells
+        dbinst.query_tracks_join_tables_with_flowcellids(list(range(1, count + 1)))
+    assert dbinst.query_tracks_join_tables_with_flowcellids([1, 2, 3, 4])[0]['TRACK_ID'] == 1
+    assert dbinst.get_statement_stats() == {'prepared': 4, 'reused': 1, 'evicted': 2}
+
+def test_cursor_is_closed_after_a_failed_read(dbinst, monkeypatch):
+    closed = []
+    close = SqliteCursor.close
+    def record_close(cursor):
+        closed.append(cursor)
+        return close(cursor)
+    monkeypatch.setattr(SqliteCursor, 'close', record_close)
+    with pytest.raises(Exception):
+        dbinst.fetch_rows('test', 'SELECT NO_COLUMN FROM Tracks')
+    assert len(closed) == 1
+
+def test_query_tracks_join_tables_keeps_tracks_with_missing_rows(dbinst, caplog):
+    cursor = dbinst.get_cursor('test')
+    cursor.execute('DELETE FROM Samples WHERE ID = %s', (2, ))
+    cursor.execute('DELETE FROM Libraries WHERE ID = %s', (3, ))
+    cursor.close()
+    tracks = dict([(track['TRACK_ID'], track) for track in dbinst.query_tracks_join_tables_with_flowcellids([1])])
+    assert len(tracks) == 8
+    assert (tracks[2]['SAMPLE_NAME'], tracks[2]['CLIENT_ID'], tracks[3]['SAMPLE_NAME']) == (None, None, None)
+    assert tracks[1]['CLIENT_ID'] is not None
+    assert 'sample 2 of library 2 does not exist' in caplog.text and 'library 3 does not exist' in caplog.text
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import json
+
+import pytest
+
+from sequencing.demultiplex_stats import DemultiplexStats
+from sequencing.demultiplex_stats import StatsReader
+
+STATS = {
+    'Flowcell': 'H0001DSXX', 'RunNumber': 1, 'RunId': '190101_A00000_0001_AH0001DSXX',
+    'ConversionResults': [
+        {'LaneNumber': 1, 'TotalClustersRaw': 1000, 'DemuxResults': [
+            {'SampleId': 'L1_Track-1', 'SampleName': 'sample 1', 'NumberReads': 100, 'Yield': 20000,
+             'ReadMetrics': [{'ReadNumber': 1, 'Yield': 10000, 'YieldQ30': 9000}, {'ReadNumber': 2, 'Yield': 10000, 'YieldQ30': 8000}]},
+            {'SampleId': 'L2_Track-2', 'NumberReads': 50, 'Yield': 10000, 'ReadMetrics': [{'ReadNumber': 1, 'Yield': 10000, 'YieldQ30': 5000}]}],
+         'Undetermined': {'NumberReads': 7, 'Yield': 1400}},
+        {'LaneNumber': 2, 'DemuxResults': [
+            {'SampleId': 'L1_Track-1', 'NumberReads': 300, 'Yield': 60000, 'ReadMetrics': [{'ReadNumber': 1, 'Yield': 60000, 'YieldQ30': 54000}]},
+            {'SampleId': 'control', 'NumberReads': 1, 'Yield': 200, 'ReadMetrics': []}]}],
+    'UnknownBarcodes': [{'Lane': 1, 'Barcodes': {'NNNNNNNN': 7}}]
+    }
+
+@pytest.fixture
+def statsfile(tmp_path):
+    filename = tmp_path / 'Stats.json'
+    filename.write_text(json.dumps(STATS, indent = 2))
+    return str(filename)
+
+@pytest.mark.parametrize('chunksize', [1, 7, 64, 1 << 20])
+def test_stats_reader_yields_the_samples_with_their_lane(statsfile, chunksize):
+    expected = [(result['LaneNumber'], sample) for result in STATS['ConversionResults'] for sample in result['DemuxResults']]
+    assert list(StatsReader(statsfile, chunksize)) == expected
+
+def test_stats_reader_with_truncated_file(tmp_path):
+    filename = tmp_path / 'Stats.json'
+    filename.write_text(json.dumps(STATS)[:200])
+    with pytest.raises(ValueError):
+        list(StatsReader(str(filename), 16))
+
+def test_demultiplex_stats_sums_lanes_and_reads(statsfile):
+    stats = DemultiplexStats(statsfile).parse()
+    assert stats.get_statslist() == [(1, 400, 80000, 88.75), (2, 50, 10000, 50.0)]
+    assert stats.get_unknown() == ['control']
+
+def test_demultiplex_stats_written_into_tracks(statsfile, dbinst):
+    assert DemultiplexStats(statsfile).parse().write_into_database(dbinst, 1) == []
+    rows = dbinst.fetch_rows('test', 'SELECT ID, READ_COUNT, YIELD, PERCENT_Q30 FROM Tracks WHERE ID IN (1, 2)')
+    assert sorted([tuple(row.values()) for row in rows]) == [(1, 400, 80000, 88.75), (2, 50, 10000, 50.0)]
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import logging
+
+import pytest
+
+from os.path import join as pathjoin
+
+from sequencing.flowcell import IlluminaFlowcell
+from sequencing.machine import Machine
+from sequencing.track import Track
+
+from helper.support_information import SupportInformation as SI
+
+def get_flowcell(tmp_path, tracklist, indexlist = (8, 8)):
+    machine = Machine('Novaseq', 'A00', str(tmp_path), str(tmp_path), 'illumina', 1)
+    flowcell = IlluminaFlowcell(machine, 'HXXXXXXXX', '200101_A00_0001_AHXXXXXXXX', 1)
+    flowcell.readlist, flowcell.indexlist = [101, 101], list(indexlist)
+    flowcell.seqorder = ['R'] + ['I'] * len(indexlist) + ['R']
+    flowcell.issingle = len(indexlist) == 1
+    flowcell.add_tracks_to_lanedict(tracklist)
+    return flowcell
+
+def test_prepare_samplesheet(dbinst, tmp_path, monkeypatch):
+    (tmp_path / SI.SAMPLESHEET_NAME).write_text('[Data]\nSample_ID,Sample_Name,Sample_Project,Lane,index,index2\n')
+    monkeypatch.setattr(SI, 'STORAGEDICT', {'cmcb': {'FILEFOLDER': str(tmp_path)}})
+    flowcell = get_flowcell(tmp_path, dbinst.query_tracks_join_tables_with_flowcellids(1, (1, 2, 3)))
+    assert flowcell.collect_lane_stats() == [4, 4]
+    flowcell.loopLanes_buildBC_buildBasesMask()
+    assert dict(flowcell.basemaskdict) == {'Y101,I8,I8,Y101': [1, 2]}
+    flowcell.prepare_samplesheet('cmcb')
+
+    samplesheet, basemask = flowcell.samplesheetdict['A00_0001_1']
+    assert basemask == 'Y101,I8,I8,Y101' and len(samplesheet) == 8
+    samplesheet.write(str(tmp_path / 'samplesheet.csv'))
+    lines = (tmp_path / 'samplesheet.csv').read_text().splitlines()
+    assert lines[:2] == ['[Data]', 'Sample_ID,Sample_Name,Sample_Project,Lane,index,index2'] and len(lines) == 10
+    assert len(flowcell.mismatchdict['A00_0001_1']) == 2
+
+def get_trackdict(trackid, lane, bc1, bc2):
+    return {'TRACK_ID': trackid, 'COMPARTMENT': lane, 'LIBRARY_ID': trackid, 'SAMPLE_NAME': 'sample {0}'.format(trackid), 'CLIENT_ID': 'client1',
+            'INDEX_ID': trackid, 'INDEX_NAME': 'IDX_{0}'.format(trackid), 'SEQ': bc1, 'SEQ2': bc2}
+
+def test_barcode_mismatches_compare_lanes_without_lane_column(tmp_path, caplog):
+    tracklist = [get_trackdict(1, 1, 'ACGTACGT', 'TTTTAAAA'), get_trackdict(2, 1, 'GGGGCCCC', 'CCCCGGGG'),
+                 get_trackdict(3, 2, 'ACGTACGT', 'TTTTAAAA'), get_trackdict(4, 2, 'TGCATGCA', 'AAAATTTT')]
+    flowcell = get_flowcell(tmp_path, tracklist)
+    flowcell.set_reversecomplement(False) # samplesheet with lane column, lanes are demultiplexed separately
+    assert flowcell.select_barcode_mismatches([1, 2]) == (2, 2)
+
+    flowcell.set_reversecomplement(True) # no lane column, track 1 and 3 collide
+    with caplog.at_level(logging.ERROR):
+        assert flowcell.select_barcode_mismatches([1, 2]) == (0, 0)
+    assert 'identical barcodes' in caplog.text
+
+def test_barcode_mismatches_take_track_on_several_lanes_once(tmp_path):
+    tracklist = [get_trackdict(1, 1, 'ACGTACGT', 'TTTTAAAA'), get_trackdict(2, 1, 'GGGGCCCC', 'CCCCGGGG'), get_trackdict(1, 2, 'ACGTACGT', 'TTTTAAAA')]
+    flowcell = get_flowcell(tmp_path, tracklist)
+    assert flowcell.select_barcode_mismatches([1, 2]) == (2, 2)
+
+def test_barcodes_of_a_lane_are_cut_and_reverse_complemented(tmp_path):
+    flowcell = get_flowcell(tmp_path, [])
+    flowcell.set_reversecomplement(False)
+    lanelist = [Track('client2', 'L2_Track-2', 2, 'sample_2', 'IDX_2', 'GGGGCCCC', 'CCCAGGGGTT'), Track('client1', 'L1_Track-1', 1, 'sample_1', 'IDX_1', 'ACGTACGTAC', 'TTTTAAACGG')]
+    tracks, lengths = flowcell.modify_BC_per_lane(lanelist, 1)
+    assert lengths == (8, 10) and flowcell.build_basesMask_string(lengths) == 'Y101,I8,I8,Y101'
+    assert [(track.libstring, track.bc1, track.bc2) for track in tracks] == [('L1_Track-1', 'ACGTACGT', 'TTTTAAAC'), ('L2_Track-2', 'GGGGCCCC', 'CCCAGGGG')] # sorted by client, cut to 8 bases
+
+    flowcell.set_reversecomplement(True)
+    tracks, lengths = flowcell.modify_BC_per_lane([Track('client1', 'L1_Track-1', 1, 'sample_1', 'IDX_1', 'ACGTACGT', 'TTTTAAAC')], 1)
+    assert (tracks[0].bc1, tracks[0].bc2) == ('ACGTACGT', 'GTTTAAAA')
+
+    tracks, lengths = flowcell.modify_BC_per_lane([Track('client1', 'L1_Track-1', 1, 'sample_1', 'NoBarcode'), Track('client1', 'L3_Track-3', 3, 'sample_3', 'IDX_3', 'ACGTACGT')], 1)
+    assert lengths == (0, 0) and len(tracks) == 1 and (tracks[0].bc1, tracks[0].bc2) == ('', '')
+
+def test_flowcell_paths_are_built_on_first_use(tmp_path):
+    flowcell = get_flowcell(tmp_path, [])
+    assert not hasattr(flowcell, '__dict__') and not hasattr(flowcell.machine, '__dict__')
+    with pytest.raises(AttributeError):
+        flowcell.lanes = 2
+    assert flowcell._pathdict is None
+    assert flowcell.cmcbpath == pathjoin(str(tmp_path), '200101_A00_0001_AHXXXXXXXX')
+    assert flowcell.pathdict['zih']['rtapath'] == pathjoin(str(tmp_path), '200101_A00_0001_AHXXXXXXXX', 'RTAComplete.txt')
+    assert flowcell.is_RTAcomplete('zih') is False
+
+    flowcell.name = '200101_A00_0002_AHXXXXXXXX' # the paths are built again
+    assert flowcell.pathdict['cmcb']['runinfopath'] == pathjoin(str(tmp_path), '200101_A00_0002_AHXXXXXXXX', 'RunInfo.xml')
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import pytest
+
+from helper.database_sqlite import SqliteConnection
+from helper.index_advisor import IndexAdvisor
+
+def test_statements_are_captured_without_running_them(dbinst, monkeypatch):
+    dbinst.get_connection()
+    def cursor(self, **kwargs):
+        raise AssertionError('a statement was sent to the database')
+    monkeypatch.setattr(SqliteConnection, 'cursor', cursor)
+    advisor = IndexAdvisor(dbinst)
+    statements = advisor.capture_statements()
+    assert sorted(set([method for method, query, values in statements])) == sorted([method for method, args, kwargs in advisor.get_representative_calls()])
+    assert ('query_flowcells_since', (0, )) in [(method, tuple(values)) for method, query, values in statements]
+    assert dbinst.get_registry().get_dryrun() is False and dbinst.get_registry().get_capture() is False
+    assert dbinst.get_registry().get_stats()['query_flowcells_since']['rows'] == 0
+
+def test_statement_columns(dbinst):
+    advisor = IndexAdvisor(dbinst)
+    filtercolumns, ordercolumns = advisor.get_statement_columns('SELECT * FROM Tracks JOIN Libraries ON Tracks.LIBRARY_ID = Libraries.ID WHERE Tracks.FLOWCELL_ID IN (%s) ORDER BY Tracks.COMPARTMENT')
+    assert filtercolumns == {'Tracks': ['FLOWCELL_ID'], 'Libraries': ['ID']}
+    assert ordercolumns == {'Tracks': ['COMPARTMENT']}
+
+def test_missing_registry(dbinst, monkeypatch):
+    monkeypatch.setattr(dbinst, 'get_registry', lambda: None)
+    with pytest.raises(ValueError):
+        IndexAdvisor(dbinst).capture_statements()
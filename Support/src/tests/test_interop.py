@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import logging
+
+import numpy as np
+import pytest
+
+from os.path import basename
+from os.path import dirname
+
+from sequencing.interop import CODE_CLUSTER
+from sequencing.interop import CODE_CLUSTER_PF
+from sequencing.interop import CODE_DENSITY
+from sequencing.interop import CODE_DENSITY_PF
+from sequencing.interop import ERROR_V3
+from sequencing.interop import EXTRACTION_V2
+from sequencing.interop import TILE_V2
+from sequencing.interop import InterOp
+from sequencing.flowcell import IlluminaFlowcell
+from sequencing.machine import Machine
+
+
+def write_metrics(filename, version, dtype, records, header = b''):
+    array = np.zeros(len(records), dtype = dtype)
+    for i, record in enumerate(records):
+        for name, value in record.items():
+            array[i][name] = value
+    with open(filename, 'wb') as fileout:
+        fileout.write(bytes([version, dtype.itemsize]) + header + array.tobytes())
+
+'''
+    Fixture returns a run directory with InterOp files of two lanes with two tiles each
+'''
+@pytest.fixture
+def rundir(tmp_path):
+    interopdir = tmp_path / 'InterOp'
+    interopdir.mkdir()
+    tiles = []
+    for lane, density, clusters, clusterspf in ((1, 200000.0, 1000.0, 800.0), (2, 100000.0, 1000.0, 500.0)):
+        for tile in (1101, 1102):
+            for code, value in ((CODE_DENSITY, density), (CODE_DENSITY_PF, density / 2), (CODE_CLUSTER, clusters), (CODE_CLUSTER_PF, clusterspf)):
+                tiles.append({'lane': lane, 'tile': tile, 'code': code, 'value': value})
+    write_metrics(str(interopdir / InterOp.TILEFILE), 2, TILE_V2, tiles)
+
+    qdtype = np.dtype([('lane', '<u2'), ('tile', '<u2'), ('cycle', '<u2'), ('histogram', '<u4', (50, ))])
+    histogram1, histogram2 = np.zeros(50), np.zeros(50)
+    histogram1[[19, 34]] = (25, 75) # q20 and q35
+    histogram2[[9, 29]] = (50, 50) # q10 and q30
+    write_metrics(str(interopdir / InterOp.QFILE), 4, qdtype, [{'lane': 1, 'tile': 1101, 'cycle': 1, 'histogram': histogram1}, {'lane': 2, 'tile': 1101, 'cycle': 1, 'histogram': histogram2}])
+
+    write_metrics(str(interopdir / InterOp.ERRORFILE), 3, ERROR_V3, [{'lane': 1, 'tile': 1101, 'cycle': 1, 'error_rate': 0.2}, {'lane': 1, 'tile': 1102, 'cycle': 1, 'error_rate': 0.4}])
+    write_metrics(str(interopdir / InterOp.EXTRACTIONFILE), 2, EXTRACTION_V2, [{'lane': 1, 'tile': 1101, 'cycle': 1, 'intensity': (100, 200, 300, 400)},
+                                                                              {'lane': 1, 'tile': 1101, 'cycle': 2, 'intensity': (0, 0, 0, 0)}])
+    return str(tmp_path)
+
+def test_lane_summary(rundir):
+    summary = InterOp(rundir).get_lane_summary(lanecount = 2)
+    assert summary[1] == pytest.approx({'density': 200.0, 'density_pf': 100.0, 'percent_pf': 80.0, 'percent_q30': 75.0, 'error_rate': 0.3, 'intensity_c1': 250.0})
+    assert summary[2] == pytest.approx({'density': 100.0, 'density_pf': 50.0, 'percent_pf': 50.0, 'percent_q30': 50.0}) # no error and extraction records
+
+def test_lane_summary_without_unsupported_files(rundir, tmp_path):
+    write_metrics(str(tmp_path / 'InterOp' / InterOp.ERRORFILE), 9, ERROR_V3, [])
+    (tmp_path / 'InterOp' / InterOp.QFILE).unlink()
+    summary = InterOp(rundir).get_lane_summary(lanecount = 2)
+    assert 'error_rate' not in summary[1] and 'percent_q30' not in summary[1]
+    assert summary[1]['density'] == pytest.approx(200.0)
+
+def test_record_size_is_checked(rundir, tmp_path):
+    with open(str(tmp_path / 'InterOp' / InterOp.TILEFILE), 'r+b') as fileout:
+        fileout.write(bytes([2, 12]))
+    with pytest.raises(ValueError):
+        InterOp(rundir).read_tile_metrics()
+
+def test_flowcell_summary_takes_lane_count_from_runinfo(rundir, tmp_path, caplog):
+    machine = Machine('Novaseq', 'A00', dirname(rundir), dirname(rundir), 'illumina', 1)
+    flowcell = IlluminaFlowcell(machine, 'H0001DSXX', basename(rundir), 1)
+    with caplog.at_level(logging.WARNING):
+        assert flowcell.get_interop_summary() is None # RunInfo.xml is missing
+    assert 'RunInfo.xml is not readable' in caplog.text
+
+    (tmp_path / 'RunInfo.xml').write_text('''<?xml version="1.0"?>
+<RunInfo><Run Id="190101_A00000_0001_AH0001DSXX" Number="1"><Flowcell>H0001DSXX</Flowcell>
+<Reads><Read Number="1" NumCycles="151" IsIndexedRead="N" /></Reads>
+<FlowcellLayout LaneCount="1" SurfaceCount="2" SwathCount="1" TileCount="2" /></Run></RunInfo>''')
+    summary = flowcell.get_interop_summary()
+    assert sorted(summary) == [1] and summary[1]['density'] == pytest.approx(200.0)
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import time
+
+import pytest
+
+from os import utime
+
+import sequencing.progress
+
+from sequencing.progress import CycleProgress
+
+def write_cycles(rundir, lane, cycles, start, seconds):
+    lanedir = rundir / 'Data' / 'Intensities' / 'BaseCalls' / 'L{0:03d}'.format(lane)
+    lanedir.mkdir(parents = True, exist_ok = True)
+    for cycle in cycles:
+        cycledir = lanedir / 'C{0}.1'.format(cycle)
+        cycledir.mkdir()
+        utime(str(cycledir), (start + cycle * seconds, start + cycle * seconds))
+
+def test_cycles_of_a_running_flowcell(tmp_path, monkeypatch):
+    start = 1000000.0
+    write_cycles(tmp_path, 1, range(1, 12), start, 60) # cycle 11 may still be written
+    write_cycles(tmp_path, 2, [1, 2, 3, 4, 5, 6, 8], start, 60) # cycle 7 is missing
+    monkeypatch.setattr(sequencing.progress.time, 'time', lambda: start + 11 * 60 + 30)
+    progress = CycleProgress(str(tmp_path), 20, 2).scan()
+    assert progress.lanecycles == {1: 10, 2: 5}
+    assert progress.completed == 5 and progress.percent == pytest.approx(25.0)
+    assert progress.secondspercycle == pytest.approx(60.0)
+    assert progress.remaining == pytest.approx(15 * 60 - 90) # 90s since the last completed cycle
+
+def test_complete_and_empty_runs(tmp_path):
+    write_cycles(tmp_path, 1, range(1, 5), time.time() - 400, 60)
+    progress = CycleProgress(str(tmp_path), 4, 1).scan()
+    assert progress.completed == 4 and progress.remaining == 0.0
+    empty = CycleProgress(str(tmp_path / 'missing'), 4, 1).scan()
+    assert empty.completed == 0 and empty.remaining is None
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import time
+
+import pytest
+
+from pipeline.run_watcher import IN_Q_OVERFLOW
+from pipeline.run_watcher import RunWatcher
+
+
+class Machine(object):
+    name = 'Novaseq'
+
+'''
+    Fixture returns a polling RunWatcher (without settle time) on an empty storage directory, the
+    list of run directories the callback was called with and the list of its next results (True
+    if empty, an exception is raised)
+'''
+@pytest.fixture
+def watcher(tmp_path, monkeypatch):
+    monkeypatch.setattr(RunWatcher, 'get_inotify', lambda self: None) # polled, the test drives the time
+    calls, results = [], []
+    def callback(machine, rundir):
+        calls.append(rundir)
+        result = results.pop(0) if len(results) != 0 else True
+        if isinstance(result, Exception): raise result
+        return result
+    watcher = RunWatcher(callback, settle = 0, mininterval = 10, maxinterval = 40)
+    storage = tmp_path / 'storage'
+    storage.mkdir()
+    watcher.add_storage(Machine(), str(storage))
+    return watcher, storage, calls, results
+
+def test_runs_of_a_new_storage_are_taken_from_open_flowcells(tmp_path):
+    storage = tmp_path / 'storage'
+    for name in ('190101_A00_0001_AH0001DSXX', '190102_A00_0002_AH0002DSXX', '190103_A00_0003_AH0003DSXX'):
+        (storage / name).mkdir(parents = True)
+    (storage / '190101_A00_0001_AH0001DSXX' / 'RTAComplete.txt').write_text('done') # prepared before
+    (storage / '190102_A00_0002_AH0002DSXX' / 'RTAComplete.txt').write_text('done') # finished while the watcher was down
+    watcher = RunWatcher(lambda machine, rundir: True, settle = 0)
+    watcher.get_inotify = lambda: None
+    watcher.add_storage(Machine(), str(storage), ['H0002DSXX', 'H0003DSXX'])
+    assert watcher.done == {str(storage / '190101_A00_0001_AH0001DSXX')}
+    assert sorted(watcher.pending.keys()) == [str(storage / '190102_A00_0002_AH0002DSXX'), str(storage / '190103_A00_0003_AH0003DSXX')]
+    watcher.check_candidates(time.monotonic() + 1)
+    assert str(storage / '190102_A00_0002_AH0002DSXX') in watcher.done
+
+def test_run_is_done_after_its_marker(watcher):
+    watcher, storage, calls, results = watcher
+    rundir = storage / 'run1'
+    rundir.mkdir()
+    now = time.monotonic()
+    watcher.poll_storage(str(storage), now)
+    watcher.check_candidates(now + 1)
+    assert calls == [] and str(rundir) in watcher.pending
+
+    (rundir / 'CopyComplete.txt').write_text('')
+    watcher.poll_storage(str(storage), now + 2)
+    watcher.check_candidates(now + 3)
+    assert calls == [str(rundir)]
+    assert watcher.done == {str(rundir)} and watcher.pending == {}
+
+def test_failed_callback_is_retried_with_backoff(watcher):
+    watcher, storage, calls, results = watcher
+    rundir = storage / 'run1'
+    rundir.mkdir()
+    (rundir / 'RTAComplete.txt').write_text('')
+    now = time.monotonic() + 1
+    watcher.poll_storage(str(storage), now)
+    results.extend([False, None])
+
+    watcher.check_candidates(now) # fails, next try after 10s
+    watcher.check_candidates(now + 5)
+    watcher.check_candidates(now + 10) # fails again, next try after 20s
+    watcher.check_candidates(now + 29)
+    assert len(calls) == 2 and str(rundir) in watcher.pending
+    watcher.check_candidates(now + 30)
+    assert len(calls) == 3 and watcher.done == {str(rundir)}
+
+def test_callback_raising_keeps_the_run_pending(watcher):
+    watcher, storage, calls, results = watcher
+    rundir = storage / 'run1'
+    rundir.mkdir()
+    (rundir / 'RTAComplete.txt').write_text('')
+    now = time.monotonic() + 1
+    watcher.poll_storage(str(storage), now)
+    results.append(OSError('samplesheet not writable'))
+    watcher.check_candidates(now)
+    assert calls == [str(rundir)] and str(rundir) in watcher.pending and watcher.done == set()
+    watcher.check_candidates(now + 10)
+    assert watcher.done == {str(rundir)}
+
+def test_run_is_given_up_after_maxretries(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(RunWatcher, 'get_inotify', lambda self: None)
+    calls = []
+    watcher = RunWatcher(lambda machine, rundir: calls.append(rundir), settle = 0, mininterval = 10, maxinterval = 40, maxretries = 3)
+    storage = tmp_path / 'storage'
+    (storage / 'run1').mkdir(parents = True)
+    watcher.add_storage(Machine(), str(storage), ['run1'])
+    (storage / 'run1' / 'RTAComplete.txt').write_text('')
+    now = time.monotonic() + 1
+    watcher.poll_storage(str(storage), now)
+    for delay in (0, 10, 30, 70):
+        watcher.check_candidates(now + delay)
+    assert len(calls) == 3 and watcher.pending == {} and watcher.done == {str(storage / 'run1')}
+    assert 'given up' in caplog.text
+
+def test_overflow_and_safety_poll_rescan_inotify_storages(tmp_path):
+    watcher = RunWatcher(lambda machine, rundir: True, settle = 0, safetyinterval = 100)
+    storage = tmp_path / 'storage'
+    storage.mkdir()
+    watcher.add_storage(Machine(), str(storage))
+    if watcher.get_inotify() is None: pytest.skip('inotify is not available')
+    now = time.monotonic()
+    assert 99 < watcher.get_timeout(now) <= 100 # only the safety poll is due
+
+    (storage / 'run1').mkdir()
+    watcher.handle_events([(None, IN_Q_OVERFLOW, '')]) # the events of run1 are lost
+    assert str(storage / 'run1') in watcher.pending
+
+    (storage / 'run2').mkdir()
+    (storage / 'run2' / 'CopyComplete.txt').write_text('')
+    watcher.poll_storage(str(storage), now + 100)
+    watcher.check_candidates(now + 101)
+    assert watcher.done == {str(storage / 'run2')}
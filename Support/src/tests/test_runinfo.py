@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import os
+
+from sequencing.runinfo import RunInfoCache
+
+RUNINFO = '''<?xml version="1.0"?>
+<RunInfo xmlns:xsd="http://www.w3.org/2001/XMLSchema" Version="5">
+  <Run Id="190101_A00000_0001_AH0001DSXX" Number="1">
+    <Flowcell>H0001DSXX</Flowcell>
+    <Instrument>A00000</Instrument>
+    <Date>1/1/2019 10:00:00 AM</Date>
+    <Reads>
+      <Read Number="3" NumCycles="8" IsIndexedRead="Y" />
+      <Read Number="1" NumCycles="151" IsIndexedRead="N" />
+      <Read Number="2" NumCycles="8" IsIndexedRead="Y" />
+      <Read Number="4" NumCycles="151" IsIndexedRead="N" />
+    </Reads>
+    <FlowcellLayout LaneCount="2" SurfaceCount="2" SwathCount="1" TileCount="2">
+      <TileSet TileNamingConvention="FourDigit">
+        <Tiles>
+          <Tile>1_1101</Tile>
+          <Tile>1_1102</Tile>
+          <Tile>2_1101</Tile>
+          <Tile>2_1102</Tile>
+        </Tiles>
+      </TileSet>
+    </FlowcellLayout>
+  </Run>
+</RunInfo>
+'''
+
+def test_runinfo(tmp_path):
+    filename = tmp_path / 'RunInfo.xml'
+    filename.write_text(RUNINFO)
+    runinfo = RunInfoCache().get_runinfo(str(filename))
+    assert (runinfo.runid, runinfo.number, runinfo.flowcell, runinfo.instrument) == ('190101_A00000_0001_AH0001DSXX', 1, 'H0001DSXX', 'A00000')
+    assert (runinfo.readlist, runinfo.indexlist, runinfo.seqorder, runinfo.totalcycles) == ([151, 151], [8, 8], ['R', 'I', 'I', 'R'], 318)
+    assert (runinfo.lanecount, runinfo.surfacecount, runinfo.swathcount, runinfo.tilecount) == (2, 2, 1, 2)
+    assert runinfo.tiles == ['1_1101', '1_1102', '2_1101', '2_1102']
+
+def test_runinfo_cache_parses_changed_files_again(tmp_path):
+    filename = tmp_path / 'RunInfo.xml'
+    filename.write_text(RUNINFO)
+    cache = RunInfoCache(maxsize = 1)
+    first = cache.get_runinfo(str(filename))
+    assert cache.get_runinfo(str(filename)) is first
+    filename.write_text(RUNINFO.replace('Number="1"', 'Number="2"', 1))
+    os.utime(str(filename), ns = (1, 1))
+    assert cache.get_runinfo(str(filename)).number == 2
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+from sequencing.samplesheet import Samplesheet
+from sequencing.samplesheet import get_samplesheet_template
+
+def test_samplesheet(tmp_path):
+    template = tmp_path / 'samplesheet.txt'
+    template.write_text('[Data],,,,,\nSample_ID,Sample_Name,Sample_Project,Lane,index,index2\n')
+    line = 'LIBTRACK,LIBTRACK,CLIENT,LANE,BC1,BC2'
+    samplesheet = Samplesheet(get_samplesheet_template(str(template), line))
+    samplesheet.add_row('L1_Track-1', 'client1', '1', 'ACGTACGT', 'TTTTAAAA')
+    samplesheet.add_row('L2_Track-2', 'LANE_CLIENT', '', 'GGGGCCCC', '')
+    samplesheet.write(str(tmp_path / 'out.csv'))
+    assert (tmp_path / 'out.csv').read_text().splitlines() == [
+        '[Data],,,,,', 'Sample_ID,Sample_Name,Sample_Project,Lane,index,index2',
+        'L1_Track-1,L1_Track-1,client1,1,ACGTACGT,TTTTAAAA', 'L2_Track-2,L2_Track-2,LANE_CLIENT,,GGGGCCCC,']
+    assert get_samplesheet_template(str(template), line) is samplesheet.template
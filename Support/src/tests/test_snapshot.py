@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import pickle
+import stat
+
+from datetime import datetime
+
+from decimal import Decimal
+
+from os import lstat
+
+from helper.snapshot import ReferenceSnapshot
+
+def test_snapshot_is_rebuilt_only_after_changes(dbinst, tmp_path):
+    snapshot = ReferenceSnapshot(str(tmp_path / 'reference.json'))
+    assert snapshot.load(dbinst) is False # built from the database
+    assert stat.S_IMODE(lstat(snapshot.filename).st_mode) == 0o600
+    dbinst.invalidate_cache()
+    assert snapshot.load(dbinst) is True
+    assert dbinst.get_cache_entry('Machines', 1)[1]['NAME'] == 'Novaseq'
+    assert dbinst.get_cache_entry('PriceProductTables', 'CURRENT_TABLE') == (True, '2019')
+
+    cursor = dbinst.get_cursor('test')
+    cursor.execute("UPDATE Machines SET NAME = 'Nextseq' WHERE ID = 1")
+    cursor.close()
+    dbinst.commitConnection()
+    dbinst.invalidate_cache()
+    assert snapshot.load(dbinst) is False
+    assert dbinst.get_cache_entry('Machines', 1)[1]['NAME'] == 'Nextseq'
+
+def test_pickled_snapshot_is_not_loaded(dbinst, tmp_path):
+    filename = tmp_path / 'reference.json'
+    filename.write_bytes(pickle.dumps({'version': ReferenceSnapshot.VERSION}))
+    snapshot = ReferenceSnapshot(str(filename))
+    assert snapshot.read() is None
+    assert snapshot.load(dbinst) is False and snapshot.read()['version'] == ReferenceSnapshot.VERSION
+
+def test_dates_and_decimals_are_kept(tmp_path):
+    snapshot = ReferenceSnapshot(str(tmp_path / 'reference.json'))
+    content = {'version': ReferenceSnapshot.VERSION, 'checksums': {'Machines': 1}, 'tables': {'Machines': [{'ID': 1, 'CREATED': datetime(2019, 1, 1, 10, 0), 'PRICE': Decimal('1.50')}]}}
+    snapshot.write(content)
+    assert snapshot.read() == content
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+import gzip
+
+from sequencing.undetermined import IndexMatcher
+from sequencing.undetermined import UNDETERMINED
+from sequencing.undetermined import UndeterminedCensus
+
+INDEXES = [{'NAME': 'IDX_1', 'SEQ': 'ACGTACGT', 'SEQ2': 'TTTTAAAC'}, {'NAME': 'IDX_2', 'SEQ': 'GGGGCCCC', 'SEQ2': 'CCCAGGGG'}]
+
+def write_fastq(filename, sequences):
+    with gzip.open(str(filename), 'wt') as fileout:
+        for i, sequence in enumerate(sequences):
+            fileout.write('@read{0}\n{1}\n+\n{2}\n'.format(i, sequence, 'F' * len(sequence)))
+
+def test_index_matcher():
+    matcher = IndexMatcher(INDEXES)
+    assert matcher.match('ACGTACGT+TTTTAAAC') == 'index IDX_1'
+    assert matcher.match('ACGTACGT+GTTTAAAA') == 'index IDX_1 with reverse complement bc2'
+    assert matcher.match('TTTTAAAC+ACGTACGT') == 'index IDX_1 with bc1 and bc2 swapped'
+    assert matcher.match('ACGTACGT+CCCAGGGG') == 'index swap bc1 IDX_1 / bc2 IDX_2'
+    assert matcher.match('ACGTAC') == 'index IDX_1' # single index, prefix of the longer database barcode
+    assert matcher.match('ACGTACGT+AAAAAAAA') == 'bc1 of index IDX_1'
+    assert matcher.match('AAAAAAAA+AAAAAAAA') == 'unknown'
+
+def test_census_of_two_lanes(tmp_path):
+    write_fastq(tmp_path / UNDETERMINED.format(1, 'I1'), ['ACGTACGT'] * 3 + ['NNNNNNNN'])
+    write_fastq(tmp_path / UNDETERMINED.format(1, 'I2'), ['GTTTAAAA'] * 3 + ['NNNNNNNN'])
+    write_fastq(tmp_path / UNDETERMINED.format(2, 'I1'), ['GGGGCCCC', 'GGGGCCCC', 'AAAAAAAA'])
+    census = UndeterminedCensus(str(tmp_path), INDEXES, top = 1, processes = 1)
+    assert census.find_lanes() == [1, 2]
+    lanes = census.run()
+    assert lanes[1] == {'reads': 4, 'distinct': 2, 'barcodes': [('ACGTACGT+GTTTAAAA', 3, 'index IDX_1 with reverse complement bc2')]}
+    assert lanes[2]['barcodes'] == [('GGGGCCCC', 2, 'index IDX_2')]
+    assert census.get_report()[1] == '1\tACGTACGT+GTTTAAAA\t3\t75.00\tindex IDX_1 with reverse complement bc2'
+
+def test_census_reads_at_most_maxreads(tmp_path):
+    write_fastq(tmp_path / UNDETERMINED.format(1, 'I1'), ['ACGTACGT'] * 5)
+    assert UndeterminedCensus(str(tmp_path), maxreads = 2, processes = 1).run()[1]['reads'] == 2
+    assert UndeterminedCensus(str(tmp_path / 'missing')).run() == {}
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+'''
+The MIT License (MIT)
+
+Copyright (c) <2018> <DresdenConceptGenomeCenter>
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in
+all copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+THE SOFTWARE.
+
+Use Python Naming Conventions
+https://www.python.org/dev/peps/pep-0008/#naming-conventions
+
+contact: mathias.lesche(at)tu-dresden.de
+'''
+
+''' python modules '''
+from helper.watermark import WatermarkState
+
+def test_state_is_saved_and_loaded(tmp_path):
+    filename = str(tmp_path / 'state.json')
+    state = WatermarkState(filename)
+    state.load() # missing file, empty state
+    assert state.get_mark('Flowcells') == 0 and state.get_pending('Flowcells') == []
+    state.set_mark('Flowcells', 5)
+    state.set_mark('Flowcells', 3) # never decreases
+    state.set_pending('Flowcells', [4, 2, 4])
+    state.set_list('raw_data_paths', ['/b', '/a'])
+    state.save()
+    assert [path.name for path in tmp_path.iterdir()] == ['state.json']
+
+    loaded = WatermarkState(filename)
+    loaded.load()
+    assert (loaded.get_mark('Flowcells'), loaded.get_pending('Flowcells'), loaded.get_list('raw_data_paths')) == (5, [2, 4], ['/a', '/b'])
+
+def test_unreadable_state_starts_empty(tmp_path):
+    (tmp_path / 'state.json').write_text('{"marks": ')
+    state = WatermarkState(str(tmp_path / 'state.json'))
+    state.load()
+    assert state.get_mark('Flowcells') == 0
+
+def test_flowcells_since_the_mark(dbinst):
+    state = WatermarkState('')
+    flowcells = dbinst.query_flowcells_since(state.get_mark('Flowcells'), ('ID', 'RAW_DATA_PATH'))
+    assert [flowcell['ID'] for flowcell in flowcells] == [1, 2] and sorted(flowcells[0]) == ['ID', 'RAW_DATA_PATH']
+    state.set_mark('Flowcells', flowcells[-1]['ID'])
+    assert dbinst.query_flowcells_since(state.get_mark('Flowcells')) == []